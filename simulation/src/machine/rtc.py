@@ -10,11 +10,17 @@ See https://docs.micropython.org/en/latest/library/machine.RTC.html
 import time
 from datetime import date
 
-from typing import Tuple
+from typing import Optional, Tuple
 
 
 class RTC(object):
     """docstring for RTC"""
+    # maximum size of the user memory of an ESP32 in bytes
+    MEMORY_SIZE = 2048
+
+    # RTC memory survives a warm reboot, share it between all instances
+    _memory = b''
+
     def __init__(self, id: int = 0):
         self._time_tuple = (
             2000,   # year      0
@@ -56,3 +62,26 @@ class RTC(object):
         """
         # return time.localtime()
         return self._time_tuple
+
+    def memory(self, data: Optional[bytes] = None) -> Optional[bytes]:
+        """
+        Set or get the content of the RTC memory.
+
+        The content is kept on a warm reboot, like a soft or watchdog reset.
+        An uninitialized or cleared memory returns an empty bytes object.
+
+        :param      data:  The data to store
+        :type       data:  Optional[bytes]
+
+        :returns:   Content of the memory if no data is specified
+        :rtype:     Optional[bytes]
+
+        :raises     ValueError:  Data exceeds the memory size
+        """
+        if data is None:
+            return RTC._memory
+
+        if len(data) > self.MEMORY_SIZE:
+            raise ValueError('buffer too long')
+
+        RTC._memory = bytes(data)
@@ -24,7 +24,7 @@ class TimeHelper(object):
         self.rtc = RTC()
         self._timezone = tz
 
-    def sync_time(self, timezone: int = None) -> None:
+    def sync_time(self, timezone: int = None) -> bool:
         """
         Sync the RTC with data from NTP server.
 
@@ -34,6 +34,9 @@ class TimeHelper(object):
 
         :param      timezone:  The timezone shift
         :type       timezone:  int, optional
+
+        :returns:   Result of synchronization
+        :rtype:     bool
         """
         tm = time.localtime()
         print("Local time before synchronization: {}".format(tm))
@@ -47,7 +50,7 @@ class TimeHelper(object):
             print('Synced with NTP server')
         except Exception as e:
             print('Failed to sync with NTP server due to {}'.format(e))
-            return
+            return False
         """
 
         if timezone is None:
@@ -68,6 +71,8 @@ class TimeHelper(object):
             (tm[0], tm[1], tm[2], tm[3], tm[4], tm[5], 0, self.timezone)
         )
 
+        return True
+
     @property
     def timezone(self) -> int:
         """
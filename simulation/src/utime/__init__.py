@@ -0,0 +1,4 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+from .utime import *
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Fake Micropython time module
+
+Provides the standard Python time functions and adds the Micropython specific
+millisecond tick functions on top.
+
+See https://docs.micropython.org/en/latest/library/time.html
+"""
+
+import time as _time
+from time import gmtime, localtime, mktime, sleep, time     # noqa: F401
+
+
+def ticks_ms() -> int:
+    """
+    Get an increasing millisecond counter with an arbitrary reference point
+
+    :returns:   Milliseconds
+    :rtype:     int
+    """
+    return int(_time.monotonic() * 1000)
+
+
+def ticks_us() -> int:
+    """
+    Get an increasing microsecond counter with an arbitrary reference point
+
+    :returns:   Microseconds
+    :rtype:     int
+    """
+    return int(_time.monotonic() * 1000 * 1000)
+
+
+def ticks_add(ticks: int, delta: int) -> int:
+    """
+    Offset ticks value by a given number
+
+    :param      ticks:  The ticks
+    :type       ticks:  int
+    :param      delta:  The delta, can be positive or negative
+    :type       delta:  int
+
+    :returns:   The new ticks value
+    :rtype:     int
+    """
+    return ticks + delta
+
+
+def ticks_diff(ticks1: int, ticks2: int) -> int:
+    """
+    Measure the signed difference between two ticks values
+
+    :param      ticks1:  The later ticks value
+    :type       ticks1:  int
+    :param      ticks2:  The earlier ticks value
+    :type       ticks2:  int
+
+    :returns:   Difference of ticks1 and ticks2
+    :rtype:     int
+    """
+    return ticks1 - ticks2
+
+
+def sleep_ms(ms: int) -> None:
+    """
+    Delay for given number of milliseconds
+
+    :param      ms:   Milliseconds to sleep
+    :type       ms:   int
+    """
+    _time.sleep(ms / 1000.0)
+
+
+def sleep_us(us: int) -> None:
+    """
+    Delay for given number of microseconds
+
+    :param      us:   Microseconds to sleep
+    :type       us:   int
+    """
+    _time.sleep(us / 1000.0 / 1000.0)
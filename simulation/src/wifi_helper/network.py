@@ -24,6 +24,18 @@ AUTH_WPA_PSK = 3
 AUTH_WPA2_PSK = 4
 AUTH_WPA_WPA2_PSK = 5
 
+# station status values as reported by an ESP32
+STAT_IDLE = 1000
+STAT_CONNECTING = 1001
+STAT_GOT_IP = 1010
+STAT_BEACON_TIMEOUT = 200
+STAT_NO_AP_FOUND = 201
+STAT_WRONG_PASSWORD = 202
+STAT_ASSOC_FAIL = 203
+STAT_HANDSHAKE_TIMEOUT = 204
+# ESP32 reports failed connections as STAT_ASSOC_FAIL, other ports use this
+STAT_CONNECT_FAIL = STAT_ASSOC_FAIL
+
 
 class NetworkHelper(object):
     """docstring for NetworkHelper"""
@@ -462,10 +474,17 @@ class NetworkHelper(object):
 
 class Station(NetworkHelper):
     """docstring for Station"""
+    # password rejected by every simulated network, None to accept all
+    wrong_password = None
+
     def __init__(self):
         self._connected = False
         self._active = False
         self._connected_network = None
+        self._bssid = None
+        self._rssi = -60
+        self._status = STAT_IDLE
+        self._static_ifconfig = None
 
     def active(self, is_active: Optional[bool] = None) -> Union[None, bool]:
         """
@@ -489,6 +508,10 @@ class Station(NetworkHelper):
         """
         Connect to a network
 
+        Like on a device the attempt fails with STAT_NO_AP_FOUND if the
+        network is not part of the scan result and with STAT_WRONG_PASSWORD
+        if the key equals the configured wrong password.
+
         :param      service_id:  The service identifier (BSSID/MAC address)
         :type       service_id:  str
         :param      key:         The key (password)
@@ -496,13 +519,25 @@ class Station(NetworkHelper):
         :param      kwargs:      The keywords arguments
         :type       kwargs:      dictionary
         """
-        # remember connected BSSID
+        # remember connected network and optionally specified BSSID
         self._connected_network = service_id
-        self.connected = True
+        self._bssid = kwargs.get('bssid')
+
+        if service_id not in [net[0] for net in self.scan()]:
+            self.connected = False
+            self._status = STAT_NO_AP_FOUND
+        elif (self.wrong_password is not None and
+                key == self.wrong_password):
+            self.connected = False
+            self._status = STAT_WRONG_PASSWORD
+        else:
+            self.connected = True
+            self._status = STAT_GOT_IP
 
     def disconnect(self) -> None:
         """Disconnect from network."""
         self.connected = False
+        self._status = STAT_IDLE
 
     def isconnected(self) -> bool:
         """
@@ -526,30 +561,44 @@ class Station(NetworkHelper):
         """
         Query dynamic status information of the interface
 
+        Without a parameter the link status is returned, one of the STAT_*
+        values. It is STAT_IDLE before a connect and after a disconnect,
+        STAT_GOT_IP after a successful connect and STAT_NO_AP_FOUND or
+        STAT_WRONG_PASSWORD after a failed one. The parameter 'rssi' returns
+        the signal strength of the connection in dBm.
+
         :param      param:  The status parameter to retrieve
         :type       param:  Optional[str]
 
         :returns:   Status information
         :rtype:     Union[str, int, tuple]
         """
-        if param is not None:
+        if param == 'rssi':
+            return self._rssi
+        elif param is not None:
             return self.isconnected()
         else:
-            pass
+            return self._status
 
     def ifconfig(self,
                  value: Optional[Tuple[str, str, str, str]] = None) -> Union[None, Tuple[str, str, str, str]]:  # noqa: E501
         """
         Get/set IP-level network interface parameters
 
-        :param      value:  The value to set
+        A static configuration is returned until 'dhcp' is set as value.
+
+        :param      value:  The static configuration or 'dhcp' to set
         :type       value:  Optional[Tuple[str, str, str, str]]
 
         :returns:   A 4-tuple with information about IO, subnet, gateway, DNS
         :rtype:     Union[None, Tuple[str, str, str, str]]
         """
-        if value is not None:
-            print('Change of ifconfig not supported')
+        if value == 'dhcp':
+            self._static_ifconfig = None
+        elif value is not None:
+            self._static_ifconfig = tuple(value)
+        elif self._static_ifconfig is not None:
+            return self._static_ifconfig
         else:
             return self._gather_ifconfig_data()
 
@@ -11,17 +11,50 @@ Connect to specified network(s) or create an accesspoint
 import json
 from machine import machine
 from . import network
-import time
+import _thread
+import utime as time
 from collections import namedtuple
 
+from generic_helper import Message
 from time_helper import TimeHelper
 
 # not natively supported on micropython, see lib/typing.py
-from typing import (List, NamedTuple, Union)
+from typing import (List, NamedTuple, Optional, Union)
 
 
 class WifiHelper(object):
     """docstring for WifiHelper"""
+    # station states after which waiting for a connection is pointless
+    CONNECT_FAILURES = tuple(
+        getattr(network, name) for name in ('STAT_WRONG_PASSWORD',
+                                            'STAT_NO_AP_FOUND',
+                                            'STAT_CONNECT_FAIL')
+        if hasattr(network, name)
+    )
+
+    # interface objects, created once and shared by all instances
+    _interfaces = dict()
+
+    # set with the timestamp of the first successful time sync
+    time_synced = Message()
+    _time_sync_lock = _thread.allocate_lock()
+    _time_sync_backoff_initial = 1000   # milliseconds
+    _time_sync_backoff_max = 60000  # milliseconds
+    _time_sync_timeline = None
+
+    # timelines of the latest connection attempts, oldest first
+    timelines = list()
+    _timelines_max = 8
+
+    # sort keys of the scan result ordered by the strongest signal first
+    SIGNAL_KEYS = ('RSSI', 'quality')
+
+    # record of a scanned network, defined once for all scans
+    SCAN_RECORD_FIELDS = (
+        'ssid', 'bssid', 'channel', 'RSSI', 'authmode', 'hidden', 'quality'
+    )
+    ScanRecord = namedtuple('ScanRecord', SCAN_RECORD_FIELDS)
+
     def __init__(self):
         self._scan_info = [
             'ssid', 'bssid', 'channel', 'RSSI', 'authmode', 'hidden'
@@ -34,16 +67,81 @@ class WifiHelper(object):
             4: "WPA/WPA2-PSK"
         }
         self._network_list = list()
-        self._station = network.WLAN(network.STA_IF)
+        # sorted and collapsed views of the latest scan
+        self._sorted_networks = dict()
+        self._network_records = None
+        self._station = WifiHelper._get_interface(network.STA_IF)
+
+    @staticmethod
+    def _get_interface(interface: int) -> network.WLAN:
+        """
+        Get the network interface object, create it on first usage
+
+        :param      interface:  The interface, STA_IF or AP_IF
+        :type       interface:  int
+
+        :returns:   The network interface object
+        :rtype:     network.WLAN
+        """
+        if interface not in WifiHelper._interfaces:
+            WifiHelper._interfaces[interface] = network.WLAN(interface)
+
+        return WifiHelper._interfaces[interface]
+
+    @staticmethod
+    def _new_timeline(ssid: Optional[str] = None) -> dict:
+        """
+        Create a timeline of a connection attempt.
+
+        The timeline is added to @see timelines, only the latest ones are
+        kept. Phases are added with @see _mark as name and milliseconds since
+        the start of the attempt.
+
+        :param      ssid:  The SSID of the network
+        :type       ssid:  Optional[str]
+
+        :returns:   The timeline
+        :rtype:     dict
+        """
+        timeline = {
+            'ssid': ssid,
+            'start': time.ticks_ms(),
+            'phases': [],
+            'result': None,
+            'status': None,
+        }
+        WifiHelper.timelines.append(timeline)
+        del WifiHelper.timelines[:-WifiHelper._timelines_max]
+
+        return timeline
+
+    @staticmethod
+    def _mark(timeline: Optional[dict], phase: str) -> None:
+        """
+        Add a phase to a timeline of a connection attempt.
+
+        :param      timeline:  The timeline, nothing is done if None
+        :type       timeline:  Optional[dict]
+        :param      phase:     The name of the finished phase
+        :type       phase:     str
+        """
+        if timeline is not None:
+            timeline['phases'].append(
+                [phase, time.ticks_diff(time.ticks_ms(), timeline['start'])])
 
     @staticmethod
     def _do_connect(station: network.WLAN,
                     ssid: str,
                     password: str,
-                    timeout: int) -> bool:
+                    timeout: int,
+                    timeline: Optional[dict] = None) -> bool:
         """
         Establish the network connection.
 
+        The station status is checked while waiting for the connection. The
+        attempt is aborted as soon as the station reports a wrong password, a
+        not found network or a failed connection.
+
         :param      station:   The network object
         :type       station:   network.WLAN
         :param      ssid:      The SSID of the network to connect to
@@ -52,11 +150,16 @@ class WifiHelper(object):
         :type       password:  str
         :param      timeout:   Seconds to establish a connection to the network
         :type       timeout:   int, optional
+        :param      timeline:  The timeline of the attempt, created if None
+        :type       timeline:  dict, optional
 
         :returns:   Result of connection
         :rtype:     bool
         """
         is_successfull = False
+        if timeline is None:
+            timeline = WifiHelper._new_timeline()
+        timeline['ssid'] = ssid
 
         print('Connect to network "{}" with password "{}"'.
               format(ssid, '*' * 8))
@@ -67,28 +170,52 @@ class WifiHelper(object):
             if station.isconnected():
                 print('System already connected')
                 is_successfull = True
+                WifiHelper._mark(timeline, 'connected')
+                timeline['result'] = is_successfull
                 return is_successfull
 
         try:
-            station.disconnect()
-            time.sleep(250 / 1000)
+            # an ongoing or failed attempt has to be stopped before a new one
+            if station.status() != network.STAT_IDLE:
+                station.disconnect()
+                time.sleep_ms(250)
+                WifiHelper._mark(timeline, 'disconnect')
             station.connect(ssid, password)
+            WifiHelper._mark(timeline, 'connect')
         except Exception as e:
             print('Failed to connect due to: {}'.format(e))
+            WifiHelper._mark(timeline, 'error')
+            timeline['result'] = is_successfull
             return is_successfull
 
-        # get current system timestamp in seconds since 01/01/2000
-        now = time.time()
+        start = time.ticks_ms()
 
         # wait for connection no longer than the specified timeout
-        while (time.time() < (now + timeout)):
+        while time.ticks_diff(time.ticks_ms(), start) < timeout * 1000:
             if station.isconnected():
                 is_successfull = True
+                WifiHelper._mark(timeline, 'got_ip')
+                timeline['result'] = is_successfull
+                return is_successfull
+
+            status = station.status()
+            if status in WifiHelper.CONNECT_FAILURES:
+                # keep the status for the caller, the driver stopped already
+                print('Connection to "{}" failed with status {} after {} ms'.
+                      format(ssid,
+                             status,
+                             time.ticks_diff(time.ticks_ms(), start)))
+                WifiHelper._mark(timeline, 'failed')
+                timeline['result'] = is_successfull
+                timeline['status'] = status
                 return is_successfull
-            else:
-                pass
 
-            time.sleep(100 / 1000)
+            time.sleep_ms(100)
+
+        # stop the ongoing attempt
+        station.disconnect()
+        WifiHelper._mark(timeline, 'timeout')
+        timeline['result'] = is_successfull
 
         return is_successfull
 
@@ -116,13 +243,16 @@ class WifiHelper(object):
         :rtype:     bool
         """
         is_connected = False
+        timeline = None
 
         # configure the WiFi as station mode (client)
-        station = network.WLAN(network.STA_IF)
+        station = WifiHelper._get_interface(network.STA_IF)
 
         # activate WiFi if not yet enabled
         if not station.active():
+            timeline = WifiHelper._new_timeline()
             station.active(True)
+            WifiHelper._mark(timeline, 'active')
 
         if station.isconnected():
             current_network = station.config('essid')
@@ -133,14 +263,12 @@ class WifiHelper(object):
             else:
                 is_connected = True
 
-                th = TimeHelper()
-                th.sync_time()
+                WifiHelper.schedule_time_sync()
                 print(station.ifconfig())
 
                 return is_connected
 
-        # get current system timestamp in seconds since 01/01/2000
-        now = time.time()
+        start = time.ticks_ms()
 
         if ((type(ssid) is str) and (type(password) is str)):
             # user provided string of single network to connect to
@@ -149,7 +277,8 @@ class WifiHelper(object):
             is_connected = WifiHelper._do_connect(station=station,
                                                   ssid=ssid,
                                                   password=password,
-                                                  timeout=timeout)
+                                                  timeout=timeout,
+                                                  timeline=timeline)
             print('Connected to {}: {}'.format(ssid, is_connected))
         elif ((type(ssid) is list) and
               (type(password) is list)):
@@ -160,7 +289,9 @@ class WifiHelper(object):
                 is_connected = WifiHelper._do_connect(station=station,
                                                       ssid=s,
                                                       password=password[idx],
-                                                      timeout=timeout)
+                                                      timeout=timeout,
+                                                      timeline=timeline)
+                timeline = None
                 print('Connected to {}: {}'.format(s, is_connected))
                 if is_connected:
                     break
@@ -173,20 +304,21 @@ class WifiHelper(object):
                 is_connected = WifiHelper._do_connect(station=station,
                                                       ssid=ssid,
                                                       password=password,
-                                                      timeout=timeout)
+                                                      timeout=timeout,
+                                                      timeline=timeline)
+                timeline = None
                 print('Connected to {}: {}'.format(ssid, is_connected))
                 if is_connected:
                     break
         else:
             print('SSID and/or password neither list nor string')
 
-        print('Stopped trying to connect to network after {} seconds'.
-              format(time.time() - now))
+        print('Stopped trying to connect to network after {} ms'.
+              format(time.ticks_diff(time.ticks_ms(), start)))
 
         if is_connected:
             print('Connection successful')
-            th = TimeHelper()
-            th.sync_time()
+            WifiHelper.schedule_time_sync(timeline=WifiHelper.timelines[-1])
         else:
             print('Connection timeout of failed to connect')
             print('Please check configured SSID and password')
@@ -196,6 +328,60 @@ class WifiHelper(object):
         # return True if connection has been established
         return is_connected
 
+    @staticmethod
+    def schedule_time_sync(timeline: Optional[dict] = None) -> bool:
+        """
+        Sync the time with a NTP server in the background.
+
+        The sync is retried with exponentially increasing delays until it
+        succeeded, @see time_synced is set afterwards. Nothing is done if the
+        time has already been synced or a sync is ongoing.
+
+        :param      timeline:  The timeline of the connection attempt
+        :type       timeline:  Optional[dict]
+
+        :returns:   Flag whether a new background sync has been started
+        :rtype:     bool
+        """
+        if WifiHelper.time_synced.is_set():
+            return False
+
+        if not WifiHelper._time_sync_lock.acquire(0):
+            # sync already ongoing
+            return False
+
+        WifiHelper._time_sync_timeline = timeline
+        _thread.start_new_thread(WifiHelper._time_sync_worker, ())
+
+        return True
+
+    @staticmethod
+    def _time_sync_worker() -> None:
+        """Sync the time until it succeeded, release the lock afterwards."""
+        backoff = WifiHelper._time_sync_backoff_initial
+        th = TimeHelper()
+
+        try:
+            while True:
+                try:
+                    # older TimeHelper versions return None after a sync
+                    result = th.sync_time() is not False
+                except Exception as e:
+                    print('Failed to sync time due to: {}'.format(e))
+                    result = False
+
+                if result:
+                    WifiHelper.time_synced.set(time.time())
+                    WifiHelper._mark(WifiHelper._time_sync_timeline,
+                                     'time_sync')
+                    break
+
+                print('Retry time sync in {} ms'.format(backoff))
+                time.sleep_ms(backoff)
+                backoff = min(backoff * 2, WifiHelper._time_sync_backoff_max)
+        finally:
+            WifiHelper._time_sync_lock.release()
+
     @property
     def isconnected(self) -> bool:
         """
@@ -241,7 +427,7 @@ class WifiHelper(object):
         is_successfull = True
 
         # configure the WiFi as accesspoint mode (server)
-        accesspoint = network.WLAN(network.AP_IF)
+        accesspoint = WifiHelper._get_interface(network.AP_IF)
 
         # activate accesspoint if not yet enabled
         if not accesspoint.active():
@@ -266,19 +452,18 @@ class WifiHelper(object):
                            password=password,
                            channel=channel)
 
-        # get current system timestamp in seconds since 01/01/2000
-        now = time.time()
+        start = time.ticks_ms()
 
         # wait for success no longer than the specified timeout
-        while (time.time() < (now + timeout)):
+        while time.ticks_diff(time.ticks_ms(), start) < timeout * 1000:
             if accesspoint.active():
                 is_successfull = True
                 break
-            else:
-                pass
 
-        print('Stopped trying to setup AccessPoint after {} seconds'.
-              format(time.time() - now))
+            time.sleep_ms(10)
+
+        print('Stopped trying to setup AccessPoint after {} ms'.
+              format(time.ticks_diff(time.ticks_ms(), start)))
 
         if is_successfull:
             print('AccessPoint setup successful')
@@ -359,25 +544,46 @@ class WifiHelper(object):
                 except Exception:
                     pass
 
+        # strongest signal first, equal signals by SSID
+        self._network_list.sort(key=lambda net: (-net['RSSI'], net['ssid']))
+        self._sorted_networks = dict()
+        self._network_records = None
+
     @property
     def networks(self) -> List[NamedTuple]:
         """
         Get list of available networks
 
-        :returns:   List of NamedTuple networks
+        The records are created once per scan and returned from a cache until
+        the next scan.
+
+        :returns:   List of ScanRecord networks
         :rtype:     List[NamedTuple]
         """
-        return [namedtuple('net', list(net.keys()))(*net.values()) for net in self._network_list]   # noqa: E501
+        if self._network_records is None:
+            self._network_records = [
+                self.ScanRecord(*[net[field]
+                                  for field in self.SCAN_RECORD_FIELDS])
+                for net in self._network_list
+            ]
+
+        return self._network_records
 
     def get_wifi_networks_sorted(self,
                                  rescan: bool = False,
                                  scan_if_empty: bool = False,
                                  as_json: bool = False,
-                                 sort_key: str = 'RSSI') -> Union[List[dict],
-                                                                  str]:
+                                 sort_key: str = 'RSSI',
+                                 unique: bool = False) -> Union[List[dict],
+                                                                str]:
         """
         Get the available WiFi networks in sorted order.
 
+        Networks are sorted by the sort key, the strongest signal first for
+        'RSSI' and 'quality', ascending for all other keys. Equal values are
+        ordered by RSSI and SSID. The result is sorted once per scan and
+        returned from a cache until the next scan.
+
         :param      rescan:         Flag to scan before returning result
         :type       rescan:         bool
         :param      scan_if_empty:  Flag to scan if network list is empty
@@ -386,23 +592,79 @@ class WifiHelper(object):
         :type       as_json:        bool
         :param      sort_key:       The sort key
         :type       sort_key:       str
+        :param      unique:         Flag to return only the accesspoint with
+                                    the strongest signal of each SSID, with
+                                    the number of its accesspoints as
+                                    'bssid_count'
+        :type       unique:         bool
 
         :returns:   The available WiFi networks in sorted order.
         :rtype:     Union[List[dict], str]
         """
-        if (scan_if_empty and not len(self.networks)) or rescan:
+        if (scan_if_empty and not len(self._network_list)) or rescan:
             self.scan_networks()
 
-        if not (sort_key in self.scan_info):
+        if not (sort_key in self.scan_info or sort_key == 'quality'):
             sort_key = 'RSSI'
 
-        # sort list by specified sort_key
-        sorted(self._network_list, key=lambda k: k[sort_key])
+        cache_key = (sort_key, unique)
+        if cache_key not in self._sorted_networks:
+            self._sorted_networks[cache_key] = self._sort_networks(
+                sort_key=sort_key,
+                unique=unique)
+        networks = self._sorted_networks[cache_key]
 
         if as_json:
-            return json.dumps(self._network_list)
+            return json.dumps(networks)
         else:
-            return self._network_list
+            return networks
+
+    def _sort_networks(self, sort_key: str, unique: bool) -> List[dict]:
+        """
+        Sort the networks of the latest scan.
+
+        The scan result is already sorted by RSSI and SSID.
+
+        :param      sort_key:  The sort key
+        :type       sort_key:  str
+        :param      unique:    Flag to collapse accesspoints of the same SSID
+        :type       unique:    bool
+
+        :returns:   The sorted networks
+        :rtype:     List[dict]
+        """
+        networks = self._network_list
+
+        if unique:
+            # first entry of each SSID has the strongest signal
+            collapsed = dict()
+            networks = list()
+            for net in self._network_list:
+                ssid = net['ssid']
+                if ssid in collapsed:
+                    collapsed[ssid]['bssid_count'] += 1
+                    continue
+                net = dict(net)
+                net['bssid_count'] = 1
+                networks.append(net)
+                if len(ssid):
+                    # accesspoints of hidden networks are not collapsed
+                    collapsed[ssid] = net
+
+        if sort_key == 'RSSI':
+            return networks
+
+        # sort is not stable on MicroPython, the tie break is part of the key
+        if sort_key in self.SIGNAL_KEYS:
+            return sorted(networks,
+                          key=lambda net: (-net[sort_key],
+                                           -net['RSSI'],
+                                           net['ssid']))
+
+        return sorted(networks,
+                      key=lambda net: (net[sort_key],
+                                       -net['RSSI'],
+                                       net['ssid']))
 
     @staticmethod
     def dbm_to_quality(dBm: int) -> int:
@@ -482,6 +744,6 @@ class WifiHelper(object):
         :rtype:     NamedTuple
         """
         _ifconfig = namedtuple('ifconfig', ('ip', 'subnet', 'gateway', 'dns'))
-        ap = network.WLAN(network.AP_IF)
+        ap = WifiHelper._get_interface(network.AP_IF)
 
         return _ifconfig(*ap.ifconfig())
@@ -2,3 +2,5 @@
 # -*- coding: UTF-8 -*-
 
 from .wifi_manager import WiFiManager
+from .storage import ConfigStorage, DirectoryStorage, \
+    EncryptedFileStorage, MemoryStorage
@@ -16,14 +16,21 @@ establish and to get the latest available networks as JSON
 """
 
 # system packages
+import asyncio
 import binascii as ubinascii
 from Crypto.Cipher import AES
 import gc
+import io
 import json
-from machine import machine, Timer
+from machine import machine, RTC, Timer
+import os
 from pathlib import Path
+import random
+import socket
+import struct
 import _thread
-import time
+import utime as time
+import zlib
 # import ucryptolib
 
 # pip installed packages
@@ -34,10 +41,13 @@ from flask import Flask, render_template, url_for, redirect, request, \
 from generic_helper import GenericHelper
 from generic_helper import Message
 from path_helper import PathHelper
+from time_helper import TimeHelper
+from wifi_helper import network
 from wifi_helper import WifiHelper
+from .storage import ConfigStorage, EncryptedFileStorage
 
 # typing natively supported on python
-from typing import List, Union
+from typing import List, Tuple, Union, Callable
 from unittest.mock import Mock
 
 gc.collect = Mock()
@@ -50,6 +60,63 @@ class WiFiManager(object):
     CONNECTION_ISSUE_TIMEOUT = 1
     CONNECTION_ISSUE_NOT_CONFIGURED = 2
 
+    # station states after which waiting for a connection is pointless
+    CONNECT_FAILURES = tuple(
+        getattr(network, name) for name in ('STAT_WRONG_PASSWORD',
+                                            'STAT_NO_AP_FOUND',
+                                            'STAT_CONNECT_FAIL')
+        if hasattr(network, name)
+    )
+
+    # station states counting towards a quarantine of the network
+    QUARANTINE_FAILURES = tuple(
+        getattr(network, name) for name in ('STAT_WRONG_PASSWORD',
+                                            'STAT_NO_AP_FOUND')
+        if hasattr(network, name)
+    )
+
+    # boot state block in RTC memory, kept across warm reboots. Magic, version,
+    # index and CRC32 of the SSID of the last good network, last time sync in
+    # seconds and number of failure counters, followed by one failure counter
+    # byte per network
+    BOOT_STATE_MAGIC = b'WM'
+    BOOT_STATE_VERSION = 2
+    BOOT_STATE_FORMAT = '<2sBBIIB'
+
+    # plain header of the encrypted WiFi config file. Magic, version, length
+    # and CRC32 of the following ciphertext, checked before decrypting it
+    CONFIG_FILE_MAGIC = b'WMF'
+    CONFIG_FILE_VERSION = 1
+    CONFIG_FILE_FORMAT = '<3sBII'
+    # file of an interrupted write and the retained previous generation
+    CONFIG_TMP_SUFFIX = '.tmp'
+    CONFIG_BACKUP_SUFFIX = '.bak'
+
+    # binary format of the encrypted WiFi config. Magic and version, followed
+    # by records of type, payload length and JSON encoded payload. Records are
+    # appended as journal, each append is padded with zeros to a full AES
+    # block, a record of type 0 is this padding
+    CONFIG_MAGIC = b'WMC'
+    CONFIG_VERSION = 1
+    CONFIG_HEADER_FORMAT = '<3sB'
+    CONFIG_RECORD_FORMAT = '<BH'
+    CONFIG_RECORD_END = 0
+    CONFIG_RECORD_NETWORK = 1
+    # zlib compressed payload containing further records
+    CONFIG_RECORD_ZLIB = 2
+    # SSID of the networks to remove
+    CONFIG_RECORD_REMOVE = 3
+    # SSID followed by the values of all NETWORK_META_FIELDS, None if unset
+    CONFIG_RECORD_META = 4
+
+    # optional metadata of each configured network, updated without the
+    # credentials. Last success in seconds, only set with a synced time,
+    # learned timeout in milliseconds. The sequence number of the last success
+    # orders the successes of all networks without a synced time
+    NETWORK_META_FIELDS = ('priority', 'last_success', 'last_bssid',
+                           'last_channel', 'successes', 'failures', 'timeout',
+                           'sequence')
+
     def __init__(self, logger=None, quiet=False, name=__name__):
         # setup and configure logger if none is provided
         if logger is None:
@@ -59,6 +126,7 @@ class WiFiManager(object):
         self.logger = logger
         self.logger.disabled = quiet
         self._config_file = (Path(__file__).parent / '..' / '..').resolve() / 'wifi-secure.json'    # noqa: E501
+        self._state_file = (Path(__file__).parent / '..' / '..').resolve() / 'wifi-state.json'  # noqa: E501
         print('Config file at: {}'.format(self._config_file))
 
         flask_root_folder = (Path(__file__).parent / '..' / '..').resolve()
@@ -85,6 +153,74 @@ class WiFiManager(object):
         self._selected_network_bssid = ''
         self._connection_timeout = 5
         self._connection_result = self.ERROR
+        self._connection_plan = list()
+        self._connection_timing = dict()
+        self._timelines = list()
+        self._timelines_max = 8
+        self._state = dict()
+        self._state_changed = False
+
+        # per network connection timeout specific defines
+        self._timeout_samples = 10
+        self._timeout_margin = 1000     # milliseconds
+
+        # network quarantine specific defines
+        self._quarantine_after = 3
+        self._quarantine_max = 64   # connection attempts
+        # SSIDs skipped during this boot, None until counted down once
+        self._quarantined = None
+        self._last_status = None
+
+        # boot state specific defines
+        self._boot_state = {
+            'index': None, 'ssid': 0, 'failures': list(), 'synced': 0
+        }
+        self._boot_failures_defer = 2
+
+        # time sync specific defines, used without WifiHelper time sync
+        self._time_sync_lock = _thread.allocate_lock()
+        self._time_synced = 0   # seconds since epoch of the last sync
+
+        # connection supervisor specific defines
+        self._supervisor_interval = 5000    # milliseconds
+        self._outage_budget = 300   # seconds
+        self._backoff_initial = 1000    # milliseconds
+        self._backoff_max = 60000   # milliseconds
+
+        # IP configuration cache specific defines
+        self._cache_ifconfig = False
+        self._static_ifconfig = None
+        # SSIDs reported by the validation thread, applied to the state file
+        # in the main context
+        self._invalid_ifconfig = list()
+
+        # WiFi config file specific defines
+        self._compress_config = False
+        self._config_chunk_size = 64    # bytes, multiple of AES block size
+        self._config_garbage = 0    # records
+        self._config_garbage_limit = 8  # records
+        self._config_lock = _thread.allocate_lock()
+        # in memory view of the WiFi config, written back on flush
+        self._config_cache = None
+        self._config_index = dict()     # SSID -> position in view
+        self._config_pending = list()
+        self._config_flush_delay = 2000    # milliseconds
+        self._config_flush_timer = None
+        # storage of the networks, the encrypted config file if not set
+        self._config_storage = None
+        self._config_capacity = 0  # networks, 0 for no limit
+        # metadata of each attempt is kept in the state file, the config gets
+        # a metadata record of a network at most once per interval
+        self._meta_sync_interval = 86400    # seconds
+
+        # roaming specific defines
+        self._roaming = True
+        self._roam_hysteresis = 8   # dB
+        self._roam_interval = 60000     # milliseconds
+        self._last_roam = None
+        self._roamed_from = None    # BSSID left by the latest roam
+        self._connected_at = None   # ticks of the latest connection
+        self._last_scan = None      # ticks of the latest own scan
 
         # WiFi scan specific defines
         self._scan_lock = _thread.allocate_lock()
@@ -134,221 +270,2872 @@ class WiFiManager(object):
     @connection_timeout.setter
     def connection_timeout(self, value: int) -> None:
         """
-        Set the WiFi connection timeout in seconds.
+        Set the WiFi connection timeout in seconds.
+
+        Values below 3 sec are set to 3 sec.
+
+        :param      value:  Timeout of WiFi connection per network in seconds
+        :type       value:  int
+        """
+        if isinstance(value, int):
+            if value < 3:
+                value = 3
+            self._connection_timeout = value
+
+    @property
+    def connection_result(self) -> int:
+        """
+        Get connection issue error code
+
+        :returns:   Connection issue error
+        :rtype:     int
+        """
+        return self._connection_result
+
+    @property
+    def connection_plan(self) -> List[dict]:
+        """
+        Get the plan of the latest connection attempt.
+
+        Each entry describes a configured network in the order it has been
+        tried. Passwords are not part of the plan.
+
+        :returns:   Planned networks with SSID, RSSI, BSSID, channel, priority
+        :rtype:     List[dict]
+        """
+        return self._connection_plan
+
+    @property
+    def connection_timing(self) -> dict:
+        """
+        Get the timing of the latest connection attempt.
+
+        :returns:   Duration of scan, connection and in total in milliseconds
+        :rtype:     dict
+        """
+        return self._connection_timing
+
+    @property
+    def connection_timelines(self) -> List[dict]:
+        """
+        Get the timelines of the latest connection attempts, oldest first.
+
+        Each timeline contains the SSID, the start in millisecond ticks, the
+        finished phases as name and milliseconds since the start, the result
+        and the failure status of one attempt.
+
+        :returns:   Timelines of the latest connection attempts
+        :rtype:     List[dict]
+        """
+        return list(self._timelines)
+
+    @property
+    def supervisor_interval(self) -> int:
+        """
+        Get the interval to check the connection while connected.
+
+        :returns:   Check interval in milliseconds
+        :rtype:     int
+        """
+        return self._supervisor_interval
+
+    @supervisor_interval.setter
+    def supervisor_interval(self, value: int) -> None:
+        """
+        Set the interval to check the connection while connected.
+
+        Values below 100 ms are set to 100 ms.
+
+        :param      value:  Check interval in milliseconds
+        :type       value:  int
+        """
+        if isinstance(value, int):
+            if value < 100:
+                value = 100
+            self._supervisor_interval = value
+
+    @property
+    def outage_budget(self) -> int:
+        """
+        Get the time without a connection before starting the config portal.
+
+        :returns:   Outage budget in seconds
+        :rtype:     int
+        """
+        return self._outage_budget
+
+    @outage_budget.setter
+    def outage_budget(self, value: int) -> None:
+        """
+        Set the time without a connection before starting the config portal.
+
+        Negative values are set to 0, the portal is started after the first
+        failed reconnection in this case.
+
+        :param      value:  Outage budget in seconds
+        :type       value:  int
+        """
+        if isinstance(value, int):
+            if value < 0:
+                value = 0
+            self._outage_budget = value
+
+    @property
+    def cache_ifconfig(self) -> bool:
+        """
+        Get the flag to cache the IP configuration of each network.
+
+        :returns:   Flag whether the IP configuration is cached or not
+        :rtype:     bool
+        """
+        return self._cache_ifconfig
+
+    @cache_ifconfig.setter
+    def cache_ifconfig(self, value: bool) -> None:
+        """
+        Set the flag to cache the IP configuration of each network.
+
+        The IP configuration of a network is saved after a connection using
+        DHCP. It is applied as static configuration on the next direct
+        connection to this network, see @see load_and_connect, and validated
+        in the background. DHCP is used again if the validation failed.
+
+        :param      value:  Flag to cache the IP configuration
+        :type       value:  bool
+        """
+        if isinstance(value, bool):
+            self._cache_ifconfig = value
+
+    @property
+    def config_flush_delay(self) -> int:
+        """
+        Get the delay to write changes of the WiFi config to its file.
+
+        :returns:   Delay in milliseconds after the last change
+        :rtype:     int
+        """
+        return self._config_flush_delay
+
+    @config_flush_delay.setter
+    def config_flush_delay(self, value: int) -> None:
+        """
+        Set the delay to write changes of the WiFi config to its file.
+
+        Each change restarts the delay, several changes in a row are written
+        at once. Use 0 to write each change immediately.
+
+        :param      value:  Delay in milliseconds after the last change
+        :type       value:  int
+        """
+        if isinstance(value, int):
+            if value < 0:
+                value = 0
+            self._config_flush_delay = value
+
+    @property
+    def config_dirty(self) -> bool:
+        """
+        Get the flag whether changes of the WiFi config are not yet written.
+
+        :returns:   Flag whether changes are pending
+        :rtype:     bool
+        """
+        return len(self._config_pending) > 0
+
+    @property
+    def compress_config(self) -> bool:
+        """
+        Get the flag to compress the WiFi config file.
+
+        :returns:   Flag whether the WiFi config file is compressed or not
+        :rtype:     bool
+        """
+        return self._compress_config
+
+    @compress_config.setter
+    def compress_config(self, value: bool) -> None:
+        """
+        Set the flag to compress the WiFi config file.
+
+        The records are compressed with zlib before they are encrypted. This
+        is only applied on the next save and only if zlib is able to compress
+        on this port, compressed files can be loaded in any case.
+
+        :param      value:  Flag to compress the WiFi config file
+        :type       value:  bool
+        """
+        if isinstance(value, bool):
+            self._compress_config = value
+
+    @property
+    def config_storage(self) -> ConfigStorage:
+        """
+        Get the storage of the configured networks.
+
+        :returns:   The storage backend, by default the encrypted config file
+        :rtype:     ConfigStorage
+        """
+        if self._config_storage is None:
+            return EncryptedFileStorage(manager=self, path=self._config_file)
+
+        return self._config_storage
+
+    @config_storage.setter
+    def config_storage(self, value: Union[ConfigStorage, None]) -> None:
+        """
+        Set the storage of the configured networks.
+
+        Pending changes are written to the previous storage, the networks are
+        loaded from the new storage on their next use. Use None to store the
+        networks in the encrypted config file again.
+
+        :param      value:  The storage backend
+        :type       value:  Union[ConfigStorage, None]
+        """
+        if value is None or isinstance(value, ConfigStorage):
+            self.flush_wifi_config()
+            self._config_storage = value
+            self._config_cache = None
+            self._config_index = dict()
+
+    @property
+    def config_capacity(self) -> int:
+        """
+        Get the maximum number of configured networks.
+
+        :returns:   Maximum number of networks, 0 if not limited
+        :rtype:     int
+        """
+        return self._config_capacity
+
+    @config_capacity.setter
+    def config_capacity(self, value: int) -> None:
+        """
+        Set the maximum number of configured networks.
+
+        If saving networks exceeds the capacity, the networks least recently
+        connected successfully are removed, see @see _evict_networks. A lower
+        capacity is applied the next time a network is saved, other changes
+        like metadata updates never remove networks. Use 0 to not limit the
+        number of networks.
+
+        :param      value:  Maximum number of networks
+        :type       value:  int
+        """
+        if isinstance(value, int):
+            if value < 0:
+                value = 0
+            self._config_capacity = value
+
+    @property
+    def roaming(self) -> bool:
+        """
+        Get the flag to roam between accesspoints of the connected network.
+
+        :returns:   Flag whether roaming is enabled or not
+        :rtype:     bool
+        """
+        return self._roaming
+
+    @roaming.setter
+    def roaming(self, value: bool) -> None:
+        """
+        Set the flag to roam between accesspoints of the connected network.
+
+        While connected the @see supervise task compares the RSSI of the
+        connection with other accesspoints of the same network found by the
+        latest scan. No additional scan is performed for this, only scans of
+        the connection planning or the config portal taken after the current
+        connection has been established are used. The station roams to an
+        accesspoint with a clearly better signal, at most once per minute.
+
+        :param      value:  Flag to enable roaming
+        :type       value:  bool
+        """
+        if isinstance(value, bool):
+            self._roaming = value
+
+    @property
+    def network_health(self) -> dict:
+        """
+        Get the failure counter and quarantine state of the networks.
+
+        Only networks with failed connections are listed. After 3 consecutive
+        connections failing with a wrong password or a not found network the
+        network is skipped for 1 connection attempt. Each further failure
+        doubles this number, up to 64 attempts. A successful connection or
+        saving new credentials of the network resets its state.
+
+        :returns:   Consecutive failures and number of attempts to skip by SSID
+        :rtype:     dict
+        """
+        return {
+            ssid: {'failures': entry[0], 'skip': entry[1]}
+            for ssid, entry in self._state.get('health', dict()).items()
+        }
+
+    @property
+    def network_metadata(self) -> dict:
+        """
+        Get the metadata of the configured networks.
+
+        Only the known fields of @see NETWORK_META_FIELDS are listed, like the
+        time of the last success, BSSID and channel of this connection, the
+        number of successful and failed attempts and the learned timeout.
+        The latest values of the state file override those of the config.
+
+        :returns:   Metadata by SSID
+        :rtype:     dict
+        """
+        return {
+            net['ssid']: self._network_meta(ssid=net['ssid'])
+            for net in self._config_cache or list() if 'ssid' in net
+        }
+
+    def load_and_connect(self) -> bool:
+        """
+        Load configured network credentials and try to connect to those
+
+        After a warm reboot with a remaining connection to the last good
+        network nothing is loaded from flash at all, see @see boot_state.
+        A direct connection to the BSSID of the last successful connection is
+        tried first. If that fails, a single scan is performed, configured
+        networks which are not visible are skipped and the remaining ones are
+        tried in the order of their priority and signal strength, see
+        @see connection_plan. The accesspoint with the strongest signal of a
+        network is tried first, if that fails for another reason than a wrong
+        password the radio may pick any accesspoint of the network.
+
+        :returns:   Result of connection
+        :rtype:     bool
+        """
+        result = False
+        start = time.ticks_ms()
+        self._connection_timing = dict()
+
+        if self._warm_reboot_connected():
+            networks = None
+            result = True
+        else:
+            networks = self._load_networks()
+
+        if networks is not None:
+            networks = self._skip_quarantined(networks=networks)
+            connected = self.wh.isconnected
+            if connected:
+                # WiFi connection remains after a soft reset, no need to scan
+                plan = networks
+            else:
+                fast_start = time.ticks_ms()
+                fast_net = self._fast_reconnect(networks=networks)
+                self._connection_timing['fast'] = time.ticks_diff(
+                    time.ticks_ms(), fast_start)
+
+                if fast_net is not None:
+                    # connected, WifiHelper.connect will return immediately
+                    plan = [fast_net]
+                    connected = True
+                else:
+                    scan_start = time.ticks_ms()
+                    plan = self._plan_connection(networks=networks)
+                    self._connection_timing['scan'] = time.ticks_diff(
+                        time.ticks_ms(), scan_start)
+
+            self._set_connection_plan(plan=plan)
+
+            self.logger.info('Connecting to loaded network config...')
+            connect_start = time.ticks_ms()
+            for net in plan:
+                if not connected and net.get('bssid'):
+                    # use the accesspoint with the strongest signal
+                    if self._connect(net=net, bssid=net['bssid']):
+                        result = True
+                        break
+                    if self._wrong_password():
+                        continue
+                    # let the radio pick any accesspoint of the network
+                timeout = self._network_timeout(ssid=net['ssid'])
+                if not connected:
+                    self._mark_boot_attempt(ssid=net['ssid'])
+                attempt_start = time.ticks_ms()
+                result = WifiHelper.connect(ssid=net['ssid'],
+                                            password=net['password'],
+                                            timeout=timeout / 1000,
+                                            reconnect=False)
+                if not connected:
+                    timelines = getattr(WifiHelper, 'timelines', None)
+                    if timelines:
+                        self._add_timeline(timeline=timelines[-1])
+                    status = None if result else self.wh.station.status()
+                    self._record_attempt(ssid=net['ssid'],
+                                         result=result,
+                                         duration=time.ticks_diff(
+                                             time.ticks_ms(), attempt_start),
+                                         timeout=timeout,
+                                         status=status)
+                if result:
+                    break
+            self._connection_timing['connect'] = time.ticks_diff(
+                time.ticks_ms(), connect_start)
+            self.logger.debug('Result of connection: {}'.format(result))
+
+            if result is False:
+                self._connection_result = self.CONNECTION_ISSUE_TIMEOUT
+                if self._state_changed:
+                    self._save_state()
+            else:
+                self._remember_connection(plan=plan)
+        elif not result:
+            self._connection_result = self.CONNECTION_ISSUE_NOT_CONFIGURED
+
+        self._connection_timing['total'] = time.ticks_diff(time.ticks_ms(),
+                                                           start)
+        self.logger.debug('Connection timing: {}'.
+                          format(self._connection_timing))
+
+        return result
+
+    async def load_and_connect_async(self) -> bool:
+        """
+        Load configured network credentials and try to connect to those
+
+        Coroutine version of @see load_and_connect. The connection is
+        established in the same order, but other tasks keep running while
+        waiting for the association of each network. The connection result
+        is set the same way.
+
+        :returns:   Result of connection
+        :rtype:     bool
+        """
+        result = False
+        start = time.ticks_ms()
+        self._connection_timing = dict()
+
+        if self._warm_reboot_connected():
+            networks = None
+            result = True
+        else:
+            networks = self._load_networks()
+
+        if networks is not None:
+            networks = self._skip_quarantined(networks=networks)
+            if self.wh.isconnected:
+                # WiFi connection remains after a soft reset, no need to scan
+                plan = networks
+                result = True
+            else:
+                fast_start = time.ticks_ms()
+                fast_net = await self._fast_reconnect_async(networks=networks)
+                self._connection_timing['fast'] = time.ticks_diff(
+                    time.ticks_ms(), fast_start)
+
+                if fast_net is not None:
+                    plan = [fast_net]
+                    result = True
+                else:
+                    scan_start = time.ticks_ms()
+                    plan = self._plan_connection(networks=networks)
+                    self._connection_timing['scan'] = time.ticks_diff(
+                        time.ticks_ms(), scan_start)
+
+            self._set_connection_plan(plan=plan)
+
+            connect_start = time.ticks_ms()
+            if not result:
+                self.logger.info('Connecting to loaded network config...')
+                for net in plan:
+                    result = await self._connect_async(
+                        net=net,
+                        bssid=net.get('bssid'))
+                    if (not result and net.get('bssid') and
+                            not self._wrong_password()):
+                        # let the radio pick any accesspoint of the network
+                        result = await self._connect_async(net=net)
+                    self.logger.debug('Connected to {}: {}'.
+                                      format(net['ssid'], result))
+                    if result:
+                        break
+            self._connection_timing['connect'] = time.ticks_diff(
+                time.ticks_ms(), connect_start)
+            self.logger.debug('Result of connection: {}'.format(result))
+
+            if result is False:
+                self._connection_result = self.CONNECTION_ISSUE_TIMEOUT
+                if self._state_changed:
+                    self._save_state()
+            else:
+                self._remember_connection(plan=plan)
+        elif not result:
+            self._connection_result = self.CONNECTION_ISSUE_NOT_CONFIGURED
+
+        self._connection_timing['total'] = time.ticks_diff(time.ticks_ms(),
+                                                           start)
+        self.logger.debug('Connection timing: {}'.
+                          format(self._connection_timing))
+
+        return result
+
+    async def supervise(self) -> None:
+        """
+        Keep the station connected to one of the configured networks.
+
+        While connected the connection is checked every
+        @see supervisor_interval, see also @see roaming. After a lost
+        connection the configured networks are tried again with
+        @see load_and_connect_async, failed attempts are repeated after a
+        randomized, exponentially increasing delay. If no connection could be
+        established within the @see outage_budget the config portal is
+        started as task. The connection attempts continue while the portal is
+        running, it is stopped as soon as the station is connected again.
+        Supervision starts over if the portal has been shut down via its
+        webpage.
+
+        Run it as task, cancel the task to stop the supervision.
+        """
+        outage_start = None
+        backoff = self._backoff_initial
+        portal = None
+
+        while True:
+            if portal is not None and portal.done():
+                portal = None
+                outage_start = None
+                backoff = self._backoff_initial
+
+            if self.wh.isconnected:
+                if outage_start is not None:
+                    self.logger.info('Connection restored after {} ms'.format(
+                        time.ticks_diff(time.ticks_ms(), outage_start)))
+                    outage_start = None
+                    backoff = self._backoff_initial
+                if portal is not None:
+                    self.logger.info('Connected, stopping config portal')
+                    await self._stop_portal(portal=portal)
+                    portal = None
+                if self._drop_invalid_ifconfig():
+                    self._save_state()
+                if self.roaming:
+                    await self._roam_async()
+                await asyncio.sleep(self.supervisor_interval / 1000)
+                continue
+
+            if outage_start is None:
+                self.logger.info('Connection lost')
+                outage_start = time.ticks_ms()
+            elif (portal is None and
+                  time.ticks_diff(time.ticks_ms(), outage_start) >=
+                  self.outage_budget * 1000):
+                self.logger.info('No connection within {} sec, starting '
+                                 'config portal'.format(self.outage_budget))
+                portal = asyncio.create_task(self.start_config_async())
+
+            if await self.load_and_connect_async():
+                continue
+
+            delay = self._backoff_delay(backoff=backoff)
+            self.logger.debug('Next connection attempt in {} ms'.format(delay))
+            await asyncio.sleep(delay / 1000)
+            backoff = min(backoff * 2, self._backoff_max)
+
+    @staticmethod
+    def _backoff_delay(backoff: int) -> int:
+        """
+        Get a randomized delay between half and the full backoff time.
+
+        The randomization prevents devices, which lost their connection at the
+        same time, to reconnect at the very same time.
+
+        :param      backoff:  The backoff time in milliseconds
+        :type       backoff:  int
+
+        :returns:   The delay in milliseconds
+        :rtype:     int
+        """
+        return backoff // 2 + random.randint(0, backoff // 2)
+
+    def _load_networks(self) -> Union[List[dict], None]:
+        """
+        Load the configured networks and the connection state.
+
+        :returns:   The configured networks, None if not configured
+        :rtype:     Union[List[dict], None]
+        """
+        # check wifi config existance
+        if (self._config_cache is None and
+                not self.config_storage.exists()):
+            self.logger.debug('WiFi config does not (yet) exist')
+            return None
+
+        networks = self._get_network_list(data=self._get_wifi_config())
+        # SSIDs are the private view of the config, no passwords are logged
+        self.logger.debug('Configured networks: {}'.
+                          format(self._configured_networks))
+
+        self._load_state()
+        self._drop_invalid_ifconfig()
+
+        return networks
+
+    def _skip_quarantined(self, networks: List[dict]) -> List[dict]:
+        """
+        Remove networks in quarantine, count down their quarantine.
+
+        The quarantine is counted down only on the first call after a boot,
+        further connection attempts, like the ones of @see supervise, skip
+        the same networks without changing the state file.
+
+        :param      networks:  The configured networks
+        :type       networks:  List[dict]
+
+        :returns:   The networks to connect to
+        :rtype:     List[dict]
+        """
+        health = self._state.get('health', dict())
+        count_down = self._quarantined is None
+        if count_down:
+            self._quarantined = list()
+        available = list()
+        for net in networks:
+            entry = health.get(net['ssid'])
+            if count_down and entry and entry[1] > 0:
+                entry[1] -= 1
+                self._state_changed = True
+                self._quarantined.append(net['ssid'])
+
+            if entry and net['ssid'] in self._quarantined:
+                self.logger.info('Skipping "{}" after {} failures'.
+                                 format(net['ssid'], entry[0]))
+            else:
+                available.append(net)
+
+        return available
+
+    def _set_connection_plan(self, plan: List[dict]) -> None:
+        """
+        Set the connection plan without the passwords of the networks.
+
+        :param      plan:  The networks in the order they will be tried
+        :type       plan:  List[dict]
+        """
+        self._connection_plan = [
+            {k: v for k, v in net.items() if k != 'password'} for net in plan
+        ]
+        for net in self._connection_plan:
+            net['timeout'] = self._network_timeout(ssid=net['ssid'])
+        self.logger.debug('Connection plan: {}'.format(self._connection_plan))
+
+    @property
+    def last_connection(self) -> dict:
+        """
+        Get SSID, BSSID and channel of the last successful connection.
+
+        :returns:   Last successful connection, empty if unknown
+        :rtype:     dict
+        """
+        return self._state.get('last', dict())
+
+    def _load_state(self) -> None:
+        """Load the connection state file, if it exists and is valid."""
+        self._state = dict()
+        self._state_changed = False
+        if PathHelper.exists(path=self._state_file):
+            try:
+                self._state = GenericHelper.load_json(path=self._state_file,
+                                                      mode='r')
+            except Exception as e:
+                self.logger.warning('Failed to load state file: {}'.format(e))
+
+    def _save_state(self) -> None:
+        """Save the connection state file."""
+        GenericHelper.save_json(data=self._state,
+                                path=self._state_file,
+                                mode='w')
+        self._state_changed = False
+        self.logger.debug('Saved state: {}'.format(self._state))
+
+    @property
+    def boot_state(self) -> dict:
+        """
+        Get the boot state kept in RTC memory across warm reboots.
+
+        The index of the last good network in the configured networks, the
+        failed attempts of each network since its last success and the time
+        of the last time sync in seconds.
+
+        :returns:   Boot state
+        :rtype:     dict
+        """
+        return {
+            'index': self._boot_state['index'],
+            'failures': list(self._boot_state['failures']),
+            'synced': self._boot_state['synced'],
+        }
+
+    def _load_boot_state(self) -> None:
+        """Load the boot state block from RTC memory, if it is valid."""
+        self._boot_state = {
+            'index': None, 'ssid': 0, 'failures': list(), 'synced': 0
+        }
+        try:
+            data = RTC().memory()
+        except Exception as e:
+            self.logger.debug('RTC memory not available: {}'.format(e))
+            return
+
+        header_size = struct.calcsize(self.BOOT_STATE_FORMAT)
+        if len(data) < header_size:
+            return
+
+        magic, version, index, ssid, synced, amount = struct.unpack(
+            self.BOOT_STATE_FORMAT, data[:header_size])
+        if (magic != self.BOOT_STATE_MAGIC or
+                version != self.BOOT_STATE_VERSION or
+                len(data) != header_size + amount):
+            self.logger.debug('No valid boot state in RTC memory')
+            return
+
+        self._boot_state = {
+            'index': None if index == 0xFF else index,
+            'ssid': ssid,
+            'failures': list(data[header_size:]),
+            'synced': synced,
+        }
+        self.logger.debug('Loaded boot state: {}'.format(self._boot_state))
+
+    def _save_boot_state(self) -> None:
+        """Save the boot state block to RTC memory."""
+        synced = self._synced_time()
+        if synced:
+            self._boot_state['synced'] = synced
+
+        index = self._boot_state['index']
+        failures = self._boot_state['failures']
+        data = struct.pack(self.BOOT_STATE_FORMAT,
+                           self.BOOT_STATE_MAGIC,
+                           self.BOOT_STATE_VERSION,
+                           0xFF if index is None else index,
+                           self._boot_state['ssid'],
+                           self._boot_state['synced'],
+                           len(failures)) + bytes(failures)
+        try:
+            RTC().memory(data)
+        except Exception as e:
+            self.logger.debug('Failed to save boot state: {}'.format(e))
+
+    def _reset_boot_state(self) -> None:
+        """Forget the last good network and all failure counters."""
+        self._boot_state['index'] = None
+        self._boot_state['ssid'] = 0
+        self._boot_state['failures'] = list()
+        self._save_boot_state()
+
+    def _boot_index(self, ssid: str) -> Union[int, None]:
+        """
+        Get the index of a network in the boot state.
+
+        :param      ssid:  The SSID of the network
+        :type       ssid:  str
+
+        :returns:   Index of the configured network, None if not trackable
+        :rtype:     Union[int, None]
+        """
+        if ssid not in self._configured_networks:
+            return None
+
+        index = self._configured_networks.index(ssid)
+        if index >= 0xFF:
+            return None
+
+        return index
+
+    def _boot_failures(self, ssid: str) -> int:
+        """
+        Get the failed attempts of a network since its last success.
+
+        :param      ssid:  The SSID of the network
+        :type       ssid:  str
+
+        :returns:   Number of failed attempts
+        :rtype:     int
+        """
+        index = self._boot_index(ssid=ssid)
+        failures = self._boot_state['failures']
+        if index is None or index >= len(failures):
+            return 0
+
+        return failures[index]
+
+    def _mark_boot_attempt(self, ssid: str) -> None:
+        """
+        Count a connection attempt as failed before it is started.
+
+        The counter is kept in RTC memory, a reset during the attempt, like a
+        brown-out or the watchdog, is counted that way without writing to
+        flash. A successful connection resets the counter again.
+
+        :param      ssid:  The SSID of the network
+        :type       ssid:  str
+        """
+        index = self._boot_index(ssid=ssid)
+        if index is None:
+            return
+
+        failures = self._boot_state['failures']
+        if len(failures) <= index:
+            failures.extend([0] * (index + 1 - len(failures)))
+        failures[index] = min(failures[index] + 1, 0xFF)
+        self._save_boot_state()
+
+    def _remember_boot(self, ssid: str) -> None:
+        """
+        Save the network as last good network of the boot state.
+
+        :param      ssid:  The SSID of the connected network
+        :type       ssid:  str
+        """
+        index = self._boot_index(ssid=ssid)
+        if index is None:
+            return
+
+        self._boot_state['index'] = index
+        self._boot_state['ssid'] = ubinascii.crc32(ssid.encode())
+        if index < len(self._boot_state['failures']):
+            self._boot_state['failures'][index] = 0
+        self._save_boot_state()
+
+    def _warm_reboot_connected(self) -> bool:
+        """
+        Check for a remaining connection to the last good network.
+
+        The boot state is read from RTC memory. If the station is still
+        connected after a warm reboot to the network it has been connected to
+        before, neither the config nor the state file has to be loaded. The
+        network is identified by the CRC32 of its SSID, as the config is not
+        loaded yet.
+
+        :returns:   Flag whether the connection remained
+        :rtype:     bool
+        """
+        self._load_boot_state()
+        if self._boot_state['index'] is None or not self.wh.isconnected:
+            return False
+
+        ssid = self.wh.station.config('essid')
+        if ubinascii.crc32(ssid.encode()) != self._boot_state['ssid']:
+            self.logger.debug('Connected to "{}" instead of the last good '
+                              'network'.format(ssid))
+            return False
+
+        self.logger.info('Connection remained after warm reboot')
+
+        # RTC keeps the time on a warm reboot, no need to sync it again
+        if self._boot_state['synced']:
+            time_synced = getattr(WifiHelper, 'time_synced', None)
+            if time_synced is None:
+                self._time_synced = self._boot_state['synced']
+            elif not time_synced.is_set():
+                time_synced.set(self._boot_state['synced'])
+        self._schedule_time_sync()
+
+        return True
+
+    def _synced_time(self) -> int:
+        """
+        Get the time of the last successful time sync.
+
+        :returns:   Seconds since epoch of the sync, 0 if not yet synced
+        :rtype:     int
+        """
+        time_synced = getattr(WifiHelper, 'time_synced', None)
+        if time_synced is not None:
+            if time_synced.is_set():
+                return int(time_synced.value())
+            return 0
+
+        return self._time_synced
+
+    def _schedule_time_sync(self) -> None:
+        """
+        Sync the time in the background after a successful connection.
+
+        The background time sync of the WifiHelper is used if available.
+        Otherwise, like with the WifiHelper of be_helpers, the time is synced
+        once by a TimeHelper in a new thread, see @see _time_sync_worker.
+        Nothing is done if the time has already been synced.
+        """
+        timeline = self._timelines[-1] if len(self._timelines) else None
+        schedule_time_sync = getattr(WifiHelper, 'schedule_time_sync', None)
+        if schedule_time_sync is not None:
+            schedule_time_sync(timeline=timeline)
+        elif not self._time_synced and self._time_sync_lock.acquire(0):
+            _thread.start_new_thread(self._time_sync_worker, (timeline, ))
+
+    def _time_sync_worker(self, timeline: Union[dict, None]) -> None:
+        """
+        Sync the time with a NTP server, release the lock afterwards.
+
+        Runs in its own thread. A failed sync is retried after the next
+        successful connection.
+
+        :param      timeline:  The timeline of the connection attempt
+        :type       timeline:  Union[dict, None]
+        """
+        try:
+            # older TimeHelper versions return None after a sync
+            if TimeHelper().sync_time() is not False:
+                self._time_synced = int(time.time())
+                if timeline is not None:
+                    timeline['phases'].append([
+                        'time_sync',
+                        time.ticks_diff(time.ticks_ms(), timeline['start'])
+                    ])
+        except Exception as e:
+            self.logger.warning('Failed to sync time due to: {}'.format(e))
+        finally:
+            self._time_sync_lock.release()
+
+    def _network_timeout(self, ssid: str) -> int:
+        """
+        Get the connection timeout of a network.
+
+        The timeout is learned from the recorded connection durations of the
+        network, it is 1.5 times the 90th percentile plus a safety margin.
+        The @see connection_timeout is used until 3 durations have been
+        recorded. The learned timeout is limited to 1 sec and three times the
+        @see connection_timeout.
+
+        :param      ssid:  The SSID of the network
+        :type       ssid:  str
+
+        :returns:   The connection timeout in milliseconds
+        :rtype:     int
+        """
+        default = self.connection_timeout * 1000
+        durations = self._state.get('durations', dict()).get(ssid, [])
+        if not len(durations):
+            # learned timeout is kept in the config if the state got lost
+            meta = self._network_meta(ssid=ssid)
+            return min(meta.get('timeout', default), default * 3)
+        if len(durations) < 3:
+            return default
+
+        # nearest rank of the 90th percentile
+        p90 = sorted(durations)[-(-len(durations) * 9 // 10) - 1]
+        timeout = p90 * 3 // 2 + self._timeout_margin
+
+        return min(max(timeout, 1000), default * 3)
+
+    def _record_attempt(self,
+                        ssid: str,
+                        result: bool,
+                        duration: int,
+                        timeout: int,
+                        status: Union[int, None] = None) -> None:
+        """
+        Record the duration and result of a connection attempt to a network.
+
+        Successful and timed out attempts are recorded, the latter increase
+        the learned timeout of a network which became slower. Only the latest
+        durations are kept.
+
+        Failures due to a wrong password or a not found network are counted,
+        see @see network_health. All failures of a configured network are
+        counted in its metadata in the state file, see @see network_metadata
+
+        :param      ssid:      The SSID of the network
+        :type       ssid:      str
+        :param      result:    The result of the connection attempt
+        :type       result:    bool
+        :param      duration:  The duration of the attempt in milliseconds
+        :type       duration:  int
+        :param      timeout:   The timeout of the attempt in milliseconds
+        :type       timeout:   int
+        :param      status:    The station status after a failed attempt
+        :type       status:    Union[int, None]
+        """
+        if result or duration >= timeout:
+            durations = self._state.setdefault('durations',
+                                               dict()).setdefault(ssid, [])
+            durations.append(duration)
+            del durations[:-self._timeout_samples]
+            self._state_changed = True
+
+        if not result and self._config_network(ssid=ssid) is not None:
+            failures = self._network_meta(ssid=ssid).get('failures', 0) + 1
+            self._state.setdefault('meta', dict()).setdefault(
+                ssid, dict())['failures'] = failures
+            self._state_changed = True
+
+        if result:
+            if self._state.get('health', dict()).pop(ssid, None):
+                self._state_changed = True
+        elif status in self.QUARANTINE_FAILURES:
+            entry = self._state.setdefault('health', dict()).setdefault(
+                ssid, [0, 0])
+            entry[0] += 1
+            if entry[0] >= self._quarantine_after:
+                entry[1] = min(2 ** (entry[0] - self._quarantine_after),
+                               self._quarantine_max)
+                self.logger.info('Skipping "{}" for {} connection attempts'.
+                                 format(ssid, entry[1]))
+            self._state_changed = True
+
+    def _reset_network_health(self, ssids: List[str]) -> None:
+        """
+        Reset the failure counter and quarantine state of networks.
+
+        :param      ssids:  The SSIDs of the networks
+        :type       ssids:  List[str]
+        """
+        self._load_state()
+        health = self._state.get('health', dict())
+        for ssid in ssids:
+            if health.pop(ssid, None):
+                self._state_changed = True
+
+        if self._state_changed:
+            self._save_state()
+
+    def _start_connection(self,
+                          net: dict,
+                          bssid: Union[str, None] = None) -> bool:
+        """
+        Start connecting the station to a network without waiting for it.
+
+        :param      net:    The network with SSID and password
+        :type       net:    dict
+        :param      bssid:  The hexlified BSSID of a specific accesspoint
+        :type       bssid:  Union[str, None]
+
+        :returns:   Result of starting the connection
+        :rtype:     bool
+        """
+        self._mark_boot_attempt(ssid=net['ssid'])
+        self._add_timeline(timeline={
+            'ssid': net['ssid'],
+            'start': time.ticks_ms(),
+            'phases': [],
+            'result': None,
+            'status': None,
+        })
+
+        station = self.wh.station
+        if not station.active():
+            station.active(True)
+            self._mark_phase(phase='active')
+
+        cached = self._state.get('ifconfig', dict()).get(net['ssid'])
+        if self.cache_ifconfig and cached:
+            self.logger.debug('Using cached IP config {}'.format(cached))
+            station.ifconfig(tuple(cached))
+            self._static_ifconfig = net['ssid']
+            self._mark_phase(phase='ifconfig')
+        elif self._static_ifconfig is not None:
+            self._use_dhcp()
+            self._mark_phase(phase='ifconfig')
+
+        try:
+            if bssid:
+                station.connect(net['ssid'],
+                                net['password'],
+                                bssid=ubinascii.unhexlify(bssid))
+            else:
+                station.connect(net['ssid'], net['password'])
+        except Exception as e:
+            self.logger.warning('Failed to connect due to: {}'.format(e))
+            self._mark_phase(phase='error')
+            self._timelines[-1]['result'] = False
+            return False
+
+        self._mark_phase(phase='connect')
+
+        return True
+
+    def _add_timeline(self, timeline: dict) -> None:
+        """
+        Add the timeline of a connection attempt, keep only the latest ones.
+
+        :param      timeline:  The timeline
+        :type       timeline:  dict
+        """
+        self._timelines.append(timeline)
+        del self._timelines[:-self._timelines_max]
+
+    def _mark_phase(self, phase: str) -> None:
+        """
+        Add a finished phase to the timeline of the current attempt.
+
+        :param      phase:  The name of the phase
+        :type       phase:  str
+        """
+        if len(self._timelines):
+            timeline = self._timelines[-1]
+            timeline['phases'].append(
+                [phase, time.ticks_diff(time.ticks_ms(), timeline['start'])])
+
+    def _finish_timeline(self, result: bool) -> None:
+        """
+        Finish the timeline of the current attempt with its result.
+
+        :param      result:  The result of the connection attempt
+        :type       result:  bool
+        """
+        if result:
+            self._mark_phase(phase='got_ip')
+        elif self._last_status is None:
+            self._mark_phase(phase='timeout')
+        else:
+            self._mark_phase(phase='failed')
+
+        if len(self._timelines):
+            self._timelines[-1]['result'] = result
+            self._timelines[-1]['status'] = self._last_status
+
+    def _check_connection(self) -> Union[bool, None]:
+        """
+        Check the state of a started connection.
+
+        :returns:   True if connected, False on a failure, None if pending
+        :rtype:     Union[bool, None]
+        """
+        station = self.wh.station
+        if station.isconnected():
+            return True
+
+        status = station.status()
+        if status in self.CONNECT_FAILURES:
+            self.logger.info('Connection failed with status {}'.
+                             format(status))
+            self._last_status = status
+            return False
+
+        return None
+
+    def _wait_for_connection(self, ssid: str) -> bool:
+        """
+        Wait for a started connection, no longer than the network timeout.
+
+        :param      ssid:  The SSID of the network
+        :type       ssid:  str
+
+        :returns:   Result of connection
+        :rtype:     bool
+        """
+        result = False
+        self._last_status = None
+        start = time.ticks_ms()
+        timeout = self._network_timeout(ssid=ssid)
+        while time.ticks_diff(time.ticks_ms(), start) < timeout:
+            state = self._check_connection()
+            if state is not None:
+                result = state
+                break
+            time.sleep_ms(100)
+        else:
+            self.logger.info('Connection timed out')
+
+        self._finish_timeline(result=result)
+        self._record_attempt(ssid=ssid,
+                             result=result,
+                             duration=time.ticks_diff(time.ticks_ms(), start),
+                             timeout=timeout,
+                             status=self._last_status)
+
+        return result
+
+    async def _wait_for_connection_async(self, ssid: str) -> bool:
+        """
+        Wait for a started connection, no longer than the network timeout.
+
+        Coroutine version of @see _wait_for_connection
+
+        :param      ssid:  The SSID of the network
+        :type       ssid:  str
+
+        :returns:   Result of connection
+        :rtype:     bool
+        """
+        result = False
+        self._last_status = None
+        start = time.ticks_ms()
+        timeout = self._network_timeout(ssid=ssid)
+        while time.ticks_diff(time.ticks_ms(), start) < timeout:
+            state = self._check_connection()
+            if state is not None:
+                result = state
+                break
+            await asyncio.sleep(0.1)
+        else:
+            self.logger.info('Connection timed out')
+
+        self._finish_timeline(result=result)
+        self._record_attempt(ssid=ssid,
+                             result=result,
+                             duration=time.ticks_diff(time.ticks_ms(), start),
+                             timeout=timeout,
+                             status=self._last_status)
+
+        return result
+
+    def _connect(self, net: dict, bssid: Union[str, None] = None) -> bool:
+        """
+        Connect to a network.
+
+        The station is left idle if the connection failed.
+
+        :param      net:    The network with SSID and password
+        :type       net:    dict
+        :param      bssid:  The hexlified BSSID of a specific accesspoint
+        :type       bssid:  Union[str, None]
+
+        :returns:   Result of connection
+        :rtype:     bool
+        """
+        if not self._start_connection(net=net, bssid=bssid):
+            return False
+
+        result = self._wait_for_connection(ssid=net['ssid'])
+        if not result:
+            self._reset_connection()
+
+        return result
+
+    async def _connect_async(self,
+                             net: dict,
+                             bssid: Union[str, None] = None) -> bool:
+        """
+        Connect to a network without blocking other tasks.
+
+        The station is left idle if the connection failed.
+
+        :param      net:    The network with SSID and password
+        :type       net:    dict
+        :param      bssid:  The hexlified BSSID of a specific accesspoint
+        :type       bssid:  Union[str, None]
+
+        :returns:   Result of connection
+        :rtype:     bool
+        """
+        if not self._start_connection(net=net, bssid=bssid):
+            return False
+
+        result = await self._wait_for_connection_async(ssid=net['ssid'])
+        if not result:
+            self._reset_connection()
+
+        return result
+
+    def _wrong_password(self) -> bool:
+        """
+        Get whether the latest connection attempt failed due to the password.
+
+        :returns:   Flag whether the station reported a wrong password
+        :rtype:     bool
+        """
+        wrong_password = getattr(network, 'STAT_WRONG_PASSWORD', None)
+
+        return (wrong_password is not None and
+                self._last_status == wrong_password)
+
+    def _reset_connection(self) -> None:
+        """Disconnect the station after a failed connection attempt."""
+        self.wh.station.disconnect()
+        if self._static_ifconfig is not None:
+            self._use_dhcp()
+
+    def _use_dhcp(self) -> None:
+        """Replace an applied static IP configuration by DHCP."""
+        self.logger.debug('Using DHCP instead of static IP config')
+        try:
+            self.wh.station.ifconfig('dhcp')
+        except Exception as e:
+            self.logger.warning('Failed to enable DHCP: {}'.format(e))
+        self._static_ifconfig = None
+
+    def _fast_reconnect_network(self,
+                                networks: List[dict]) -> Union[dict, None]:
+        """
+        Get the configured network of the last successful connection.
+
+        :param      networks:  The configured networks
+        :type       networks:  List[dict]
+
+        :returns:   The network with BSSID and channel, None if unknown
+        :rtype:     Union[dict, None]
+        """
+        last = self.last_connection
+        if not (last.get('ssid') and last.get('bssid')):
+            return None
+
+        for net in networks:
+            if net['ssid'] == last['ssid']:
+                if (self._boot_failures(ssid=net['ssid']) >=
+                        self._boot_failures_defer):
+                    self.logger.info('Skip fast reconnect to "{}" after {} '
+                                     'failed attempts'.format(
+                                         net['ssid'],
+                                         self._boot_failures(
+                                             ssid=net['ssid'])))
+                    return None
+                net = net.copy()
+                net['bssid'] = last['bssid']
+                net['channel'] = last.get('channel')
+                self.logger.info('Fast reconnect to "{}" with BSSID {}'.
+                                 format(net['ssid'], net['bssid']))
+                return net
+
+        return None
+
+    def _fast_reconnect(self, networks: List[dict]) -> Union[dict, None]:
+        """
+        Connect directly to the BSSID of the last successful connection.
+
+        The full channel sweep of a regular connect is skipped by specifying
+        the BSSID of the last successful connection.
+
+        :param      networks:  The configured networks
+        :type       networks:  List[dict]
+
+        :returns:   The connected network, None if fast reconnect failed
+        :rtype:     Union[dict, None]
+        """
+        net = self._fast_reconnect_network(networks=networks)
+        if net is None:
+            return None
+
+        if not self._start_connection(net=net, bssid=net['bssid']):
+            return None
+
+        if self._wait_for_connection(ssid=net['ssid']):
+            return net
+
+        self._reset_connection()
+
+        return None
+
+    async def _fast_reconnect_async(self,
+                                    networks: List[dict]) -> Union[dict,
+                                                                   None]:
+        """
+        Connect directly to the BSSID of the last successful connection.
+
+        Coroutine version of @see _fast_reconnect
+
+        :param      networks:  The configured networks
+        :type       networks:  List[dict]
+
+        :returns:   The connected network, None if fast reconnect failed
+        :rtype:     Union[dict, None]
+        """
+        net = self._fast_reconnect_network(networks=networks)
+        if net is None:
+            return None
+
+        if await self._connect_async(net=net, bssid=net['bssid']):
+            return net
+
+        return None
+
+    def _remember_connection(self, plan: List[dict]) -> None:
+        """
+        Save SSID, BSSID and channel of the current connection.
+
+        The state file is only written if the connection or any other state,
+        like the recorded connection durations, changed. The metadata of the
+        network is updated in the state file, the config gets it at most once
+        per @see _meta_sync_interval, see @see _sync_network_meta.
+
+        :param      plan:  The plan of the connection attempt
+        :type       plan:  List[dict]
+        """
+        ssid = self.wh.station.config('essid')
+        self._remember_boot(ssid=ssid)
+        self._connected_at = time.ticks_ms()
+        self._roamed_from = None
+
+        # the time sync is the last phase of the connection timeline
+        self._schedule_time_sync()
+        changes = dict()
+        for net in plan:
+            if net['ssid'] == ssid and net.get('bssid'):
+                last = {
+                    'ssid': ssid,
+                    'bssid': net['bssid'],
+                    'channel': net.get('channel'),
+                }
+                if last != self.last_connection:
+                    self._state['last'] = last
+                    self._state_changed = True
+                changes['last_bssid'] = net['bssid']
+                changes['last_channel'] = net.get('channel')
+                break
+
+        if self._config_network(ssid=ssid) is not None:
+            if self._synced_time():
+                # without a synced time the clock starts at its epoch
+                changes['last_success'] = int(time.time())
+            changes['sequence'] = self._next_sequence()
+            changes['successes'] = self._network_meta(ssid=ssid).get(
+                'successes', 0) + 1
+            if len(self._state.get('durations', dict()).get(ssid, [])) >= 3:
+                changes['timeout'] = self._network_timeout(ssid=ssid)
+            self._state.setdefault('meta', dict()).setdefault(
+                ssid, dict()).update(changes)
+            self._state_changed = True
+            self._sync_network_meta(ssid=ssid)
+
+        if self.cache_ifconfig:
+            if self._static_ifconfig == ssid:
+                # validate cached config without delaying the connection
+                _thread.start_new_thread(self._validate_ifconfig, (ssid, ))
+            elif self._cache_current_ifconfig(ssid=ssid):
+                self._state_changed = True
+        self._drop_invalid_ifconfig()
+
+        if self._state_changed:
+            self._save_state()
+
+    def _next_sequence(self) -> int:
+        """
+        Get the sequence number of a new successful connection.
+
+        The number is one higher than the latest one of all configured
+        networks, it does not depend on a synced time.
+
+        :returns:   The sequence number
+        :rtype:     int
+        """
+        sequence = 0
+        for net in self._config_cache or list():
+            if 'ssid' in net:
+                sequence = max(sequence,
+                               self._network_meta(ssid=net['ssid'],
+                                                  net=net).get('sequence', 0))
+
+        return sequence + 1
+
+    def _cache_current_ifconfig(self, ssid: str) -> bool:
+        """
+        Cache the current IP configuration of the station for a network.
+
+        :param      ssid:  The SSID of the connected network
+        :type       ssid:  str
+
+        :returns:   Flag whether the cached IP configuration changed
+        :rtype:     bool
+        """
+        current = list(self.wh.station.ifconfig())
+        cache = self._state.setdefault('ifconfig', dict())
+        if cache.get(ssid) == current:
+            return False
+
+        cache[ssid] = current
+        self.logger.debug('Cached IP config of "{}": {}'.
+                          format(ssid, current))
+
+        return True
+
+    def _validate_ifconfig(self, ssid: str) -> None:
+        """
+        Validate the applied static IP configuration, fall back to DHCP.
+
+        Runs in its own thread. The cached configuration is removed by the
+        main context if the network does not answer, see
+        @see _drop_invalid_ifconfig.
+
+        :param      ssid:  The SSID of the connected network
+        :type       ssid:  str
+        """
+        if self._check_ifconfig(ifconfig=self.wh.station.ifconfig()):
+            self.logger.debug('Cached IP config of "{}" is valid'.
+                              format(ssid))
+            return
+
+        self.logger.info('Cached IP config of "{}" is invalid'.format(ssid))
+        self._invalid_ifconfig.append(ssid)
+        self._use_dhcp()
+
+    def _drop_invalid_ifconfig(self) -> bool:
+        """
+        Remove the cached IP configurations found invalid in the background.
+
+        The validation thread only reports the SSIDs, the state is changed
+        here and written by the caller, so only the main context writes the
+        state file.
+
+        :returns:   Flag whether the state changed
+        :rtype:     bool
+        """
+        changed = False
+        while len(self._invalid_ifconfig):
+            ssid = self._invalid_ifconfig.pop(0)
+            if self._state.get('ifconfig', dict()).pop(ssid, None):
+                changed = True
+
+        if changed:
+            self._state_changed = True
+
+        return changed
+
+    @staticmethod
+    def _check_ifconfig(ifconfig: Tuple[str, str, str, str],
+                        timeout: int = 2) -> bool:
+        """
+        Check the network answers with the given IP configuration.
+
+        A minimal DNS query is sent to the DNS server, or the gateway if no
+        DNS server is given. An answer will not reach this device if the
+        gateway is unreachable or the address is used by another device.
+
+        :param      ifconfig:  The IP, subnet, gateway and DNS server
+        :type       ifconfig:  Tuple[str, str, str, str]
+        :param      timeout:   Seconds to wait for an answer
+        :type       timeout:   int, optional
+
+        :returns:   Result of the check
+        :rtype:     bool
+        """
+        ip, subnet, gateway, dns = ifconfig
+        server = dns if dns != '0.0.0.0' else gateway
+        # query ID, recursion desired, one question for NS records of root
+        query = b'\x57\x4d\x01\x00\x00\x01' + b'\x00' * 6 + \
+            b'\x00\x00\x02\x00\x01'
+
+        sock = None
+        try:
+            addr = socket.getaddrinfo(server, 53)[0][-1]
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.settimeout(timeout)
+            sock.sendto(query, addr)
+            answer = sock.recv(512)
+            return answer[:2] == query[:2] and bool(answer[2] & 0x80)
+        except Exception:
+            return False
+        finally:
+            if sock is not None:
+                sock.close()
+
+    def _roam_candidate(self) -> Union[dict, None]:
+        """
+        Get an accesspoint of the connected network with a clearly better RSSI.
+
+        Only the cached result of the latest scan is used, if it has been
+        taken after the current connection has been established. The
+        accesspoint left by the latest roam is not considered again.
+
+        :returns:   SSID, BSSID, channel and RSSI of the accesspoint, None if
+                    the current connection is good enough
+        :rtype:     Union[dict, None]
+        """
+        if self._last_scan is None:
+            return None
+        for since in (self._connected_at, self._last_roam):
+            if (since is not None and
+                    time.ticks_diff(self._last_scan, since) < 0):
+                # scan result is older than the current connection
+                return None
+
+        station = self.wh.station
+        ssid = station.config('essid')
+        current = self.last_connection
+        try:
+            rssi = station.status('rssi')
+        except Exception as e:
+            self.logger.debug('Failed to get RSSI: {}'.format(e))
+            return None
+
+        best = None
+        for net in self.wh.get_wifi_networks_sorted(rescan=False):
+            this_ssid = net['ssid']
+            if isinstance(this_ssid, bytes):
+                this_ssid = this_ssid.decode('utf-8')
+            bssid = net['bssid']
+            if isinstance(bssid, bytes):
+                bssid = bssid.decode('ascii')
+            if (this_ssid != ssid or
+                    bssid in (current.get('bssid'), self._roamed_from)):
+                continue
+            if best is None or net['RSSI'] > best['RSSI']:
+                best = {
+                    'ssid': ssid,
+                    'bssid': bssid,
+                    'channel': net['channel'],
+                    'RSSI': net['RSSI'],
+                }
+
+        if best is None or best['RSSI'] < rssi + self._roam_hysteresis:
+            return None
+
+        self.logger.debug('Roam candidate {} with {} dBm, currently {} dBm'.
+                          format(best['bssid'], best['RSSI'], rssi))
+
+        return best
+
+    async def _roam_async(self) -> bool:
+        """
+        Roam to a clearly better accesspoint of the connected network.
+
+        Only networks of the in memory view of the WiFi config are used, the
+        config is not loaded for this. The connection is restored by
+        @see supervise if roaming failed.
+
+        :returns:   Flag whether the station roamed to another accesspoint
+        :rtype:     bool
+        """
+        if (self._last_roam is not None and
+                time.ticks_diff(time.ticks_ms(), self._last_roam) <
+                self._roam_interval):
+            return False
+
+        candidate = self._roam_candidate()
+        if candidate is None:
+            return False
+
+        config_net = self._config_network(ssid=candidate['ssid'])
+        if config_net is None:
+            return False
+
+        self._last_roam = time.ticks_ms()
+        left = self.last_connection.get('bssid')
+        net = {
+            'ssid': candidate['ssid'],
+            'password': config_net.get('password', ''),
+            'bssid': candidate['bssid'],
+            'channel': candidate['channel'],
+        }
+        self.logger.info('Roaming to "{}" with BSSID {}'.
+                         format(net['ssid'], net['bssid']))
+        self.wh.station.disconnect()
+        result = await self._connect_async(net=net, bssid=net['bssid'])
+        if result:
+            self._remember_connection(plan=[net])
+            self._roamed_from = left
+
+        return result
+
+    def _get_network_list(self, data: Union[dict, List[dict]]) -> List[dict]:
+        """
+        Get list of configured networks from loaded WiFi configuration data.
+
+        Networks without a password are returned with an empty password.
+
+        :param      data:  The loaded WiFi configuration data
+        :type       data:  Union[dict, List[dict]]
+
+        :returns:   List of networks
+        :rtype:     List[dict]
+        """
+        if isinstance(data, dict):
+            data = [data]
+        elif not isinstance(data, list):
+            return list()
+
+        networks = list()
+        for net in data:
+            if 'ssid' not in net:
+                continue
+            this_net = net.copy()
+            if 'password' not in this_net:
+                this_net['password'] = ''
+            networks.append(this_net)
+
+        return networks
+
+    def _plan_connection(self, networks: List[dict]) -> List[dict]:
+        """
+        Plan the connection order of configured networks based on one scan.
+
+        Networks not found by the scan are dropped, unless the scan reported
+        hidden networks, which might be one of them. The accesspoint with the
+        strongest signal of each network is used. Visible networks are
+        sorted by their optional "priority" value and by RSSI afterwards.
+        Networks which failed repeatedly since their last success, even across
+        warm reboots, are tried after all others. If the scan did not find
+        anything at all, all networks are kept and sorted by their priority
+        and their last successful connection, see @see network_metadata.
+
+        :param      networks:  The configured networks
+        :type       networks:  List[dict]
+
+        :returns:   The networks in the order to try them
+        :rtype:     List[dict]
+        """
+        found_nets = self.wh.get_wifi_networks_sorted(rescan=True)
+        self._last_scan = time.ticks_ms()
+        self.logger.debug('Found networks: {}'.format(found_nets))
+
+        if not len(found_nets):
+            # rank by the stored metadata, keep the order on equal ranks
+            order = {id(net): idx for idx, net in enumerate(networks)}
+            return sorted(networks,
+                          key=lambda net: (
+                              self._boot_failures(ssid=net['ssid']) <
+                              self._boot_failures_defer,
+                              net.get('priority', 0),
+                              self._network_meta(ssid=net['ssid'],
+                                                 net=net).get(
+                                  'sequence', 0),
+                              -order[id(net)]),
+                          reverse=True)
+
+        visible = dict()
+        hidden_nets_found = False
+        for net in found_nets:
+            ssid = net['ssid']
+            if isinstance(ssid, bytes):
+                ssid = ssid.decode('utf-8')
+            if not len(ssid) or net.get('hidden', False):
+                hidden_nets_found = True
+                continue
+            if ssid not in visible or visible[ssid]['RSSI'] < net['RSSI']:
+                visible[ssid] = net
+
+        planned = list()
+        unseen = list()
+        for net in networks:
+            if net['ssid'] in visible:
+                this_net = net.copy()
+                scanned = visible[net['ssid']]
+                bssid = scanned['bssid']
+                if isinstance(bssid, bytes):
+                    bssid = bssid.decode('ascii')
+                this_net['RSSI'] = scanned['RSSI']
+                this_net['bssid'] = bssid
+                this_net['channel'] = scanned['channel']
+                planned.append(this_net)
+            elif hidden_nets_found:
+                unseen.append(net)
+            else:
+                self.logger.debug('Skip "{}", not found by scan'.
+                                  format(net['ssid']))
+
+        planned = sorted(planned,
+                         key=lambda net: (
+                             self._boot_failures(ssid=net['ssid']) <
+                             self._boot_failures_defer,
+                             net.get('priority', 0),
+                             net['RSSI']),
+                         reverse=True)
+
+        return planned + unseen
+
+    def start_config(self) -> None:
+        """Start WiFi manager accesspoint and webserver."""
+        ifconfig = self._setup_config()     # noqa: F841
+
+        # finally
+        self.run(port=80, debug=True)
+        # self.run(host=ifconfig.ip, port=80, debug=True)
+
+        self._teardown_config()
+
+        # wait some time to end all threads savely
+        time.sleep(5)
+
+        gc.collect()
+        self.logger.debug('Goodbye from WiFiManager')
+
+    async def start_config_async(self) -> None:
+        """
+        Start WiFi manager accesspoint and webserver.
+
+        Coroutine version of @see start_config, other tasks keep running
+        while the webserver is serving.
+        """
+        ifconfig = self._setup_config()     # noqa: F841
+
+        await self.run_async(port=80, debug=True)
+
+        self._teardown_config()
+
+        # wait some time to end all threads savely
+        await asyncio.sleep(5)
+
+        gc.collect()
+        self.logger.debug('Goodbye from WiFiManager')
+
+    async def _stop_portal(self, portal: asyncio.Task) -> None:
+        """
+        Stop the config portal started as task by @see supervise.
+
+        Flask can not be shut down, the task serving it is cancelled.
+
+        :param      portal:  The task running @see start_config_async
+        :type       portal:  asyncio.Task
+        """
+        portal.cancel()
+
+        try:
+            await portal
+        except asyncio.CancelledError:
+            self._teardown_config()
+
+    def _setup_config(self):
+        """
+        Create the accesspoint and start scanning for networks.
+
+        :returns:   Network interface parameters of the accesspoint
+        :rtype:     NamedTuple
+        """
+        ap_name = 'WiFiManager_{}'.format(
+            GenericHelper.get_uuid(-4).decode('ascii'))
+        self.logger.info('Starting WiFiManager as AccessPoint "{}"'.
+                         format(ap_name))
+        result = self.wh.create_ap(ssid=ap_name,
+                                   password='',
+                                   channel=11,
+                                   timeout=5)
+        self.logger.debug('Created AP: {}'.format(result))
+        ifconfig = self.wh.ifconfig_ap
+        self.logger.debug(ifconfig)
+
+        # start scanning for available networks
+        self.scanning = True
+
+        return ifconfig
+
+    def _teardown_config(self) -> None:
+        """Stop scanning after the webserver has been shut down."""
+        self.logger.debug('Finished running the PicoWeb application')
+        self.scanning = False
+        self.logger.debug('Stopped scanning thread')
+
+    def add_timelines_route(self,
+                            app: Flask,
+                            url: str = '/connection_timelines') -> None:
+        """
+        Serve the connection timelines as JSON by another webserver.
+
+        The config portal only runs without a connection, an application
+        serving its own webpages can provide the @see connection_timelines
+        of the connected device with this.
+
+        :param      app:  The webserver of the application
+        :type       app:  Flask
+        :param      url:  URL of the connection timelines
+        :type       url:  str
+        """
+        app.add_url_rule(url, view_func=self.connection_timelines_result)
+
+    def _add_app_routes(self) -> None:
+        """Add all application routes to the webserver."""
+
+        # self.app.add_url_rule('/', func=self.index)
+        # @app.route('/index')
+        # def index(self, req, resp): pass
+        # https://github.com/pfalcon/picoweb/blob/b74428ebdde97ed1795338c13a3bdf05d71366a0/picoweb/__init__.py#L251
+        self.app.add_url_rule('/', view_func=self.landing_page)
+        self.app.add_url_rule('/select', view_func=self.wifi_selection)
+        self.app.add_url_rule('/render_network_inputs',
+                              view_func=self.render_network_inputs)
+        self.app.add_url_rule('/configure', view_func=self.wifi_configs)
+        self.app.add_url_rule('/save_wifi_config',
+                              view_func=self.save_wifi_config,
+                              methods=['POST', 'GET'])
+        self.app.add_url_rule('/remove_wifi_config',
+                              view_func=self.remove_wifi_config,
+                              methods=['POST', 'GET'])
+        self.app.add_url_rule('/provision',
+                              view_func=self.provision,
+                              methods=['POST'])
+        self.app.add_url_rule('/scan_result', view_func=self.scan_result)
+        self.app.add_url_rule('/connection_timelines',
+                              view_func=self.connection_timelines_result)
+
+        self.app.add_url_rule(
+            "/static/css/bootstrap.min.css",
+            view_func=self.styles
+        )
+        self.app.add_url_rule(
+            "/static/js/toast.js",
+            view_func=self.scripts
+        )
+        # regex not supported in Flask
+        # self.app.add_url_rule(re.compile(r'^\/(.+\.css)$'),
+        #                       view_func=self.styles)
+        # self.app.add_url_rule(url=re.compile(r'^\/(.+\.js)$'),
+        #                       view_func=self.scripts)
+
+        available_urls = {
+            "/select": {
+                "title": "Select WiFi",
+                "color": "border-primary",
+                "text": "Configure WiFi networks",
+            },
+            "/configure": {
+                "title": "Manage WiFi networks",
+                "color": "border-primary",
+                "text": "Remove credentials of configured WiFi networks",
+            },
+            "/scan_result": {
+                "title": "Scan data",
+                "color": "text-white bg-info",
+                "text": "Latest WiFi scan data as JSON",
+            },
+            "/connection_timelines": {
+                "title": "Connection timelines",
+                "color": "text-white bg-info",
+                "text": "Phases of the latest connection attempts as JSON",
+            }
+        }
+
+        self.available_urls = available_urls
+
+    def _encrypt_data(self, data: Union[str, bytes, list, dict]) -> bytes:
+        """
+        Encrypt data with encryption key
+
+        :param      data:  The data
+        :type       data:  Union[str, bytes, list, dict]
+
+        :returns:   Encrypted data
+        :rtype:     bytes
+        """
+        # create bytes array of the data and encrypt it
+        if isinstance(data, bytes):
+            data_bytes = data
+        else:
+            if not isinstance(data, str):
+                data = str(data)
+            data_bytes = data.encode()
+        enc = AES.new(self._enc_key, AES.MODE_ECB)
+
+        # add '\x00' to fill up the data string to reach a multiple of 16
+        encrypted_data = enc.encrypt(data_bytes + b'\x00' * ((16 - (len(data_bytes) % 16)) % 16))   # noqa: E501
+
+        return encrypted_data
+
+    def _decrypt_data(self, data: bytes) -> str:
+        """
+        Decrypt data with decryption key
+
+        :param      data:  The data
+        :type       data:  bytes
+
+        :returns:   Decrypted data
+        :rtype:     str
+        """
+        # decrypt bytes array
+        dec = AES.new(self._enc_key, AES.MODE_ECB)
+        decrypted_data = dec.decrypt(data)
+
+        # remove added '\x00' stuff after decoding it to ascii
+        decrypted_data_str = decrypted_data.decode('ascii').rstrip('\x00')
+
+        return decrypted_data_str
+
+    def _encode_wifi_config(self, data: Union[dict, List[dict]]) -> bytes:
+        """
+        Encode WiFi configuration data in the binary config format.
+
+        :param      data:  The networks
+        :type       data:  Union[dict, List[dict]]
+
+        :returns:   Header and records of the networks, not yet encrypted
+        :rtype:     bytes
+        """
+        return b''.join(self._iter_wifi_config_chunks(data=data))
+
+    def _iter_wifi_config_chunks(self, data: Union[dict, List[dict]]):
+        """
+        Iterate the header and records of WiFi configuration data.
+
+        Records are created one by one, only a compressed config is created
+        at once.
+
+        :param      data:  The networks
+        :type       data:  Union[dict, List[dict]]
+
+        :returns:   Generator of header and records, not yet encrypted
+        :rtype:     Generator[bytes]
+        """
+        if isinstance(data, dict):
+            data = [data]
+
+        yield struct.pack(self.CONFIG_HEADER_FORMAT,
+                          self.CONFIG_MAGIC,
+                          self.CONFIG_VERSION)
+
+        records = (
+            self._encode_record(record_type=self.CONFIG_RECORD_NETWORK,
+                                value=net)
+            for net in data)
+
+        if (self._compress_config and
+                zlib is not None and hasattr(zlib, 'compress')):
+            body = zlib.compress(b''.join(records))
+            yield struct.pack(self.CONFIG_RECORD_FORMAT,
+                              self.CONFIG_RECORD_ZLIB,
+                              len(body)) + body
+        else:
+            for record in records:
+                yield record
+
+    def _encrypt_chunks(self, chunks, file, crc: int = 0) -> Tuple[int, int]:
+        """
+        Encrypt data chunk by chunk and write it to an opened file.
+
+        All data is encrypted in place in one buffer of the config chunk size,
+        the end is padded with zeros to a full AES block.
+
+        :param      chunks:  The data to encrypt
+        :type       chunks:  Iterable[bytes]
+        :param      file:    The file opened for writing
+        :type       file:    io.FileIO
+        :param      crc:     The CRC32 of the previously written ciphertext
+        :type       crc:     int, optional
+
+        :returns:   Number of written bytes and CRC32 of all ciphertext
+        :rtype:     Tuple[int, int]
+        """
+        enc = AES.new(self._enc_key, AES.MODE_ECB)
+        buf = bytearray(self._config_chunk_size)
+        view = memoryview(buf)
+        fill = 0
+        written = 0
+
+        for data in chunks:
+            data = memoryview(data)
+            pos = 0
+            while pos < len(data):
+                size = min(len(buf) - fill, len(data) - pos)
+                buf[fill:fill + size] = data[pos:pos + size]
+                fill += size
+                pos += size
+
+                if fill == len(buf):
+                    enc.encrypt(view, output=view)
+                    crc = ubinascii.crc32(buf, crc)
+                    written += file.write(buf)
+                    fill = 0
+
+        if fill:
+            padding = -fill % 16
+            buf[fill:fill + padding] = bytes(padding)
+            fill += padding
+            enc.encrypt(view[:fill], output=view[:fill])
+            crc = ubinascii.crc32(view[:fill], crc)
+            written += file.write(view[:fill])
+
+        return written, crc
+
+    def _write_encrypted_file(self, chunks, path: str, mode: str) -> int:
+        """
+        Encrypt data chunk by chunk and write it atomically to a file.
+
+        The ciphertext follows a plain header with its length and CRC32. A
+        new file is written to a temporary file first, which replaces the
+        file afterwards, the replaced file is kept as previous generation.
+        Appended data is committed by updating the header after writing it,
+        a reset in between leaves the previous content of the file.
+
+        :param      chunks:  The data to encrypt
+        :type       chunks:  Iterable[bytes]
+        :param      path:    The full path to the file
+        :type       path:    str
+        :param      mode:    The mode of file operation, 'wb' or 'ab'
+        :type       mode:    str
+
+        :returns:   Number of written bytes of ciphertext
+        :rtype:     int
+
+        :raises     OSError:     File to append to does not exist
+        :raises     ValueError:  File to append to has no valid header
+        """
+        header_size = struct.calcsize(self.CONFIG_FILE_FORMAT)
+
+        if mode == 'ab':
+            with open(path, 'r+b') as file:
+                length, crc = self._read_file_header(file=file,
+                                                     size=os.stat(path)[6])
+                # overwrite data of an uncommitted append
+                file.seek(header_size + length)
+                written, crc = self._encrypt_chunks(chunks=chunks,
+                                                    file=file,
+                                                    crc=crc)
+                file.seek(0)
+                file.write(struct.pack(self.CONFIG_FILE_FORMAT,
+                                       self.CONFIG_FILE_MAGIC,
+                                       self.CONFIG_FILE_VERSION,
+                                       length + written,
+                                       crc))
+
+            return written
+
+        tmp_path = '{}{}'.format(path, self.CONFIG_TMP_SUFFIX)
+        with open(tmp_path, 'wb') as file:
+            # header is written last, an incomplete file has no valid header
+            file.write(bytes(header_size))
+            written, crc = self._encrypt_chunks(chunks=chunks, file=file)
+            file.seek(0)
+            file.write(struct.pack(self.CONFIG_FILE_FORMAT,
+                                   self.CONFIG_FILE_MAGIC,
+                                   self.CONFIG_FILE_VERSION,
+                                   written,
+                                   crc))
+
+        backup_path = '{}{}'.format(path, self.CONFIG_BACKUP_SUFFIX)
+        if PathHelper.exists(path=path):
+            if PathHelper.exists(path=backup_path):
+                os.remove(backup_path)
+            os.rename(str(path), backup_path)
+        os.rename(tmp_path, str(path))
+
+        return written
+
+    def _read_file_header(self, file, size: int) -> Tuple[int, int]:
+        """
+        Read and check the plain header of an encrypted WiFi config file.
+
+        Only the header and the file size are checked, nothing is decrypted.
+
+        :param      file:  The file opened for reading at its start
+        :type       file:  io.FileIO
+        :param      size:  The size of the file in bytes
+        :type       size:  int
+
+        :returns:   Length and CRC32 of the committed ciphertext
+        :rtype:     Tuple[int, int]
+
+        :raises     ValueError:  No header, unsupported version or truncated
+        """
+        header_size = struct.calcsize(self.CONFIG_FILE_FORMAT)
+        data = file.read(header_size)
+        if len(data) < header_size:
+            raise ValueError('WiFi config file without header')
+
+        magic, version, length, crc = struct.unpack(self.CONFIG_FILE_FORMAT,
+                                                    data)
+        if magic != self.CONFIG_FILE_MAGIC:
+            raise ValueError('WiFi config file without header')
+        if version != self.CONFIG_FILE_VERSION:
+            raise ValueError('Unsupported WiFi config file version {}'.
+                             format(version))
+        if length % 16 or header_size + length > size:
+            raise ValueError('WiFi config file is truncated')
+
+        return length, crc
+
+    def _has_file_header(self, path: str) -> bool:
+        """
+        Check whether records can be appended to an encrypted WiFi config.
+
+        :param      path:  The full path to the file
+        :type       path:  str
+
+        :returns:   Existance of the file with a valid header
+        :rtype:     bool
+        """
+        try:
+            with open(path, 'rb') as file:
+                self._read_file_header(file=file, size=os.stat(path)[6])
+        except (OSError, ValueError):
+            return False
+
+        return True
+
+    def _encode_record(self,
+                       record_type: int,
+                       value: Union[dict, str, list]) -> bytes:
+        """
+        Encode a single record of the binary config format.
+
+        :param      record_type:  The record type
+        :type       record_type:  int
+        :param      value:        The network, SSID or metadata
+        :type       value:        Union[dict, str, list]
+
+        :returns:   Record header and JSON encoded payload
+        :rtype:     bytes
+        """
+        payload = json.dumps(value).encode()
+
+        return struct.pack(self.CONFIG_RECORD_FORMAT,
+                           record_type,
+                           len(payload)) + payload
+
+    def _save_wifi_config_data(self,
+                               data: Union[dict, List[dict]],
+                               path: str) -> None:
+        """
+        Save WiFi configuration data encrypted in the binary config format.
+
+        :param      data:  The networks
+        :type       data:  Union[dict, List[dict]]
+        :param      path:  The full path to the file
+        :type       path:  str
+        """
+        with self._config_lock:
+            size = self._write_encrypted_file(
+                chunks=self._iter_wifi_config_chunks(data=data),
+                path=path,
+                mode='wb')
+        self._config_garbage = 0
+        self.logger.debug('Saved {} byte of encrypted WiFi config'.
+                          format(size))
+
+    def _append_wifi_config_records(self,
+                                    records: List[Tuple[int, Union[dict,
+                                                                   str]]],
+                                    path: str) -> None:
+        """
+        Append records to an encrypted WiFi config file.
+
+        Only the new records are encrypted and written, the existing content
+        of the file is not touched.
+
+        :param      records:  The record types and networks or SSIDs
+        :type       records:  List[Tuple[int, Union[dict, str]]]
+        :param      path:     The full path to the file
+        :type       path:     str
+        """
+        with self._config_lock:
+            size = self._write_encrypted_file(
+                chunks=(self._encode_record(record_type=record_type,
+                                            value=value)
+                        for record_type, value in records),
+                path=path,
+                mode='ab')
+        self.logger.debug('Appended {} records with {} byte to WiFi config'.
+                          format(len(records), size))
+
+    def _schedule_compaction(self, path: str) -> bool:
+        """
+        Compact the WiFi config file in the background if required.
+
+        :param      path:  The full path to the file
+        :type       path:  str
+
+        :returns:   Flag whether a compaction has been started
+        :rtype:     bool
+        """
+        if (self._config_garbage <= self._config_garbage_limit or
+                self._config_lock.locked()):
+            return False
+
+        self.logger.debug('Compacting WiFi config with {} garbage records'.
+                          format(self._config_garbage))
+        _thread.start_new_thread(self._compact_wifi_config, (path, ))
+
+        return True
+
+    def _compact_wifi_config(self, path: str) -> None:
+        """
+        Rewrite the WiFi config file with only the remaining networks.
+
+        :param      path:  The full path to the file
+        :type       path:  str
+        """
+        with self._config_lock:
+            networks = self._replay_wifi_config(path=path)
+            size = self._write_encrypted_file(
+                chunks=self._iter_wifi_config_chunks(data=networks),
+                path=path,
+                mode='wb')
+            self._config_garbage = 0
+        self.logger.debug('Compacted WiFi config to {} byte'.format(size))
+
+    def _read_records(self,
+                      read: Callable[[], bytes],
+                      buf: bytes = b'',
+                      offset: int = 0):
+        """
+        Read records of the binary config format.
+
+        Only the currently read record is kept in memory. Padding is skipped
+        up to the next AES block.
+
+        :param      read:    Function returning the next bytes, empty at end
+        :type       read:    Callable[[], bytes]
+        :param      buf:     Already read bytes
+        :type       buf:     bytes
+        :param      offset:  Position of the already read bytes in the file
+        :type       offset:  int
+
+        :returns:   Generator of record type and payload
+        :rtype:     Generator[Tuple[int, bytes]]
+
+        :raises     ValueError:  Record is truncated
+        """
+        head_size = struct.calcsize(self.CONFIG_RECORD_FORMAT)
+
+        while True:
+            while len(buf) < head_size:
+                chunk = read()
+                if not chunk:
+                    # only padding left
+                    return
+                buf += chunk
+
+            record_type, length = struct.unpack(self.CONFIG_RECORD_FORMAT,
+                                                buf[:head_size])
+            if record_type == self.CONFIG_RECORD_END:
+                padding = -offset % 16
+                if not padding:
+                    return
+                # data is read in full blocks, padding is already in buffer
+                buf = buf[padding:]
+                offset += padding
+                continue
+
+            while len(buf) < head_size + length:
+                chunk = read()
+                if not chunk:
+                    raise ValueError('Truncated WiFi config record')
+                buf += chunk
+
+            payload = buf[head_size:head_size + length]
+            buf = buf[head_size + length:]
+            offset += head_size + length
+
+            if record_type == self.CONFIG_RECORD_ZLIB:
+                stream = io.BytesIO(zlib.decompress(payload))
+                for record in self._read_records(
+                        read=lambda: stream.read(self._config_chunk_size)):
+                    yield record
+            else:
+                yield record_type, payload
+
+    def _iter_wifi_config_records(self, path: str):
+        """
+        Iterate the records of an encrypted WiFi config file.
+
+        The plain header is checked against the file size before anything is
+        decrypted. The committed ciphertext is read and decrypted in place
+        chunk by chunk into one buffer while the records are read, its CRC32
+        is verified at the end.
+
+        :param      path:  The full path to the file
+        :type       path:  str
+
+        :returns:   Generator of record type and payload
+        :rtype:     Generator[Tuple[int, bytes]]
+
+        :raises     ValueError:  File is corrupted or not in the binary config
+                                 format
+        """
+        dec = AES.new(self._enc_key, AES.MODE_ECB)
+        header_size = struct.calcsize(self.CONFIG_HEADER_FORMAT)
+        buf = bytearray(self._config_chunk_size)
+        view = memoryview(buf)
+
+        with open(path, 'rb') as file:
+            length, crc = self._read_file_header(file=file,
+                                                 size=os.stat(path)[6])
+            remaining = length
+            checksum = 0
+
+            def read() -> bytes:
+                nonlocal remaining, checksum
+                size = file.readinto(view[:min(len(buf), remaining)])
+                if not size:
+                    if checksum != crc:
+                        raise ValueError('WiFi config file is corrupted')
+                    return b''
+                if size % 16:
+                    raise ValueError('WiFi config file is truncated')
+                remaining -= size
+                checksum = ubinascii.crc32(view[:size], checksum)
+                dec.decrypt(view[:size], output=view[:size])
+                return bytes(view[:size])
+
+            data = read()
+            if len(data) < header_size:
+                raise ValueError('WiFi config file too short')
+
+            magic, version = struct.unpack(self.CONFIG_HEADER_FORMAT,
+                                           data[:header_size])
+            if magic != self.CONFIG_MAGIC:
+                raise ValueError('WiFi config file in legacy format')
+            if version != self.CONFIG_VERSION:
+                raise ValueError('Unsupported WiFi config version {}'.
+                                 format(version))
+
+            for record in self._read_records(read=read,
+                                             buf=data[header_size:],
+                                             offset=header_size):
+                yield record
+
+            # verify the checksum of the ciphertext after the last record
+            while read():
+                pass
+
+    def _replay_wifi_config(self, path: str) -> List[dict]:
+        """
+        Replay the records of an encrypted WiFi config file.
+
+        Each SSID is kept once, the latest network record of an SSID replaces
+        the previous ones. Replaced and removed networks and remove records
+        are counted as garbage.
+
+        :param      path:  The full path to the file
+        :type       path:  str
+
+        :returns:   The remaining networks
+        :rtype:     List[dict]
+
+        :raises     ValueError:  File is not in the binary config format
+        """
+        networks = list()
+        index = dict()
+        garbage = 0
+
+        for record_type, payload in self._iter_wifi_config_records(path=path):
+            garbage += self._apply_record(networks=networks,
+                                          index=index,
+                                          record_type=record_type,
+                                          value=json.loads(payload))
+
+        self._config_garbage = garbage
+
+        return networks
+
+    def _apply_record(self,
+                      networks: List[dict],
+                      index: dict,
+                      record_type: int,
+                      value: Union[dict, str, list]) -> int:
+        """
+        Apply a record of the binary config format to a list of networks.
+
+        A network replaces an already existing network with the same SSID,
+        keeping its metadata. A metadata record updates only the metadata of
+        a network. The list of networks and the index are updated in place.
+
+        :param      networks:     The networks
+        :type       networks:     List[dict]
+        :param      index:        The position of each SSID in the networks
+        :type       index:        dict
+        :param      record_type:  The record type
+        :type       record_type:  int
+        :param      value:        The network, SSID or metadata
+        :type       value:        Union[dict, str, list]
+
+        :returns:   The number of records which became garbage
+        :rtype:     int
+        """
+        if record_type == self.CONFIG_RECORD_NETWORK:
+            position = index.get(value.get('ssid'))
+            if position is not None:
+                # metadata survives new credentials
+                for field in self.NETWORK_META_FIELDS:
+                    if field in networks[position] and field not in value:
+                        value[field] = networks[position][field]
+                networks[position] = value
+                return 1
+            if 'ssid' in value:
+                index[value['ssid']] = len(networks)
+            networks.append(value)
+        elif record_type == self.CONFIG_RECORD_REMOVE:
+            position = index.pop(value, None)
+            if position is None:
+                return 1
+
+            del networks[position]
+            # only the networks after the removed one moved
+            for idx in range(position, len(networks)):
+                index[networks[idx]['ssid']] = idx
+
+            return 2
+        elif record_type == self.CONFIG_RECORD_META:
+            position = index.get(value[0])
+            if position is None:
+                return 1
+
+            net = networks[position]
+            # a previous metadata record of this network became garbage
+            garbage = 1 if 'successes' in net or 'failures' in net else 0
+            for field, field_value in zip(self.NETWORK_META_FIELDS,
+                                          value[1:]):
+                if field_value is None:
+                    net.pop(field, None)
+                else:
+                    net[field] = field_value
+
+            return garbage
+
+        return 0
+
+    def _config_network(self, ssid: str) -> Union[dict, None]:
+        """
+        Get a network of the in memory view of the WiFi config.
+
+        :param      ssid:  The SSID of the network
+        :type       ssid:  str
+
+        :returns:   The stored network, None if not loaded or not configured
+        :rtype:     Union[dict, None]
+        """
+        if self._config_cache is None or ssid not in self._config_index:
+            return None
+
+        return self._config_cache[self._config_index[ssid]]
+
+    def _network_meta(self,
+                      ssid: str,
+                      net: Union[dict, None] = None) -> dict:
+        """
+        Get the metadata of a configured network.
+
+        The values recorded in the state file since the last metadata record
+        override the values of the WiFi config.
+
+        :param      ssid:  The SSID of the network
+        :type       ssid:  str
+        :param      net:   The network, taken from the WiFi config if None
+        :type       net:   Union[dict, None]
+
+        :returns:   The fields of @see NETWORK_META_FIELDS which are set
+        :rtype:     dict
+        """
+        if net is None:
+            net = self._config_network(ssid=ssid) or dict()
+        meta = {
+            field: net[field]
+            for field in self.NETWORK_META_FIELDS if field in net
+        }
+        meta.update(self._state.get('meta', dict()).get(ssid, dict()))
+
+        return meta
+
+    def _update_network_meta(self, ssid: str, changes: dict) -> bool:
+        """
+        Update the metadata of a configured network.
+
+        Only a metadata record is added to the WiFi config, the credentials
+        are not written again.
+
+        :param      ssid:     The SSID of the network
+        :type       ssid:     str
+        :param      changes:  The changed fields of @see NETWORK_META_FIELDS
+        :type       changes:  dict
+
+        :returns:   Flag whether the metadata changed
+        :rtype:     bool
+        """
+        net = self._config_network(ssid=ssid)
+        if net is None:
+            return False
+
+        values = [changes.get(field, net.get(field))
+                  for field in self.NETWORK_META_FIELDS]
+        if values == [net.get(field) for field in self.NETWORK_META_FIELDS]:
+            return False
+
+        self._change_wifi_config(
+            records=[(self.CONFIG_RECORD_META, [ssid] + values)])
+
+        return True
+
+    def _sync_network_meta(self, ssid: str) -> bool:
+        """
+        Write the metadata of the state file of a network to the WiFi config.
+
+        The metadata is only written if the config has no successful
+        connection of this network yet or the last success, known after the
+        time has been synced, is @see _meta_sync_interval newer than the one
+        of the config. The ranking of the networks without scan result only
+        needs a coarse order of the successes.
+
+        :param      ssid:  The SSID of the network
+        :type       ssid:  str
+
+        :returns:   Flag whether a metadata record has been added
+        :rtype:     bool
+        """
+        net = self._config_network(ssid=ssid)
+        if net is None:
+            return False
 
-        Values below 3 sec are set to 3 sec.
+        meta = self._network_meta(ssid=ssid)
+        if ('sequence' in net and
+                meta.get('last_success', 0) - net.get('last_success', 0) <
+                self._meta_sync_interval):
+            return False
 
-        :param      value:  Timeout of WiFi connection per network in seconds
-        :type       value:  int
+        return self._update_network_meta(ssid=ssid, changes=meta)
+
+    def _dedupe_networks(self, networks: List[dict]) -> List[dict]:
         """
-        if isinstance(value, int):
-            if value < 3:
-                value = 3
-            self._connection_timeout = value
+        Keep only the latest network of each SSID.
 
-    @property
-    def connection_result(self) -> int:
+        :param      networks:  The networks
+        :type       networks:  List[dict]
+
+        :returns:   The networks with unique SSIDs
+        :rtype:     List[dict]
         """
-        Get connection issue error code
+        unique = list()
+        index = dict()
 
-        :returns:   Connection issue error
-        :rtype:     int
+        for net in networks:
+            self._apply_record(networks=unique,
+                               index=index,
+                               record_type=self.CONFIG_RECORD_NETWORK,
+                               value=net)
+
+        return unique
+
+    def _get_wifi_config(self) -> Union[List[dict], None]:
         """
-        return self._connection_result
+        Get the in memory view of the WiFi config.
 
-    def load_and_connect(self) -> bool:
+        The networks are only loaded from the @see config_storage on the
+        first call.
+
+        :returns:   The configured networks, None if not configured
+        :rtype:     Union[List[dict], None]
         """
-        Load configured network credentials and try to connect to those
+        if self._config_cache is None:
+            storage = self.config_storage
+            if not storage.exists():
+                return None
+
+            self._config_cache = storage.load()
+            self._config_index = dict()
+            for position, net in enumerate(self._config_cache):
+                if 'ssid' in net:
+                    self._config_index[net['ssid']] = position
+            self._configured_networks = [
+                net['ssid'] for net in self._config_cache if 'ssid' in net]
 
-        :returns:   Result of connection
-        :rtype:     bool
+        return self._config_cache
+
+    def _change_wifi_config(
+            self,
+            records: List[Tuple[int, Union[dict, str, list]]]) -> List[str]:
         """
-        result = False
+        Apply records to the in memory view of the WiFi config.
 
-        # check wifi config file existance
-        if PathHelper.exists(path=self._config_file):
-            self.logger.debug('Encrypted wifi config file exists')
-            loaded_cfg = self._load_wifi_config_data(path=self._config_file,
-                                                     encrypted=True)
-
-            private_cfg = None
-            ssids = list()
-            passwords = list()
-
-            if isinstance(loaded_cfg, list):
-                # deepcopy would be necessary but not builtin in micropython
-                private_cfg = json.loads(json.dumps(loaded_cfg))
-                for net in private_cfg:
-                    if 'ssid' in net:
-                        ssids.append(net['ssid'])
-                    if 'password' in net:
-                        passwords.append(net['password'])
-                        net['password'] = '*' * 8
-                    else:
-                        passwords.append('')
-                self._configured_networks = list(ssids).copy()
-            elif isinstance(loaded_cfg, dict):
-                private_cfg = loaded_cfg.copy()
-                if 'ssid' in loaded_cfg:
-                    ssids = loaded_cfg['ssid']
-                if 'password' in private_cfg:
-                    passwords = loaded_cfg['password']
-                    private_cfg['password'] = '*' * 8
-                self._configured_networks = ssids
-
-            # self._configured_networks = list(ssids).copy()
-            # self.logger.debug('All SSIDs: {}'.format(ssids))
-            self.logger.debug('Config content: {}'.format(loaded_cfg))
-            self.logger.debug('Private config content: {}'.
-                              format(private_cfg))
-            self.logger.debug('Configured networks: {}'.
-                              format(self._configured_networks))
+        The records are written to the @see config_storage by the next flush,
+        see @see config_flush_delay and @see flush_wifi_config. If networks
+        are saved, networks exceeding the @see config_capacity are removed.
+        The caller resets the health of the removed networks.
 
-            self.logger.info('Connecting to loaded network config...')
-            result = WifiHelper.connect(ssid=ssids,
-                                        password=passwords,
-                                        timeout=self.connection_timeout,
-                                        reconnect=False)
-            self.logger.debug('Result of connection: {}'.format(result))
+        :param      records:  The record types and networks, SSIDs or metadata
+        :type       records:  List[Tuple[int, Union[dict, str, list]]]
 
-            if result is False:
-                self._connection_result = self.CONNECTION_ISSUE_TIMEOUT
-        else:
-            self.logger.debug('WiFi config file does not (yet) exist')
-            self._connection_result = self.CONNECTION_ISSUE_NOT_CONFIGURED
+        :returns:   SSIDs of the evicted networks
+        :rtype:     List[str]
+        """
+        networks = self._get_wifi_config()
+        if networks is None:
+            networks = list()
+            self._config_index = dict()
+
+        for record_type, value in records:
+            self._config_garbage += self._apply_record(
+                networks=networks,
+                index=self._config_index,
+                record_type=record_type,
+                value=value)
+
+        self._config_cache = networks
+
+        saved = [value['ssid'] for record_type, value in records
+                 if record_type == self.CONFIG_RECORD_NETWORK]
+        evicted = list()
+        if saved:
+            # only saving networks evicts, never metadata updates
+            evicted = self._evict_networks(keep=saved)
+        if evicted:
+            records = records + [(self.CONFIG_RECORD_REMOVE, ssid)
+                                 for ssid in evicted]
+            for ssid in evicted:
+                self._config_garbage += self._apply_record(
+                    networks=networks,
+                    index=self._config_index,
+                    record_type=self.CONFIG_RECORD_REMOVE,
+                    value=ssid)
+            # indices of the remaining networks changed
+            self._reset_boot_state()
+            self.logger.info('Evicted networks: {}'.format(evicted))
+
+        self._configured_networks = [net['ssid'] for net in networks]
+        self._config_pending.extend(records)
+
+        if not self._config_flush_delay:
+            self.flush_wifi_config()
+            return evicted
+
+        # restart the delay on each change
+        if self._config_flush_timer is None:
+            self._config_flush_timer = Timer(-1)
+        self._config_flush_timer.deinit()
+        self._config_flush_timer.init(mode=Timer.ONE_SHOT,
+                                      period=self._config_flush_delay,
+                                      callback=self._flush_wifi_config_cb)
+
+        return evicted
+
+    def _evict_networks(self, keep: List[str]) -> List[str]:
+        """
+        Get the networks to remove to stay within the config capacity.
 
-        return result
+        The networks least recently connected successfully are evicted first,
+        ordered by the sequence number of their last success, which does not
+        depend on a synced time. Networks without a successful connection are
+        evicted before all others and in configured order. Networks to keep
+        are only evicted if they alone exceed the capacity.
 
-    def start_config(self) -> None:
-        """Start WiFi manager accesspoint and webserver."""
-        ap_name = 'WiFiManager_{}'.format(
-            GenericHelper.get_uuid(-4).decode('ascii'))
-        self.logger.info('Starting WiFiManager as AccessPoint "{}"'.
-                         format(ap_name))
-        result = self.wh.create_ap(ssid=ap_name,
-                                   password='',
-                                   channel=11,
-                                   timeout=5)
-        self.logger.debug('Created AP: {}'.format(result))
-        ifconfig = self.wh.ifconfig_ap
-        self.logger.debug(ifconfig)
+        :param      keep:  SSIDs of the networks to keep, e.g. just saved ones
+        :type       keep:  List[str]
 
-        # start scanning for available networks
-        self.scanning = True
+        :returns:   SSIDs of the networks to evict
+        :rtype:     List[str]
+        """
+        networks = self._config_cache or list()
+        excess = len(networks) - self._config_capacity
+        if not self._config_capacity or excess <= 0:
+            return list()
+
+        order = sorted(range(len(networks)),
+                       key=lambda idx: (networks[idx]['ssid'] in keep,
+                                        self._network_meta(
+                                            ssid=networks[idx]['ssid'],
+                                            net=networks[idx]).get(
+                                            'sequence', 0),
+                                        idx))
+
+        return [networks[idx]['ssid'] for idx in order[:excess]]
+
+    def _flush_wifi_config_cb(self, tim: Timer = None) -> None:
+        """
+        Timer callback function to write pending changes of the WiFi config.
 
-        # finally
-        self.run(port=80, debug=True)
-        # self.run(host=ifconfig.ip, port=80, debug=True)
+        :param      tim:  The timer calling this function.
+        :type       tim:  machine.Timer
+        """
+        self.flush_wifi_config()
 
-        self.logger.debug('Finished running the PicoWeb application')
-        self.scanning = False
-        self.logger.debug('Stopped scanning thread')
+    def flush_wifi_config(self) -> bool:
+        """
+        Write pending changes of the WiFi config to its storage.
 
-        # wait some time to end all threads savely
-        time.sleep(5)
+        Only the changes are written to the @see config_storage, e.g. they
+        are appended to an existing encrypted config file, which is compacted
+        in the background if too many records became garbage.
 
-        gc.collect()
-        self.logger.debug('Goodbye from WiFiManager')
+        :returns:   Flag whether changes have been written
+        :rtype:     bool
+        """
+        if self._config_flush_timer is not None:
+            self._config_flush_timer.deinit()
 
-    def _add_app_routes(self) -> None:
-        """Add all application routes to the webserver."""
+        if not self._config_pending:
+            return False
 
-        # self.app.add_url_rule('/', func=self.index)
-        # @app.route('/index')
-        # def index(self, req, resp): pass
-        # https://github.com/pfalcon/picoweb/blob/b74428ebdde97ed1795338c13a3bdf05d71366a0/picoweb/__init__.py#L251
-        self.app.add_url_rule('/', view_func=self.landing_page)
-        self.app.add_url_rule('/select', view_func=self.wifi_selection)
-        self.app.add_url_rule('/render_network_inputs',
-                              view_func=self.render_network_inputs)
-        self.app.add_url_rule('/configure', view_func=self.wifi_configs)
-        self.app.add_url_rule('/save_wifi_config',
-                              view_func=self.save_wifi_config,
-                              methods=['POST', 'GET'])
-        self.app.add_url_rule('/remove_wifi_config',
-                              view_func=self.remove_wifi_config,
-                              methods=['POST', 'GET'])
-        self.app.add_url_rule('/scan_result', view_func=self.scan_result)
+        records = self._config_pending
+        self._config_pending = list()
 
-        self.app.add_url_rule(
-            "/static/css/bootstrap.min.css",
-            view_func=self.styles
-        )
-        self.app.add_url_rule(
-            "/static/js/toast.js",
-            view_func=self.scripts
-        )
-        # regex not supported in Flask
-        # self.app.add_url_rule(re.compile(r'^\/(.+\.css)$'),
-        #                       view_func=self.styles)
-        # self.app.add_url_rule(url=re.compile(r'^\/(.+\.js)$'),
-        #                       view_func=self.scripts)
+        self.config_storage.update(records=records,
+                                   networks=self._config_cache,
+                                   index=self._config_index)
 
-        available_urls = {
-            "/select": {
-                "title": "Select WiFi",
-                "color": "border-primary",
-                "text": "Configure WiFi networks",
-            },
-            "/configure": {
-                "title": "Manage WiFi networks",
-                "color": "border-primary",
-                "text": "Remove credentials of configured WiFi networks",
-            },
-            "/scan_result": {
-                "title": "Scan data",
-                "color": "text-white bg-info",
-                "text": "Latest WiFi scan data as JSON",
-            }
-        }
+        return True
 
-        self.available_urls = available_urls
+    def _load_legacy_wifi_config_data(self, path: str) -> Union[dict,
+                                                                List[dict]]:
+        """
+        Load WiFi configuration data of an encrypted file in legacy format.
+
+        :param      path:  The full path to the file
+        :type       path:  str
 
-    def _encrypt_data(self, data: Union[str, list, dict]) -> bytes:
+        :returns:   The loaded data
+        :rtype:     Union[dict, List[dict]]
         """
-        Encrypt data with encryption key
+        # read file in binary as it contains encrypted data
+        encrypted_read_data = GenericHelper.load_file(path=path, mode='rb')
 
-        :param      data:  The data
-        :type       data:  Union[str, list, dict]
+        # decrypt read data
+        decrypted_data_str = self._decrypt_data(data=encrypted_read_data)
 
-        :returns:   Encrypted data
-        :rtype:     bytes
+        # convert string to dict
+        return GenericHelper.str_to_dict(data=decrypted_data_str)
+
+    def _load_legacy_networks(self, path: str) -> List[dict]:
         """
-        # create bytes array of the data and encrypt it
-        if not isinstance(data, str):
-            data = str(data)
+        Load the networks of an encrypted file in legacy format.
 
-        data_bytes = data.encode()
-        enc = AES.new(self._enc_key, AES.MODE_ECB)
+        :param      path:  The full path to the file
+        :type       path:  str
 
-        # add '\x00' to fill up the data string to reach a multiple of 16
-        encrypted_data = enc.encrypt(data_bytes + b'\x00' * ((16 - (len(data_bytes) % 16)) % 16))   # noqa: E501
+        :returns:   The networks, each SSID once
+        :rtype:     List[dict]
 
-        return encrypted_data
+        :raises     ValueError:  File is not in legacy format
+        """
+        data = self._load_legacy_wifi_config_data(path=path)
+        if isinstance(data, dict):
+            data = [data]
+        if not isinstance(data, list):
+            raise ValueError('WiFi config file in unknown format')
 
-    def _decrypt_data(self, data: bytes) -> str:
+        return self._dedupe_networks(networks=data)
+
+    def _recover_wifi_config(self, path: str) -> List[dict]:
         """
-        Decrypt data with decryption key
+        Recover an encrypted WiFi config file which could not be loaded.
 
-        :param      data:  The data
-        :type       data:  bytes
+        The complete file of an interrupted write and the previous generation
+        are tried before the file and then the previous generation are
+        converted from the legacy format. A recovered file is saved again,
+        the broken file does not become the previous generation. A converted
+        legacy file is not kept as previous generation. If nothing can be
+        recovered the broken file is removed and no network is configured.
 
-        :returns:   Decrypted data
-        :rtype:     str
+        :param      path:  The full path to the file
+        :type       path:  str
+
+        :returns:   The recovered networks
+        :rtype:     List[dict]
         """
-        # decrypt bytes array
-        dec = AES.new(self._enc_key, AES.MODE_ECB)
-        decrypted_data = dec.decrypt(data)
+        backup_path = '{}{}'.format(path, self.CONFIG_BACKUP_SUFFIX)
+        candidates = (
+            ('{}{}'.format(path, self.CONFIG_TMP_SUFFIX), False),
+            (backup_path, False),
+            (path, True),
+            (backup_path, True),
+        )
+        error = None
 
-        # remove added '\x00' stuff after decoding it to ascii
-        decrypted_data_str = decrypted_data.decode('ascii').rstrip('\x00')
+        for candidate, legacy in candidates:
+            if not PathHelper.exists(path=candidate):
+                continue
 
-        return decrypted_data_str
+            try:
+                if legacy:
+                    data = self._load_legacy_networks(path=candidate)
+                else:
+                    with self._config_lock:
+                        data = self._replay_wifi_config(path=candidate)
+            except (OSError, ValueError) as e:
+                self.logger.debug('Skipping {}: {}'.format(candidate, e))
+                error = e
+                continue
+
+            if candidate != path:
+                self.logger.warning('Recovered WiFi config of {}'.
+                                    format(candidate))
+                if PathHelper.exists(path=path):
+                    os.remove(str(path))
+            self._save_wifi_config_data(data=data, path=path)
+            if legacy and PathHelper.exists(path=backup_path):
+                os.remove(backup_path)
+
+            return data
+
+        self.logger.error('WiFi config is lost: {}'.format(error))
+        if PathHelper.exists(path=path):
+            os.remove(str(path))
+
+        return list()
 
     def extend_wifi_config_data(self,
                                 data: Union[dict, List[dict]],
                                 path: str,
-                                encrypted: bool = False) -> None:
+                                encrypted: bool = False) -> List[str]:
         """
         Extend WiFi configuration data of file.
 
@@ -358,9 +3145,26 @@ class WiFiManager(object):
         :type       path:       str
         :param      encrypted:  Flag to save data encrypted
         :type       encrypted:  bool, optional
+
+        :returns:   SSIDs of the networks evicted due to the capacity
+        :rtype:     List[str]
+
+        New networks are appended to an existing encrypted file. Networks of
+        the WiFi config file are added to its in memory view and written back
+        by the next flush, see @see flush_wifi_config. Only the WiFi config is
+        limited by the @see config_capacity.
         """
+        new_data = data if isinstance(data, list) else [data]
+
+        if encrypted and path == self._config_file:
+            return self._change_wifi_config(
+                records=[(self.CONFIG_RECORD_NETWORK, net)
+                         for net in new_data])
+
+        file_exists = PathHelper.exists(path=path)
+
         # in case the file already exists, extend its data content
-        if PathHelper.exists(path=path):
+        if file_exists:
             existing_data = self._load_wifi_config_data(path=path,
                                                         encrypted=encrypted)
             self.logger.debug('Existing WiFi config data: {}'.
@@ -380,6 +3184,8 @@ class WiFiManager(object):
                 # unknown content, overwrite it
                 pass
 
+        if isinstance(data, list):
+            data = self._dedupe_networks(networks=data)
         self.logger.debug('Updated data: {}'.format(data))
 
         ssids = list()
@@ -393,16 +3199,15 @@ class WiFiManager(object):
 
         self._configured_networks = ssids.copy()
 
-        if encrypted:
-            # create bytes array of the dict and encrypt it
-            encrypted_data = self._encrypt_data(data=data)
-
-            # save data to file as binary as it contains encrypted data
-            GenericHelper.save_file(data=encrypted_data,
-                                    path=path,
-                                    mode='wb')
-            self.logger.debug('Saved encrypted data as json: {}'.
-                              format(encrypted_data))
+        if encrypted and self._has_file_header(path=path):
+            # existing file got converted while loading it
+            self._append_wifi_config_records(
+                records=[(self.CONFIG_RECORD_NETWORK, net)
+                         for net in new_data],
+                path=path)
+            self._schedule_compaction(path=path)
+        elif encrypted:
+            self._save_wifi_config_data(data=data, path=path)
         else:
             # save data to file, no need for binary mode
             GenericHelper.save_json(data=data,
@@ -410,6 +3215,8 @@ class WiFiManager(object):
                                     mode='w')
             self.logger.debug('Saved data as json: {}'.format(data))
 
+        return list()
+
     def _load_wifi_config_data(self,
                                path: str,
                                encrypted: bool = False) -> Union[dict,
@@ -417,31 +3224,28 @@ class WiFiManager(object):
         """
         Load WiFi configuration data from file.
 
+        Encrypted files which can not be loaded are recovered, see
+        @see _recover_wifi_config.
+
         :param      path:       The full path to the file
         :type       path:       str
         :param      encrypted:  Flag to decrypt data
         :type       encrypted:  bool, optional
 
-        :returns:   The loaded data
+        :returns:   The loaded data, a list of networks if encrypted
         :rtype:     Union[dict, List[dict]]
         """
         data = dict()
 
         if encrypted:
-            # read file in binary as it contains encrypted data
-            encrypted_read_data = GenericHelper.load_file(path=path,
-                                                          mode='rb')
-            self.logger.debug('Read encrypted data: {}'.
-                              format(encrypted_read_data))
-
-            # decrypt read data
-            decrypted_data_str = self._decrypt_data(data=encrypted_read_data)
-            self.logger.debug('Decrypted data str: {}'.
-                              format(decrypted_data_str))
-
-            # convert string to dict
-            data = GenericHelper.str_to_dict(data=decrypted_data_str)
-            self.logger.debug('Decrypted data dict: {}'.format(data))
+            try:
+                with self._config_lock:
+                    data = self._replay_wifi_config(path=path)
+            except (OSError, ValueError) as e:
+                self.logger.info('Recovering WiFi config: {}'.format(e))
+                data = self._recover_wifi_config(path=path)
+            self.logger.debug('Loaded {} encrypted networks'.
+                              format(len(data)))
         else:
             data = GenericHelper.load_json(path=path, mode='r')
             self.logger.debug('Read non encrypted data: {}'.
@@ -481,6 +3285,7 @@ class WiFiManager(object):
                 # rescan for available networks
                 found_nets = wh.get_wifi_networks_sorted(rescan=True,
                                                          scan_if_empty=True)
+                self._last_scan = time.ticks_ms()
 
                 msg.set(found_nets)
 
@@ -656,12 +3461,15 @@ class WiFiManager(object):
 
         return content
 
-    def _save_wifi_config(self, form_data: dict) -> None:
+    def _network_from_form(self, form_data: dict) -> Union[dict, None]:
         """
-        Save a new WiFi configuration to the WiFi configuration file.
+        Get the network configuration of the submitted form data.
 
         :param      form_data:  The form data
         :type       form_data:  dict
+
+        :returns:   The network with SSID and password, None if no valid SSID
+        :rtype:     Union[dict, None]
         """
         network_cfg = dict()
         available_nets = self.latest_scan
@@ -692,7 +3500,7 @@ class WiFiManager(object):
             network_cfg['ssid'] = form_data['ssid']
         else:
             if 'bssid' not in form_data:
-                return
+                return None
 
             # selected_bssid = form_data['wifi_network']
             selected_bssid = form_data['bssid']
@@ -715,20 +3523,149 @@ class WiFiManager(object):
         self.logger.info('Network cfg: {}'.format(network_cfg))
         # Network cfg: {'ssid': 'TP-LINK_FBFC3C', 'password': 'qwertz'}
 
-        if 'ssid' in network_cfg:
-            if isinstance(network_cfg['ssid'], bytes):
-                network_cfg['ssid'] = network_cfg['ssid'].decode('ascii')
+        if 'ssid' not in network_cfg:
+            self.logger.info('No valid SSID found, will not save this net')
+            return None
+
+        if isinstance(network_cfg['ssid'], bytes):
+            network_cfg['ssid'] = network_cfg['ssid'].decode('ascii')
+
+        return network_cfg
+
+    def _save_wifi_config(self, form_data: dict) -> dict:
+        """
+        Verify and save a new WiFi configuration to the WiFi config file.
+
+        The credentials are tested by connecting the station while the
+        accesspoint stays active. Only a network the station connected to is
+        saved, the station stays connected to it.
+
+        :param      form_data:  The form data
+        :type       form_data:  dict
+
+        :returns:   SSID, result and failure status of the verification
+        :rtype:     dict
+        """
+        network_cfg = self._network_from_form(form_data=form_data)
+        if network_cfg is None:
+            return {'ssid': None, 'connected': False, 'status': None,
+                    'evicted': list()}
+
+        health = self._start_verification(net=network_cfg)
+        result = False
+        if self._start_connection(net=network_cfg):
+            result = self._wait_for_connection(ssid=network_cfg['ssid'])
+
+        return self._finish_verification(net=network_cfg,
+                                         result=result,
+                                         health=health)
+
+    async def _save_wifi_config_async(self, form_data: dict) -> dict:
+        """
+        Verify and save a new WiFi configuration to the WiFi config file.
+
+        Coroutine version of @see _save_wifi_config, the webserver keeps
+        serving while the credentials are tested.
+
+        :param      form_data:  The form data
+        :type       form_data:  dict
+
+        :returns:   SSID, result and failure status of the verification
+        :rtype:     dict
+        """
+        network_cfg = self._network_from_form(form_data=form_data)
+        if network_cfg is None:
+            return {'ssid': None, 'connected': False, 'status': None,
+                    'evicted': list()}
+
+        health = self._start_verification(net=network_cfg)
+        result = False
+        if self._start_connection(net=network_cfg):
+            result = await self._wait_for_connection_async(
+                ssid=network_cfg['ssid'])
+
+        return self._finish_verification(net=network_cfg,
+                                         result=result,
+                                         health=health)
+
+    def _start_verification(self, net: dict) -> Union[List[int], None]:
+        """
+        Prepare the verification of new credentials of a network.
+
+        :param      net:  The network with SSID and password
+        :type       net:  dict
+
+        :returns:   Copy of the current health entry of the network
+        :rtype:     Union[List[int], None]
+        """
+        self._load_state()
+        self._last_status = None
+        self.logger.info('Verifying credentials of "{}"'.format(net['ssid']))
+
+        health = self._state.get('health', dict()).get(net['ssid'])
+        if health is not None:
+            health = list(health)
+
+        return health
+
+    def _finish_verification(self,
+                             net: dict,
+                             result: bool,
+                             health: Union[List[int], None]) -> dict:
+        """
+        Save the credentials of a network if the verification succeeded.
+
+        A failed verification does not change the quarantine state of an
+        already configured network with the same SSID.
+
+        :param      net:     The network with SSID and password
+        :type       net:     dict
+        :param      result:  The result of the connection attempt
+        :type       result:  bool
+        :param      health:  The health entry before the verification
+        :type       health:  Union[List[int], None]
 
-            self.logger.info('Raw network config: {}'.format(network_cfg))
+        :returns:   SSID, result and failure status of the verification and
+                    the SSIDs of the networks evicted by saving it
+        :rtype:     dict
+        """
+        verification = {
+            'ssid': net['ssid'],
+            'connected': result,
+            'status': None,
+            'evicted': list(),
+        }
 
+        if result:
             # save data in encrypted mode
-            self.extend_wifi_config_data(data=network_cfg,
-                                         path=self._config_file,
-                                         encrypted=True)
+            verification['evicted'] = self.extend_wifi_config_data(
+                data=net,
+                path=self._config_file,
+                encrypted=True)
             self.logger.info('Saving of network config to {} done'.
                              format(self._config_file))
+            self._remember_boot(ssid=net['ssid'])
+
+            all_health = self._state.get('health', dict())
+            for ssid in verification['evicted']:
+                if all_health.pop(ssid, None):
+                    self._state_changed = True
         else:
-            self.logger.info('No valid SSID found, will not save this net')
+            self.logger.info('Verification of "{}" failed, will not save '
+                             'this net'.format(net['ssid']))
+            verification['status'] = self._last_status
+            self._reset_connection()
+
+            all_health = self._state.setdefault('health', dict())
+            if health is None:
+                all_health.pop(net['ssid'], None)
+            else:
+                all_health[net['ssid']] = health
+
+        if self._state_changed:
+            self._save_state()
+
+        return verification
 
     def _remove_wifi_config(self, form_data: dict) -> None:
         """
@@ -738,28 +3675,130 @@ class WiFiManager(object):
         :type       form_data:  dict
         """
         if len(form_data):
-            loaded_cfg = self._load_wifi_config_data(path=self._config_file,
-                                                     encrypted=True)
+            self._get_wifi_config()
+            removed_ssids = [
+                ssid for ssid in form_data if ssid in self._config_index]
+
+            self._reset_network_health(ssids=list(form_data.keys()))
+            # indices of the remaining networks changed
+            self._reset_boot_state()
+
+            if removed_ssids:
+                self._change_wifi_config(
+                    records=[(self.CONFIG_RECORD_REMOVE, ssid)
+                             for ssid in removed_ssids])
+
+    def _validate_network(self, net: dict) -> Union[str, None]:
+        """
+        Validate a network to provision.
+
+        The password of a WPA network has 8 to 64 characters, an empty
+        password is used for an open network.
+
+        :param      net:  The network with SSID, password and priority
+        :type       net:  dict
+
+        :returns:   Reason why the network is invalid, None if valid
+        :rtype:     Union[str, None]
+        """
+        if not isinstance(net, dict):
+            return 'invalid network'
 
-            updated_cfg = list()
-            updated_ssids = list()
+        ssid = net.get('ssid')
+        if not isinstance(ssid, str) or not 0 < len(ssid.encode()) <= 32:
+            return 'invalid ssid'
 
-            for net in loaded_cfg:
-                if net['ssid'] not in form_data:
-                    updated_cfg.append(net)
-                    updated_ssids.append(net['ssid'])
+        password = net.get('password', '')
+        if (not isinstance(password, str) or
+                not (len(password) == 0 or 8 <= len(password) <= 64)):
+            return 'invalid password'
 
-            self._configured_networks = updated_ssids.copy()
+        priority = net.get('priority', 0)
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            return 'invalid priority'
 
-            # create bytes array of the dict and encrypt it
-            encrypted_data = self._encrypt_data(data=updated_cfg)
+        return None
 
-            # save to file as binary
-            GenericHelper.save_file(data=encrypted_data,
-                                    path=self._config_file,
-                                    mode='wb')
-            self.logger.debug('Saved encrypted data as json: {}'.
-                              format(encrypted_data))
+    def _provision_networks(self, data: Union[dict, List[dict]]) -> dict:
+        """
+        Add, replace and remove several networks at once.
+
+        All entries are validated first, the changes are only applied if all
+        entries are valid. They are written to the WiFi config file at once.
+
+        :param      data:  The networks or a dict with the "networks" to add
+                           or replace and the SSIDs of the networks to
+                           "remove"
+        :type       data:  Union[dict, List[dict]]
+
+        :returns:   Flag whether the changes were saved and the result of each
+                    entry, added, updated, removed, not configured or the
+                    reason why it is invalid. Networks evicted due to the
+                    @see config_capacity are listed as evicted
+        :rtype:     dict
+        """
+        if isinstance(data, list):
+            data = {'networks': data}
+        if not isinstance(data, dict):
+            return {'saved': False, 'results': list()}
+
+        networks = data.get('networks', list())
+        remove = data.get('remove', list())
+        if not isinstance(networks, list) or not isinstance(remove, list):
+            return {'saved': False, 'results': list()}
+
+        self._get_wifi_config()
+        known = set(self._config_index)
+        records = list()
+        results = list()
+        valid = True
+
+        for net in networks:
+            error = self._validate_network(net=net)
+            if error:
+                valid = False
+                ssid = net.get('ssid') if isinstance(net, dict) else None
+                results.append({'ssid': ssid, 'result': error})
+                continue
+
+            stored = {'ssid': net['ssid'], 'password': net.get('password', '')}
+            if 'priority' in net:
+                stored['priority'] = net['priority']
+            records.append((self.CONFIG_RECORD_NETWORK, stored))
+            results.append({
+                'ssid': net['ssid'],
+                'result': 'updated' if net['ssid'] in known else 'added'
+            })
+            known.add(net['ssid'])
+
+        for ssid in remove:
+            if not isinstance(ssid, str):
+                valid = False
+                results.append({'ssid': ssid, 'result': 'invalid ssid'})
+            elif ssid in known:
+                known.discard(ssid)
+                records.append((self.CONFIG_RECORD_REMOVE, ssid))
+                results.append({'ssid': ssid, 'result': 'removed'})
+            else:
+                results.append({'ssid': ssid, 'result': 'not configured'})
+
+        if not valid:
+            self.logger.info('Invalid networks to provision, nothing saved')
+            return {'saved': False, 'results': results}
+
+        if records:
+            evicted = self._change_wifi_config(records=records)
+            results.extend({'ssid': ssid, 'result': 'evicted'}
+                           for ssid in evicted)
+            self.flush_wifi_config()
+            self._reset_network_health(
+                ssids=[result['ssid'] for result in results])
+            if any(result['result'] == 'removed' for result in results):
+                # indices of the remaining networks changed
+                self._reset_boot_state()
+            self.logger.info('Provisioned {} records'.format(len(records)))
+
+        return {'saved': True, 'results': results}
 
     # -------------------------------------------------------------------------
     # Webserver functions
@@ -782,6 +3821,11 @@ class WiFiManager(object):
         """Provide latest found networks as JSON"""
         return jsonify(self.latest_scan)
 
+    # @app.route("/connection_timelines")
+    def connection_timelines_result(self):
+        """Provide timelines of the latest connection attempts as JSON"""
+        return jsonify(self.connection_timelines)
+
     # @app.route("/select")
     def wifi_selection(self):
         """
@@ -829,6 +3873,7 @@ class WiFiManager(object):
 
     # @app.route("/save_wifi_config", methods=['POST', 'GET'])
     def save_wifi_config(self):
+        """Verify and save the specified WiFi network, return result as JSON"""
         form_data = dict(request.form)
 
         self.logger.info('WiFi user input content: {}'.format(form_data))
@@ -839,9 +3884,11 @@ class WiFiManager(object):
         # result if nothing is selected
         # {'ssid': '', 'password': ''}
 
-        self._save_wifi_config(form_data=form_data)
+        result = self._save_wifi_config(form_data=form_data)
+        # {'ssid': 'myCustom Net', 'connected': True, 'status': None}
 
-        return redirect(url_for('landing_page'))
+        # report the result of the verification to the webpage
+        return jsonify(result), 200 if result['connected'] else 400
 
     # @app.route("/remove_wifi_config, methods=['POST', 'GET'])
     def remove_wifi_config(self):
@@ -857,6 +3904,18 @@ class WiFiManager(object):
         headers = {'Location': '/configure'}    # noqa: F841
         return redirect(url_for('wifi_configs'))
 
+    # @app.route("/provision", methods=['POST'])
+    def provision(self):
+        """
+        Add, replace and remove several networks given as JSON at once
+
+        The result of each entry is returned as JSON
+        """
+        result = self._provision_networks(
+            data=request.get_json(silent=True))
+
+        return jsonify(result), 200 if result['saved'] else 400
+
     # @app.route(re.compile('^\/(.+\.css)$'))
     def styles(self):
         """
@@ -968,6 +4027,41 @@ class WiFiManager(object):
         except Exception as e:
             self.logger.warning(e)
 
+        # write changes made via the webpages
+        self.flush_wifi_config()
+
+    async def run_async(self,
+                        host: str = '0.0.0.0',
+                        port: int = 80,
+                        debug: bool = False) -> None:
+        """
+        Run the web application as coroutine
+
+        Flask has no asyncio server, it is run in an executor thread without
+        the reloader, which is only supported in the main thread.
+
+        :param      host:   The hostname to listen on
+        :type       host:   str, optional
+        :param      port:   The port of the webserver
+        :type       port:   int, optional
+        :param      debug:  Flag to show debug content
+        :type       debug:  bool, optional
+        """
+        self.logger.debug('Run app on {}:{} with debug: {}'.format(host,
+                                                                   port,
+                                                                   debug))
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None,
+                                       lambda: self.app.run(
+                                           debug=debug,
+                                           use_reloader=False))
+        except Exception as e:
+            self.logger.warning(e)
+
+        # write changes made via the webpages
+        self.flush_wifi_config()
+
 
 if __name__ == "__main__":
     wm = WiFiManager(logger=None, quiet=False)
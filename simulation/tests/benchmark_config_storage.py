@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Benchmark of the WiFi config storage backends
+
+Measure the time and the peak memory to load all networks, to save and to
+remove a single network with each storage backend for several numbers of
+configured networks.
+
+Run it from the simulation directory
+
+    PYTHONPATH=src python tests/benchmark_config_storage.py
+"""
+
+import argparse
+from pathlib import Path
+import shutil
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List
+
+# custom imports
+from wifi_manager import WiFiManager
+from wifi_manager.storage import ConfigStorage
+from wifi_manager.storage import DirectoryStorage
+from wifi_manager.storage import EncryptedFileStorage
+from wifi_manager.storage import MemoryStorage
+
+BACKENDS = ('EncryptedFileStorage', 'MemoryStorage', 'DirectoryStorage')
+SIZES = (1, 10, 100, 500)
+OPERATIONS = ('load', 'save', 'remove')
+
+
+def create_networks(amount: int) -> List[dict]:
+    """
+    Create networks with unique SSIDs and some metadata.
+
+    :param      amount:  The amount of networks
+    :type       amount:  int
+
+    :returns:   The networks
+    :rtype:     List[dict]
+    """
+    return [
+        {
+            'ssid': 'Network {:03d}'.format(idx),
+            'password': 'password-{}'.format(idx),
+            'last_success': 1700000000 + idx,
+            'successes': idx,
+        }
+        for idx in range(amount)
+    ]
+
+
+def create_storage(name: str, wm: WiFiManager, path: Path) -> ConfigStorage:
+    """
+    Create a storage backend.
+
+    :param      name:  The name of the storage class
+    :type       name:  str
+    :param      wm:    The WiFi manager encrypting the networks
+    :type       wm:    WiFiManager
+    :param      path:  The directory of the stored files
+    :type       path:  Path
+
+    :returns:   The storage backend
+    :rtype:     ConfigStorage
+    """
+    if name == 'EncryptedFileStorage':
+        return EncryptedFileStorage(manager=wm,
+                                    path=str(path / 'wifi-secure.json'))
+    elif name == 'DirectoryStorage':
+        return DirectoryStorage(manager=wm, path=str(path / 'wifi-secure'))
+
+    return MemoryStorage()
+
+
+def prepare(name: str, amount: int, path: Path) -> WiFiManager:
+    """
+    Create a WiFi manager using a backend with stored networks.
+
+    :param      name:    The name of the storage class
+    :type       name:    str
+    :param      amount:  The amount of stored networks
+    :type       amount:  int
+    :param      path:    The directory of the stored files
+    :type       path:    Path
+
+    :returns:   WiFi manager, networks are not yet loaded
+    :rtype:     WiFiManager
+    """
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir()
+
+    wm = WiFiManager(logger=None, quiet=True)
+    wm._state_file = str(path / 'wifi-state.json')
+    wm.config_flush_delay = 0
+    # measure the backends, not the eviction of networks
+    wm.config_capacity = 0
+
+    storage = create_storage(name=name, wm=wm, path=path)
+    storage.save(networks=create_networks(amount=amount))
+    wm.config_storage = storage
+
+    return wm
+
+
+def operation(name: str, wm: WiFiManager) -> Callable[[], None]:
+    """
+    Get the function of an operation to benchmark.
+
+    Networks are loaded before a network is saved or removed.
+
+    :param      name:  The name of the operation
+    :type       name:  str
+    :param      wm:    The WiFi manager
+    :type       wm:    WiFiManager
+
+    :returns:   The function to measure
+    :rtype:     Callable[[], None]
+    """
+    if name == 'load':
+        return wm._get_wifi_config
+
+    wm._get_wifi_config()
+    if name == 'save':
+        return lambda: wm.extend_wifi_config_data(
+            data={'ssid': 'New Network', 'password': 'password'},
+            path=wm._config_file,
+            encrypted=True)
+
+    return lambda: wm._remove_wifi_config(form_data={'Network 000': 'on'})
+
+
+def measure(backend: str, amount: int, name: str, path: Path) -> dict:
+    """
+    Measure time and peak memory of an operation.
+
+    Time and memory are measured in separate runs, as tracing the memory
+    slows down the operation.
+
+    :param      backend:  The name of the storage class
+    :type       backend:  str
+    :param      amount:   The amount of stored networks
+    :type       amount:   int
+    :param      name:     The name of the operation
+    :type       name:     str
+    :param      path:     The directory of the stored files
+    :type       path:     Path
+
+    :returns:   Time in milliseconds and peak memory in byte
+    :rtype:     dict
+    """
+    func = operation(name=name, wm=prepare(name=backend,
+                                           amount=amount,
+                                           path=path))
+    start = time.perf_counter()
+    func()
+    duration = (time.perf_counter() - start) * 1000
+
+    func = operation(name=name, wm=prepare(name=backend,
+                                           amount=amount,
+                                           path=path))
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'time': duration, 'peak': peak}
+
+
+def run(sizes: List[int]) -> List[dict]:
+    """
+    Benchmark all backends and operations.
+
+    :param      sizes:  The amounts of stored networks
+    :type       sizes:  List[int]
+
+    :returns:   Result of each backend, amount and operation
+    :rtype:     List[dict]
+    """
+    results = list()
+    tmp_dir = Path(tempfile.mkdtemp())
+
+    try:
+        for backend in BACKENDS:
+            for amount in sizes:
+                for name in OPERATIONS:
+                    result = measure(backend=backend,
+                                     amount=amount,
+                                     name=name,
+                                     path=tmp_dir / 'storage')
+                    result.update({
+                        'backend': backend,
+                        'networks': amount,
+                        'operation': name
+                    })
+                    results.append(result)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('sizes',
+                        nargs='*',
+                        type=int,
+                        default=list(SIZES),
+                        help='Amounts of stored networks')
+    args = parser.parse_args()
+
+    print('{:<22} {:>8} {:<8} {:>10} {:>12}'.format(
+        'Backend', 'Networks', 'Op', 'Time [ms]', 'Peak [byte]'))
+    for result in run(sizes=args.sizes):
+        print('{backend:<22} {networks:>8} {operation:<8} {time:>10.2f} '
+              '{peak:>12}'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
@@ -10,8 +10,9 @@ from unittest.mock import patch
 import sys
 
 # custom imports
+from wifi_helper import network
 from wifi_helper.network import NetworkHelper
-# from wifi_helper.network import Station
+from wifi_helper.network import Station
 from wifi_helper.network import Client
 # from wifi_helper.network import WLAN
 
@@ -175,13 +176,53 @@ class TestStation(unittest.TestCase):
     def test_active(self) -> None:
         pass
 
-    @unittest.skip("Not yet implemented")
     def test_connect(self) -> None:
-        pass
+        """Test connecting to a network"""
+        station = Station()
+        self.assertFalse(station.isconnected())
+
+        station.connect('TP-LINK_FBFC3C', '1234')
+        self.assertTrue(station.isconnected())
+        self.assertEqual(station.config('essid'), 'TP-LINK_FBFC3C')
+        self.assertEqual(station.status(), network.STAT_GOT_IP)
+
+    @params(
+        ('qwertz', '1234', network.STAT_NO_AP_FOUND),
+        ('TP-LINK_FBFC3C', 'wrong', network.STAT_WRONG_PASSWORD),
+        ('FRITZ!Box 7490', '1234', network.STAT_GOT_IP)
+    )
+    def test_connect_status(self,
+                            ssid: str,
+                            password: str,
+                            status: int) -> None:
+        """
+        Test the link status after connecting to a network
+
+        :param      ssid:      The SSID of the network
+        :type       ssid:      str
+        :param      password:  The password of the network
+        :type       password:  str
+        :param      status:    The expected link status
+        :type       status:    int
+        """
+        station = Station()
+
+        with patch.object(Station, 'wrong_password', 'wrong'):
+            station.connect(ssid, password)
+
+        self.assertEqual(station.status(), status)
+        self.assertEqual(station.isconnected(),
+                         status == network.STAT_GOT_IP)
+        self.assertEqual(station.config('essid'), ssid)
 
-    @unittest.skip("Not yet implemented")
     def test_disconnect(self) -> None:
-        pass
+        """Test disconnecting from a network"""
+        station = Station()
+        station.connect('qwertz', '1234')
+
+        station.disconnect()
+        self.assertFalse(station.isconnected())
+        self.assertEqual(station.status(), network.STAT_IDLE)
 
     @unittest.skip("Not yet implemented")
     def test_isconnected(self) -> None:
@@ -191,13 +232,42 @@ class TestStation(unittest.TestCase):
     def test_scan(self) -> None:
         pass
 
-    @unittest.skip("Not yet implemented")
     def test_status(self) -> None:
-        pass
+        """Test getting the link status"""
+        station = Station()
+        self.assertEqual(station.status(), network.STAT_IDLE)
+        self.assertIsInstance(station.status('rssi'), int)
+
+        # unknown network
+        station.connect('qwertz', '1234')
+        self.assertEqual(station.status(), network.STAT_NO_AP_FOUND)
+        station.disconnect()
+        self.assertEqual(station.status(), network.STAT_IDLE)
+
+        # wrong password
+        with patch.object(Station, 'wrong_password', '1234'):
+            station.connect('TP-LINK_FBFC3C', '1234')
+        self.assertEqual(station.status(), network.STAT_WRONG_PASSWORD)
+
+        station.connect('TP-LINK_FBFC3C', 'asdf')
+        self.assertEqual(station.status(), network.STAT_GOT_IP)
 
-    @unittest.skip("Not yet implemented")
     def test_ifconfig(self) -> None:
-        pass
+        """Test setting a static IP configuration and using DHCP again"""
+        station = Station()
+        static = ('192.168.4.2', '255.255.255.0', '192.168.4.1', '8.8.8.8')
+        dhcp = ('192.168.178.42', '255.255.255.0', '192.168.178.1',
+                '192.168.178.1')
+
+        with patch.object(station, '_gather_ifconfig_data',
+                          return_value=dhcp):
+            self.assertEqual(station.ifconfig(), dhcp)
+
+            station.ifconfig(list(static))
+            self.assertEqual(station.ifconfig(), static)
+
+            station.ifconfig('dhcp')
+            self.assertEqual(station.ifconfig(), dhcp)
 
     @unittest.skip("Not yet implemented")
     def test_config(self) -> None:
@@ -16,7 +16,7 @@ class TestRTC(unittest.TestCase):
         self.rtc = RTC()
 
     def tearDown(self) -> None:
-        pass
+        self.rtc.memory(b'')
 
     def test__init(self) -> None:
         """Test initial values"""
@@ -51,6 +51,23 @@ class TestRTC(unittest.TestCase):
         self.assertTrue(all(isinstance(ele, int) for ele in datetime))
         self.assertEqual(datetime, (2000, 1, 1, 0, 0, 0, 0, 0))
 
+    def test_memory(self) -> None:
+        """Test keeping data in RTC memory"""
+        self.assertEqual(self.rtc.memory(), b'')
+
+        self.assertIsNone(self.rtc.memory(b'WM\x01'))
+        self.assertEqual(self.rtc.memory(), b'WM\x01')
+
+        # content is shared with other instances, like after a warm reboot
+        self.assertEqual(RTC().memory(), b'WM\x01')
+
+        with self.assertRaises(ValueError):
+            self.rtc.memory(bytes(RTC.MEMORY_SIZE + 1))
+        self.assertEqual(self.rtc.memory(), b'WM\x01')
+
+        self.rtc.memory(bytearray(RTC.MEMORY_SIZE))
+        self.assertEqual(len(self.rtc.memory()), RTC.MEMORY_SIZE)
+
 
 if __name__ == '__main__':
     unittest.main()
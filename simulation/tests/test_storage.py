@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""Unittest of WiFi config storage"""
+
+from nose2.tools import params
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# custom imports
+from wifi_manager import WiFiManager
+from wifi_manager.storage import ConfigStorage
+from wifi_manager.storage import DirectoryStorage
+from wifi_manager.storage import EncryptedFileStorage
+from wifi_manager.storage import MemoryStorage
+from tests import benchmark_config_storage
+
+
+class TestConfigStorage(unittest.TestCase):
+    # Set maximum size of the assertion error message when Unit Test fail
+    maxDiff = None
+
+    def setUp(self) -> None:
+        self.wm = WiFiManager(logger=None, quiet=True)
+        self.wm.config_flush_delay = 0
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.wm._state_file = str(Path(self.tmp_dir) / 'wifi-state.json')
+
+        self.networks = [
+            {"ssid": "net_0", "password": "password_0"},
+            {"ssid": "net_1", "password": "password_1"},
+            {"ssid": "net_2", "password": "password_2"},
+        ]
+
+    def tearDown(self) -> None:
+        self.wm.flush_wifi_config()
+        shutil.rmtree(self.tmp_dir)
+
+    def create_storage(self, name: str) -> ConfigStorage:
+        """
+        Create a storage backend in the tmp directory.
+
+        :param      name:  The name of the storage class
+        :type       name:  str
+
+        :returns:   The storage backend
+        :rtype:     ConfigStorage
+        """
+        if name == 'EncryptedFileStorage':
+            return EncryptedFileStorage(
+                manager=self.wm,
+                path=str(Path(self.tmp_dir) / 'wifi-secure.json'))
+        elif name == 'DirectoryStorage':
+            return DirectoryStorage(
+                manager=self.wm,
+                path=str(Path(self.tmp_dir) / 'wifi-secure'))
+
+        return MemoryStorage()
+
+    def test_interface(self) -> None:
+        """Test the interface not being implemented"""
+        storage = ConfigStorage()
+
+        with self.assertRaises(NotImplementedError):
+            storage.exists()
+        with self.assertRaises(NotImplementedError):
+            storage.load()
+        with self.assertRaises(NotImplementedError):
+            storage.save(networks=[])
+        with self.assertRaises(NotImplementedError):
+            storage.update(records=[], networks=[], index={})
+
+    @params(
+        ({"ssid": "net_0", "password": "pw"}, 'net_0'),
+        ('net_1', 'net_1'),
+        (['net_2', None, 1234], 'net_2'),
+        ({"password": "pw"}, None),
+    )
+    def test_record_ssid(self, value, expectation) -> None:
+        """Test getting the SSID of each record type"""
+        self.assertEqual(ConfigStorage.record_ssid(value=value), expectation)
+
+    @params(
+        ('EncryptedFileStorage', ),
+        ('MemoryStorage', ),
+        ('DirectoryStorage', ),
+    )
+    def test_save_and_load(self, name: str) -> None:
+        """
+        Test saving and loading networks of each backend
+
+        :param      name:  The name of the storage class
+        :type       name:  str
+        """
+        storage = self.create_storage(name=name)
+        self.assertFalse(storage.exists())
+
+        storage.save(networks=self.networks)
+        self.assertTrue(storage.exists())
+        self.assertEqual(storage.load(), self.networks)
+
+        # loaded networks are no references to the saved ones
+        storage.load()[0]['password'] = 'changed'
+        self.assertEqual(storage.load(), self.networks)
+
+        storage.save(networks=self.networks[1:])
+        self.assertEqual(storage.load(), self.networks[1:])
+
+    @params(
+        ('EncryptedFileStorage', ),
+        ('MemoryStorage', ),
+        ('DirectoryStorage', ),
+    )
+    def test_config_storage(self, name: str) -> None:
+        """
+        Test adding, replacing and removing networks with each backend
+
+        :param      name:  The name of the storage class
+        :type       name:  str
+        """
+        storage = self.create_storage(name=name)
+        self.wm.config_storage = storage
+        self.assertIs(self.wm.config_storage, storage)
+        self.assertIsNone(self.wm._load_networks())
+
+        self.wm.extend_wifi_config_data(data=self.networks,
+                                        path=self.wm._config_file,
+                                        encrypted=True)
+        self.wm.extend_wifi_config_data(
+            data={"ssid": "net_1", "password": "new_password"},
+            path=self.wm._config_file,
+            encrypted=True)
+        self.wm._update_network_meta(ssid='net_2', changes={'successes': 1})
+        self.wm._remove_wifi_config(form_data={'net_0': 'on'})
+
+        expectation = [
+            {"ssid": "net_1", "password": "new_password"},
+            {"ssid": "net_2", "password": "password_2", "successes": 1},
+        ]
+        self.assertEqual(self.wm._get_wifi_config(), expectation)
+        self.assertEqual(storage.load(), expectation)
+
+        # a new instance loads the networks from the storage
+        wm = WiFiManager(logger=None, quiet=True)
+        wm._state_file = self.wm._state_file
+        wm.config_storage = storage
+        self.assertEqual(wm._load_networks(), expectation)
+        self.assertEqual(wm.configured_networks, ['net_1', 'net_2'])
+
+    def test_directory_storage_update(self) -> None:
+        """Test rewriting only the files of changed networks"""
+        storage = self.create_storage(name='DirectoryStorage')
+        self.wm.config_storage = storage
+        self.wm.extend_wifi_config_data(data=self.networks,
+                                        path=self.wm._config_file,
+                                        encrypted=True)
+        self.assertEqual(len(storage._network_files()), 3)
+        self.assertEqual(sorted(os.listdir(storage.path)),
+                         sorted([storage._network_name(ssid=net['ssid'])
+                                 for net in self.networks] +
+                                [DirectoryStorage.ORDER_FILE]))
+
+        with patch.object(self.wm, '_write_encrypted_file',
+                          wraps=self.wm._write_encrypted_file) as mock:
+            self.wm._update_network_meta(ssid='net_1',
+                                         changes={'successes': 1})
+        mock.assert_called_once()
+        self.assertEqual(mock.call_args.kwargs['path'],
+                         storage._network_file(ssid='net_1'))
+
+        # previous generation of the rewritten network is kept
+        self.assertEqual(len(os.listdir(storage.path)), 5)
+        self.assertTrue(Path(storage._network_file(ssid='net_1') +
+                             WiFiManager.CONFIG_BACKUP_SUFFIX).exists())
+
+        with patch.object(self.wm, '_write_encrypted_file') as mock:
+            self.wm._remove_wifi_config(form_data={'net_0': 'on'})
+        mock.assert_not_called()
+        self.assertEqual(len(storage._network_files()), 2)
+        self.assertFalse(Path(storage._network_file(ssid='net_0')).exists())
+
+        # names of files are independent of special chars of the SSID
+        self.wm.extend_wifi_config_data(
+            data={"ssid": "../Net/ 1", "password": "password"},
+            path=self.wm._config_file,
+            encrypted=True)
+        self.assertEqual(len(storage._network_files()), 3)
+        self.assertEqual([net['ssid'] for net in storage.load()],
+                         ['net_1', 'net_2', '../Net/ 1'])
+
+    def test_directory_storage_order(self) -> None:
+        """Test loading the networks in their configured order"""
+        storage = self.create_storage(name='DirectoryStorage')
+        networks = [
+            {"ssid": "zz", "password": "password_z"},
+            {"ssid": "aa", "password": "password_a"},
+            {"ssid": "mm", "password": "password_m"},
+        ]
+        storage.save(networks=networks)
+        self.assertEqual(storage.load(), networks)
+
+        # replacing a network keeps its position and the order file
+        order_file = Path(storage.path) / DirectoryStorage.ORDER_FILE
+        mtime = order_file.stat().st_mtime_ns
+        networks[1] = {"ssid": "aa", "password": "new_password"}
+        storage.update(records=[(WiFiManager.CONFIG_RECORD_NETWORK,
+                                 networks[1])],
+                       networks=networks,
+                       index={'zz': 0, 'aa': 1, 'mm': 2})
+        self.assertEqual(storage.load(), networks)
+        self.assertEqual(order_file.stat().st_mtime_ns, mtime)
+
+        # added and removed networks change the order file
+        networks = [networks[0], networks[2],
+                    {"ssid": "bb", "password": "password_b"}]
+        storage.update(records=[(WiFiManager.CONFIG_RECORD_REMOVE, 'aa'),
+                                (WiFiManager.CONFIG_RECORD_NETWORK,
+                                 networks[2])],
+                       networks=networks,
+                       index={'zz': 0, 'mm': 1, 'bb': 2})
+        self.assertEqual(storage.load(), networks)
+
+        # files missing in the order file are loaded last, sorted by name
+        order_file.unlink()
+        self.assertEqual([net['ssid'] for net in storage.load()],
+                         ['bb', 'mm', 'zz'])
+
+    def test_memory_storage(self) -> None:
+        """Test providing networks in RAM"""
+        storage = MemoryStorage(networks=self.networks)
+        self.assertTrue(storage.exists())
+
+        self.wm.config_storage = storage
+        with patch.object(self.wm, '_load_wifi_config_data') as mock:
+            self.assertEqual(self.wm._load_networks(), self.networks)
+        mock.assert_not_called()
+
+        # the default encrypted config file is used again
+        self.wm.config_storage = None
+        self.assertIsInstance(self.wm.config_storage, EncryptedFileStorage)
+        self.assertEqual(self.wm.config_storage.path, self.wm._config_file)
+
+        # unsupported values are ignored
+        self.wm.config_storage = storage
+        self.wm.config_storage = 'wifi-secure.json'
+        self.assertIs(self.wm.config_storage, storage)
+
+    def test_benchmark(self) -> None:
+        """Test the benchmark of all backends with a few networks"""
+        results = benchmark_config_storage.run(sizes=[1, 10])
+
+        self.assertEqual(len(results), 3 * 2 * 3)
+        for result in results:
+            self.assertGreater(result['time'], 0)
+            self.assertGreater(result['peak'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
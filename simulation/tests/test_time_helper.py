@@ -24,10 +24,10 @@ class TestTimeHelper(unittest.TestCase):
     def tearDown(self) -> None:
         pass
 
-    @unittest.skip("Not yet implemented")
     def test_sync_time(self) -> None:
         """Test sync_time"""
-        pass
+        result = self.th.sync_time()
+        self.assertTrue(result)
 
     def test_timezone(self) -> None:
         """Test getting current timezone"""
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""Unittest of Micropython time"""
+
+import unittest
+
+# custom imports
+import utime
+
+
+class TestUtime(unittest.TestCase):
+    def setUp(self) -> None:
+        pass
+
+    def tearDown(self) -> None:
+        pass
+
+    def test_ticks_ms(self) -> None:
+        """Test getting an increasing millisecond counter"""
+        start = utime.ticks_ms()
+        utime.sleep_ms(20)
+        end = utime.ticks_ms()
+
+        self.assertIsInstance(start, int)
+        self.assertGreaterEqual(utime.ticks_diff(end, start), 20)
+
+    def test_ticks_add(self) -> None:
+        """Test offsetting a ticks value"""
+        self.assertEqual(utime.ticks_add(1000, 250), 1250)
+        self.assertEqual(utime.ticks_add(1000, -250), 750)
+
+    def test_ticks_diff(self) -> None:
+        """Test signed difference of ticks values"""
+        self.assertEqual(utime.ticks_diff(1250, 1000), 250)
+        self.assertEqual(utime.ticks_diff(1000, 1250), -250)
+
+    def test_standard_functions(self) -> None:
+        """Test standard time functions are available"""
+        self.assertIsInstance(utime.time(), float)
+        self.assertEqual(len(utime.localtime()), 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
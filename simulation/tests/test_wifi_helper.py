@@ -4,12 +4,14 @@
 """Unittest of WiFi Helper"""
 
 from nose2.tools import params
+import json
 from typing import List, Union
 import unittest
 from unittest.mock import patch
 
 # custom imports
 from machine import machine
+import utime as time
 from wifi_helper import network
 from wifi_helper import WifiHelper
 
@@ -26,7 +28,7 @@ class TestWifiHelper(unittest.TestCase):
 
     def tearDown(self) -> None:
         self.wh.station.active(False)
-        self.wh.station.connected = False
+        self.wh.station.disconnect()
 
     def test__init(self) -> None:
         """Test initial values if WifiHelper"""
@@ -50,7 +52,7 @@ class TestWifiHelper(unittest.TestCase):
         connected to a network
         """
         # mock SOFT_RESET
-        with patch('machine.machine.reset_cause') as mock_reset_cause:
+        with patch.object(machine, 'reset_cause') as mock_reset_cause:
             mock_reset_cause.return_value = machine.SOFT_RESET
             # mock already connected
             with patch('wifi_helper.network.Station.isconnected',
@@ -77,7 +79,7 @@ class TestWifiHelper(unittest.TestCase):
         :type       ratio:    int
         """
         # mock unknown reset cause
-        with patch('machine.machine.reset_cause') as mock_reset_cause:
+        with patch.object(machine, 'reset_cause') as mock_reset_cause:
             mock_reset_cause.return_value = machine.UNKNOWN_RESET
             # mock not yet connected and change to success on second call
             # mock unconnected status for n calls
@@ -90,11 +92,12 @@ class TestWifiHelper(unittest.TestCase):
 
                 with patch.object(station, 'disconnect') as mock_disconnect:
                     result = WifiHelper._do_connect(station=station,
-                                                    ssid='qwertz',
+                                                    ssid='TP-LINK_FBFC3C',
                                                     password=1234,
                                                     timeout=timeout)
 
-                    mock_disconnect.assert_called_once()
+                    # station has been idle, no need to disconnect
+                    mock_disconnect.assert_not_called()
                     self.assertEqual(result, True)
 
     @params(
@@ -115,7 +118,7 @@ class TestWifiHelper(unittest.TestCase):
         :type       timeout:  int
         """
         # mock unknown reset cause
-        with patch('machine.machine.reset_cause') as mock_reset_cause:
+        with patch.object(machine, 'reset_cause') as mock_reset_cause:
             mock_reset_cause.return_value = machine.UNKNOWN_RESET
             # mock unconnected status for n+1 calls
             side_effect = [False] * (timeout * 10 + 1)
@@ -126,13 +129,154 @@ class TestWifiHelper(unittest.TestCase):
 
                 with patch.object(station, 'disconnect') as mock_disconnect:
                     result = WifiHelper._do_connect(station=station,
-                                                    ssid='qwertz',
+                                                    ssid='TP-LINK_FBFC3C',
                                                     password=1234,
                                                     timeout=timeout)
 
                     mock_disconnect.assert_called_once()
                     self.assertEqual(result, False)
 
+    @params(
+        (network.STAT_WRONG_PASSWORD),
+        (network.STAT_NO_AP_FOUND),
+        (network.STAT_CONNECT_FAIL)
+    )
+    def test__do_connect_failure(self, status: int) -> None:
+        """
+        Test _do_connect aborting as soon as the station reports a failure
+
+        :param      status:  The station status
+        :type       status:  int
+        """
+        timeout = 10
+
+        with patch.object(machine, 'reset_cause') as mock_reset_cause:
+            mock_reset_cause.return_value = machine.UNKNOWN_RESET
+            with patch('wifi_helper.network.Station.isconnected',
+                       return_value=False) as mock_isconnected:
+                station = network.WLAN(network.STA_IF)
+                station.connected = False
+
+                with patch('wifi_helper.network.Station.status',
+                           side_effect=[network.STAT_IDLE,
+                                        network.STAT_CONNECTING,
+                                        status]):
+                    with patch.object(station,
+                                      'disconnect') as mock_disconnect:
+                        start = time.ticks_ms()
+                        result = WifiHelper._do_connect(station=station,
+                                                        ssid='qwertz',
+                                                        password=1234,
+                                                        timeout=timeout)
+                        duration = time.ticks_diff(time.ticks_ms(), start)
+
+                        # failure status is kept for the caller
+                        mock_disconnect.assert_not_called()
+
+        self.assertEqual(result, False)
+        self.assertEqual(mock_isconnected.call_count, 2)
+        self.assertLess(duration, timeout * 1000 / 10)
+
+        timeline = WifiHelper.timelines[-1]
+        self.assertEqual(timeline['ssid'], 'qwertz')
+        self.assertEqual([phase[0] for phase in timeline['phases']],
+                         ['connect', 'failed'])
+        self.assertFalse(timeline['result'])
+        self.assertEqual(timeline['status'], status)
+
+    @params(
+        ('qwertz', 'asdf', network.STAT_NO_AP_FOUND),
+        ('TP-LINK_FBFC3C', 'wrong', network.STAT_WRONG_PASSWORD)
+    )
+    def test__do_connect_simulated_failure(self,
+                                           ssid: str,
+                                           password: str,
+                                           status: int) -> None:
+        """
+        Test _do_connect aborting on a failure of the simulated station
+
+        :param      ssid:      The SSID of the network
+        :type       ssid:      str
+        :param      password:  The password of the network
+        :type       password:  str
+        :param      status:    The expected station status
+        :type       status:    int
+        """
+        timeout = 10
+
+        with patch.object(machine, 'reset_cause') as mock_reset_cause:
+            mock_reset_cause.return_value = machine.UNKNOWN_RESET
+            with patch.object(network.Station, 'wrong_password', 'wrong'):
+                station = network.WLAN(network.STA_IF)
+                start = time.ticks_ms()
+                result = WifiHelper._do_connect(station=station,
+                                                ssid=ssid,
+                                                password=password,
+                                                timeout=timeout)
+                duration = time.ticks_diff(time.ticks_ms(), start)
+
+        self.assertEqual(result, False)
+        self.assertFalse(station.isconnected())
+        self.assertEqual(station.status(), status)
+        self.assertLess(duration, timeout * 1000 / 10)
+
+        timeline = WifiHelper.timelines[-1]
+        self.assertEqual([phase[0] for phase in timeline['phases']],
+                         ['connect', 'failed'])
+        self.assertEqual(timeline['status'], status)
+
+    def test__do_connect_busy(self) -> None:
+        """Test _do_connect stopping a previous attempt before connecting"""
+        with patch.object(machine, 'reset_cause') as mock_reset_cause:
+            mock_reset_cause.return_value = machine.UNKNOWN_RESET
+            station = network.WLAN(network.STA_IF)
+
+            with patch('wifi_helper.network.Station.status',
+                       return_value=network.STAT_CONNECTING):
+                with patch.object(station, 'disconnect') as mock_disconnect:
+                    result = WifiHelper._do_connect(station=station,
+                                                    ssid='TP-LINK_FBFC3C',
+                                                    password=1234,
+                                                    timeout=1)
+
+                    mock_disconnect.assert_called_once()
+
+        self.assertEqual(result, True)
+
+        timeline = WifiHelper.timelines[-1]
+        self.assertEqual([phase[0] for phase in timeline['phases']],
+                         ['disconnect', 'connect', 'got_ip'])
+        # sleep of 250 ms after stopping the previous attempt
+        self.assertGreaterEqual(timeline['phases'][0][1], 250)
+        self.assertTrue(timeline['result'])
+
+    def test__new_timeline(self) -> None:
+        """Test keeping only the latest connection timelines"""
+        for idx in range(WifiHelper._timelines_max + 2):
+            timeline = WifiHelper._new_timeline(ssid='Net {}'.format(idx))
+            WifiHelper._mark(timeline, 'connect')
+            WifiHelper._mark(None, 'ignored')
+
+        self.assertEqual(len(WifiHelper.timelines), WifiHelper._timelines_max)
+        self.assertEqual(WifiHelper.timelines[0]['ssid'], 'Net 2')
+        self.assertIs(WifiHelper.timelines[-1], timeline)
+        self.assertEqual(len(timeline['phases']), 1)
+        self.assertEqual(timeline['phases'][0][0], 'connect')
+        self.assertIsInstance(timeline['phases'][0][1], int)
+
+    def test__get_interface(self) -> None:
+        """Test the interfaces are created once and then reused"""
+        station = WifiHelper._get_interface(network.STA_IF)
+        accesspoint = WifiHelper._get_interface(network.AP_IF)
+
+        self.assertIsInstance(station, network.WLAN)
+        self.assertIsInstance(accesspoint, network.WLAN)
+        self.assertIsNot(station, accesspoint)
+        self.assertIs(WifiHelper._get_interface(network.STA_IF), station)
+        self.assertIs(WifiHelper._get_interface(network.AP_IF), accesspoint)
+        self.assertIs(self.wh.station, station)
+        self.assertIs(WifiHelper().station, station)
+
     @params(
         # single network, 10 sec timeout, no reconnection
         ('qwertz', 'asdf', 10, False),
@@ -158,12 +302,60 @@ class TestWifiHelper(unittest.TestCase):
                         mock_disconnect.assert_called_once()
                 else:
                     # only if no reconnection is required, function will return
-                    result = WifiHelper.connect(ssid=ssid,
-                                                password=password,
-                                                timeout=timeout,
-                                                reconnect=reconnect)
+                    with patch.object(WifiHelper,
+                                      'schedule_time_sync') as mock_sync:
+                        result = WifiHelper.connect(ssid=ssid,
+                                                    password=password,
+                                                    timeout=timeout,
+                                                    reconnect=reconnect)
+                        # time is synced in the background
+                        mock_sync.assert_called_once()
                 self.assertEqual(result, True)
 
+    def test_schedule_time_sync(self) -> None:
+        """Test starting a single background time sync"""
+        WifiHelper.time_synced.clear()
+
+        with patch('_thread.start_new_thread') as mock_thread:
+            self.assertTrue(WifiHelper.schedule_time_sync())
+            mock_thread.assert_called_once_with(WifiHelper._time_sync_worker,
+                                                ())
+
+            # sync is still ongoing
+            self.assertFalse(WifiHelper.schedule_time_sync())
+            mock_thread.assert_called_once()
+
+            WifiHelper._time_sync_lock.release()
+            WifiHelper.time_synced.set(1234)
+
+            # time has already been synced
+            self.assertFalse(WifiHelper.schedule_time_sync())
+            mock_thread.assert_called_once()
+
+        self.assertFalse(WifiHelper._time_sync_lock.locked())
+        WifiHelper.time_synced.clear()
+
+    def test__time_sync_worker(self) -> None:
+        """Test retrying the time sync with exponential backoff"""
+        WifiHelper.time_synced.clear()
+        WifiHelper._time_sync_lock.acquire()
+        timeline = WifiHelper._new_timeline(ssid='qwertz')
+        WifiHelper._time_sync_timeline = timeline
+
+        with patch('time_helper.TimeHelper.sync_time',
+                   side_effect=[False, OSError('timeout'), False, None]):
+            with patch('utime.sleep_ms') as mock_sleep:
+                with patch.object(WifiHelper, '_time_sync_backoff_max', 3000):
+                    WifiHelper._time_sync_worker()
+
+        delays = [c.args[0] for c in mock_sleep.call_args_list]
+        self.assertEqual(delays, [1000, 2000, 3000])
+        self.assertTrue(WifiHelper.time_synced.is_set())
+        self.assertIsNotNone(WifiHelper.time_synced.value())
+        self.assertFalse(WifiHelper._time_sync_lock.locked())
+        self.assertEqual(timeline['phases'][0][0], 'time_sync')
+        WifiHelper.time_synced.clear()
+
     def test_isconnected(self) -> None:
         is_connected = self.wh.isconnected
         self.assertFalse(is_connected)
@@ -274,10 +466,126 @@ class TestWifiHelper(unittest.TestCase):
                 scan_info = self.wh.scan_info.copy()
                 scan_info.append('quality')
                 self.assertEqual(list(net._fields), scan_info)
+                self.assertIsInstance(net, WifiHelper.ScanRecord)
 
-    @unittest.skip("Not yet implemented")
-    def test_get_wifi_networks_sorted(self) -> None:
-        pass
+    def test_networks_cached(self) -> None:
+        """Test creating the network records once per scan"""
+        scan_result = [
+            ('Net A', 'aaaaaaaaaaaa', 1, -70, 3, False),
+            ('Net B', 'bbbbbbbbbbbb', 11, -50, 0, False),
+        ]
+
+        with patch('wifi_helper.network.Station.scan',
+                   return_value=scan_result):
+            self.wh.scan_networks()
+            result = self.wh.networks
+
+            self.assertEqual(result, [
+                ('Net B', 'bbbbbbbbbbbb', 11, -50, 'open', False, 100),
+                ('Net A', 'aaaaaaaaaaaa', 1, -70, 'WPA2-PSK', False, 60),
+            ])
+            self.assertEqual(result[0].quality, 100)
+            self.assertIs(type(result[0]), type(result[1]))
+            self.assertIs(self.wh.networks, result)
+
+            # checking for an empty scan result does not create the records
+            self.wh.scan_networks()
+            self.wh.get_wifi_networks_sorted(scan_if_empty=True)
+            self.assertIsNone(self.wh._network_records)
+            self.assertIsNot(self.wh.networks, result)
+            self.assertEqual(self.wh.networks, result)
+
+    @params(
+        # strongest signal first, equal signals by SSID
+        ('RSSI', False, [
+            ('Net B', 'bbbbbbbbbbbb', -50),
+            ('Net A', 'aaaaaaaaaaa1', -60),
+            ('Net C', 'cccccccccccc', -60),
+            ('Net A', 'aaaaaaaaaaa2', -70),
+            ('', 'dddddddddddd', -80),
+            ('', 'eeeeeeeeeeee', -85),
+        ]),
+        ('quality', False, [
+            ('Net B', 'bbbbbbbbbbbb', -50),
+            ('Net A', 'aaaaaaaaaaa1', -60),
+            ('Net C', 'cccccccccccc', -60),
+            ('Net A', 'aaaaaaaaaaa2', -70),
+            ('', 'dddddddddddd', -80),
+            ('', 'eeeeeeeeeeee', -85),
+        ]),
+        ('ssid', False, [
+            ('', 'dddddddddddd', -80),
+            ('', 'eeeeeeeeeeee', -85),
+            ('Net A', 'aaaaaaaaaaa1', -60),
+            ('Net A', 'aaaaaaaaaaa2', -70),
+            ('Net B', 'bbbbbbbbbbbb', -50),
+            ('Net C', 'cccccccccccc', -60),
+        ]),
+        # unsupported sort keys fall back to RSSI
+        ('unknown', True, [
+            ('Net B', 'bbbbbbbbbbbb', -50),
+            ('Net A', 'aaaaaaaaaaa1', -60),
+            ('Net C', 'cccccccccccc', -60),
+            ('', 'dddddddddddd', -80),
+            ('', 'eeeeeeeeeeee', -85),
+        ]),
+        ('ssid', True, [
+            ('', 'dddddddddddd', -80),
+            ('', 'eeeeeeeeeeee', -85),
+            ('Net A', 'aaaaaaaaaaa1', -60),
+            ('Net B', 'bbbbbbbbbbbb', -50),
+            ('Net C', 'cccccccccccc', -60),
+        ]),
+    )
+    def test_get_wifi_networks_sorted(self,
+                                      sort_key: str,
+                                      unique: bool,
+                                      expectation: List[tuple]) -> None:
+        """
+        Test sorting and collapsing the networks of a scan
+
+        :param      sort_key:     The sort key
+        :type       sort_key:     str
+        :param      unique:       Flag to collapse networks by SSID
+        :type       unique:       bool
+        :param      expectation:  Expected SSID, BSSID and RSSI of the result
+        :type       expectation:  List[tuple]
+        """
+        scan_result = [
+            ('Net A', 'aaaaaaaaaaa2', 1, -70, 3, False),
+            ('Net C', 'cccccccccccc', 6, -60, 3, False),
+            ('', 'eeeeeeeeeeee', 1, -85, 3, True),
+            ('Net B', 'bbbbbbbbbbbb', 11, -50, 3, False),
+            ('Net A', 'aaaaaaaaaaa1', 6, -60, 3, False),
+            ('', 'dddddddddddd', 1, -80, 3, True),
+        ]
+
+        with patch('wifi_helper.network.Station.scan',
+                   return_value=scan_result) as mock_scan:
+            result = self.wh.get_wifi_networks_sorted(rescan=True,
+                                                      sort_key=sort_key,
+                                                      unique=unique)
+
+            self.assertEqual([(net['ssid'], net['bssid'], net['RSSI'])
+                              for net in result], expectation)
+            if unique:
+                self.assertEqual(
+                    [net['bssid_count'] for net in result
+                     if net['ssid'] == 'Net A'], [2])
+                self.assertTrue(all('bssid_count' not in net
+                                    for net in self.wh._network_list))
+
+            # sorted once per scan
+            self.assertIs(self.wh.get_wifi_networks_sorted(
+                sort_key=sort_key, unique=unique), result)
+            self.assertEqual(self.wh.get_wifi_networks_sorted(
+                as_json=True, sort_key=sort_key, unique=unique),
+                json.dumps(result))
+            mock_scan.assert_called_once()
+
+            self.wh.scan_networks()
+            self.assertIsNot(self.wh.get_wifi_networks_sorted(
+                sort_key=sort_key, unique=unique), result)
 
     @params(
         (-96, 8),   # dBm, percentage
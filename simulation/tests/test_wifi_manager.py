@@ -3,20 +3,28 @@
 
 """Unittest of WiFi Manager"""
 
+import asyncio
+import binascii
 import logging
 from nose2.tools import params
 from pathlib import Path
 import shutil
+import struct
 import tempfile
 from typing import List, Union
 import unittest
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch, PropertyMock
 
 # custom imports
+from flask import Flask
 from generic_helper import GenericHelper
 from generic_helper import Message
-from machine import machine
+from machine import machine, RTC
+import utime as time
 from wifi_manager import WiFiManager
+from wifi_manager import EncryptedFileStorage
+from wifi_manager import MemoryStorage
+from wifi_helper import network
 from wifi_helper import WifiHelper
 
 
@@ -35,16 +43,74 @@ class TestWiFiManager(unittest.TestCase):
 
         return here
 
+    def copy_encrypted_config(self, name: str) -> str:
+        """
+        Copy an encrypted config file to the tmp directory.
+
+        Loading a config file in legacy format converts it, the test data
+        shall not be changed by this.
+
+        :param      name:  The name of the encrypted config file
+        :type       name:  str
+
+        :returns:   The path to the copy, not existing without such file
+        :rtype:     str
+        """
+        path = self.get_current_path() / 'data' / 'encrypted' / name
+        if path.exists():
+            shutil.copy(src=str(path), dst=self.tmp_dir)
+
+        return str(Path(self.tmp_dir) / name)
+
+    def read_ciphertext(self, path: str) -> bytes:
+        """
+        Read the ciphertext of an encrypted config file after its header.
+
+        :param      path:  The path to the encrypted config file
+        :type       path:  str
+
+        :returns:   The committed ciphertext
+        :rtype:     bytes
+        """
+        with open(path, 'rb') as file:
+            data = file.read()
+        header_size = struct.calcsize(WiFiManager.CONFIG_FILE_FORMAT)
+        _, _, length, _ = struct.unpack(WiFiManager.CONFIG_FILE_FORMAT,
+                                        data[:header_size])
+
+        return data[header_size:header_size + length]
+
+    def simulate_networks(self, *ssids: str) -> None:
+        """
+        Let the simulated station find the given networks until teardown.
+
+        :param      ssids:  The SSIDs of the networks in range
+        :type       ssids:  str
+        """
+        scan_result = [(ssid, b'\xaa' * 6, 1, -60, 3, False)
+                       for ssid in ssids]
+        patcher = patch('wifi_helper.network.Station.scan',
+                        return_value=scan_result)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     def setUp(self) -> None:
+        # start without a boot state, like after a power on reset
+        RTC().memory(b'')
         self.wm = WiFiManager(logger=None, quiet=False)
 
-        # create a tmp directory
-        # self.tmp_dir = tempfile.mkdtemp()
+        # create a tmp directory for the connection state file
+        self.tmp_dir = tempfile.mkdtemp()
+        self.wm._state_file = str(Path(self.tmp_dir) / 'wifi-state.json')
 
     def tearDown(self) -> None:
         self.wm.scanning = False
+        self.wm.wh.station.disconnect()
+        RTC().memory(b'')
+        # write pending changes before the tmp directory is removed
+        self.wm.flush_wifi_config()
 
-        # shutil.rmtree(self.tmp_dir)
+        shutil.rmtree(self.tmp_dir)
 
     def test__init__(self) -> None:
         self.assertIsInstance(self.wm.logger, logging.Logger)
@@ -62,6 +128,9 @@ class TestWiFiManager(unittest.TestCase):
         self.assertEqual(self.wm._selected_network_bssid, '')
         self.assertEqual(self.wm._connection_timeout, 5)
         self.assertEqual(self.wm._connection_result, self.wm.ERROR)
+        self.assertEqual(self.wm._connection_plan, list())
+        self.assertEqual(self.wm._connection_timing, dict())
+        self.assertEqual(self.wm._state, dict())
 
         self.assertEqual(self.wm._scan_interval, 5000)
         self.assertIsInstance(self.wm._scan_net_msg, Message)
@@ -116,21 +185,33 @@ class TestWiFiManager(unittest.TestCase):
         :type       expectation:    bool
         """
         # overwrite config file path with given path
-        file_path = self.get_current_path() / 'data' / 'encrypted' / path
-        self.wm._config_file = str(file_path)
+        self.wm._config_file = self.copy_encrypted_config(name=path)
+
+        # let all configured networks be found by the scan
+        if isinstance(network_definitions, str):
+            visible_nets = [network_definitions]
+        else:
+            visible_nets = network_definitions
+        scan_result = [
+            (ssid, 'a0f3c1fbfc3c', 1, -50, 'WPA2-PSK', False)
+            for ssid in visible_nets
+        ]
+        patch_scan = patch('wifi_helper.network.Station.scan',
+                           return_value=scan_result)
 
         # mock unknown reset cause
-        with patch('machine.machine.reset_cause') as mock_reset_cause:
+        with patch_scan, patch.object(machine, 'reset_cause') as mock_reset_cause:     # noqa: E501
             mock_reset_cause.return_value = machine.UNKNOWN_RESET
             # mock not yet connected and change to success on nth call
             # timeout is set to 5 sec by default, sleep time is 0.1 per call
             if do_timeout:
                 # create list of all False with n entries
                 # n = timeout(sec) * calls(sec) + calls before entering connect
+                # for the strongest accesspoint and for any accesspoint
                 if isinstance(network_definitions, str):
-                    side_effect = [False] * (int(5 * 1 / 0.1) + 1)
+                    side_effect = [False] * (int(5 * 1 / 0.1) + 2) * 2
                 elif isinstance(network_definitions, list):
-                    side_effect = [False] * (int(5 * 1 / 0.1) + 2) * len(network_definitions)     # noqa: E501
+                    side_effect = [False] * (int(5 * 1 / 0.1) + 2) * 2 * len(network_definitions)     # noqa: E501
                 else:
                     raise TypeError('Expectation can only be string or list')
             else:
@@ -153,10 +234,1395 @@ class TestWiFiManager(unittest.TestCase):
         if result:
             self.assertEqual(self.wm.configured_networks, network_definitions)
 
+    @params(
+        (
+            # not configured
+            'not-existing-file.json',
+            [],
+            False,
+            WiFiManager.CONNECTION_ISSUE_NOT_CONFIGURED
+        ),
+        (
+            # single network, association times out
+            'single-network.json',
+            [network.STAT_CONNECTING],
+            False,
+            WiFiManager.CONNECTION_ISSUE_TIMEOUT
+        ),
+        (
+            # first network rejects the password, second one connects
+            'multi-network.json',
+            [network.STAT_WRONG_PASSWORD, network.STAT_GOT_IP],
+            True,
+            WiFiManager.ERROR
+        ),
+        (
+            # no configured network found
+            'multi-network.json',
+            [network.STAT_NO_AP_FOUND, network.STAT_NO_AP_FOUND],
+            False,
+            WiFiManager.CONNECTION_ISSUE_TIMEOUT
+        ),
+    )
+    def test_load_and_connect_async(self,
+                                    path: str,
+                                    status: List[int],
+                                    expectation: bool,
+                                    connection_result: int) -> None:
+        """
+        Test connecting to the configured networks without blocking
+
+        :param      path:               Path to configuration file
+        :type       path:               str
+        :param      status:             Station status of each network
+        :type       status:             List[int]
+        :param      expectation:        Expected return value
+        :type       expectation:        bool
+        :param      connection_result:  Expected connection result
+        :type       connection_result:  int
+        """
+        self.wm._config_file = self.copy_encrypted_config(name=path)
+        self.wm.connection_timeout = 3
+
+        scan_result = [
+            ('MyNet', 'aaaaaaaaaaaa', 1, -50, 3, False),
+            ('SSID Name', 'bbbbbbbbbbbb', 1, -40, 3, False),
+            ('Other-Network@1', 'cccccccccccc', 6, -60, 3, False),
+        ]
+        # a network reaching STAT_GOT_IP gets associated after 0.5 sec
+        connected_after = 5
+        states = iter(status)
+        current = {'status': None, 'checks': 0}
+
+        def connect(*args, **kwargs) -> None:
+            current['status'] = next(states)
+            current['checks'] = 0
+
+        def isconnected() -> bool:
+            if current['status'] != network.STAT_GOT_IP:
+                return False
+            current['checks'] += 1
+            return current['checks'] > connected_after
+
+        def get_status() -> int:
+            if current['status'] == network.STAT_GOT_IP:
+                return network.STAT_CONNECTING
+            return current['status']
+
+        ticks = list()
+
+        async def ticker() -> None:
+            while True:
+                ticks.append(time.ticks_ms())
+                await asyncio.sleep(0.01)
+
+        async def run() -> bool:
+            task = asyncio.create_task(ticker())
+            result = await self.wm.load_and_connect_async()
+            task.cancel()
+            return result
+
+        with patch('wifi_helper.network.Station.scan',
+                   return_value=scan_result):
+            with patch('wifi_helper.network.Station.connect',
+                       side_effect=connect):
+                with patch('wifi_helper.network.Station.isconnected',
+                           side_effect=isconnected):
+                    with patch('wifi_helper.network.Station.status',
+                               side_effect=get_status):
+                        result = asyncio.run(run())
+
+        self.assertEqual(result, expectation)
+        self.assertEqual(self.wm.connection_result, connection_result)
+        self.assertIn('total', self.wm.connection_timing)
+
+        if len(status):
+            self.assertIn('connect', self.wm.connection_timing)
+
+            if network.STAT_NO_AP_FOUND not in status:
+                # other tasks kept running while waiting for the association
+                self.assertGreater(len(ticks), connected_after)
+
+    @params(
+        (
+            # all networks visible, sorted by RSSI
+            [
+                {'ssid': 'Net A', 'password': 'a'},
+                {'ssid': 'Net B', 'password': 'b'},
+                {'ssid': 'Net C', 'password': 'c'},
+            ],
+            [
+                ('Net A', 'aaaaaaaaaaaa', 1, -80, 3, False),
+                ('Net B', 'bbbbbbbbbbbb', 6, -40, 3, False),
+                ('Net C', 'cccccccccccc', 11, -60, 3, False),
+            ],
+            ['Net B', 'Net C', 'Net A']
+        ),
+        (
+            # invisible networks are dropped
+            [
+                {'ssid': 'Net A', 'password': 'a'},
+                {'ssid': 'Gone', 'password': 'x'},
+                {'ssid': 'Net B', 'password': 'b'},
+            ],
+            [
+                ('Net A', 'aaaaaaaaaaaa', 1, -80, 3, False),
+                ('Net B', 'bbbbbbbbbbbb', 6, -40, 3, False),
+            ],
+            ['Net B', 'Net A']
+        ),
+        (
+            # priority wins over RSSI
+            [
+                {'ssid': 'Net A', 'password': 'a', 'priority': 10},
+                {'ssid': 'Net B', 'password': 'b'},
+            ],
+            [
+                ('Net A', 'aaaaaaaaaaaa', 1, -80, 3, False),
+                ('Net B', 'bbbbbbbbbbbb', 6, -40, 3, False),
+            ],
+            ['Net A', 'Net B']
+        ),
+        (
+            # strongest BSSID of the same SSID is used for ranking
+            [
+                {'ssid': 'Net A', 'password': 'a'},
+                {'ssid': 'Net B', 'password': 'b'},
+            ],
+            [
+                ('Net A', 'aaaaaaaaaaaa', 1, -80, 3, False),
+                ('Net B', 'bbbbbbbbbbbb', 6, -70, 3, False),
+                ('Net A', 'aaaaaaaaaaa2', 6, -30, 3, False),
+            ],
+            ['Net A', 'Net B']
+        ),
+        (
+            # hidden networks found, unseen networks are tried last
+            [
+                {'ssid': 'Hidden', 'password': 'h'},
+                {'ssid': 'Net A', 'password': 'a'},
+            ],
+            [
+                ('Net A', 'aaaaaaaaaaaa', 1, -80, 3, False),
+                ('', 'dddddddddddd', 6, -30, 3, True),
+            ],
+            ['Net A', 'Hidden']
+        ),
+        (
+            # nothing found at all, keep configured order
+            [
+                {'ssid': 'Net A', 'password': 'a'},
+                {'ssid': 'Net B', 'password': 'b'},
+            ],
+            [],
+            ['Net A', 'Net B']
+        ),
+        (
+            # nothing found, rank by priority and last successful connection
+            [
+                {'ssid': 'Net A', 'password': 'a', 'sequence': 1},
+                {'ssid': 'Net B', 'password': 'b', 'sequence': 2},
+                {'ssid': 'Net C', 'password': 'c', 'priority': 1},
+                {'ssid': 'Net D', 'password': 'd'},
+            ],
+            [],
+            ['Net C', 'Net B', 'Net A', 'Net D']
+        ),
+    )
+    def test__plan_connection(self,
+                              networks: List[dict],
+                              scan_result: List[tuple],
+                              expectation: List[str]) -> None:
+        """
+        Test planning the connection order based on a single scan
+
+        :param      networks:     The configured networks
+        :type       networks:     List[dict]
+        :param      scan_result:  The raw scan result
+        :type       scan_result:  List[tuple]
+        :param      expectation:  Expected SSIDs in planned order
+        :type       expectation:  List[str]
+        """
+        with patch('wifi_helper.network.Station.scan',
+                   return_value=scan_result) as mock_scan:
+            plan = self.wm._plan_connection(networks=networks)
+            mock_scan.assert_called_once()
+
+        self.assertEqual([net['ssid'] for net in plan], expectation)
+        for net in plan:
+            self.assertIn('password', net)
+
+        if len(scan_result) and expectation[0] == 'Net A':
+            self.assertEqual(plan[0]['bssid'], max(
+                [ele for ele in scan_result if ele[0] == 'Net A'],
+                key=lambda ele: ele[3])[1])
+
+    def test_connection_plan(self) -> None:
+        """Test plan and timing of the latest connection attempt"""
+        self.wm._config_file = self.copy_encrypted_config(
+            name='multi-network.json')
+
+        scan_result = [
+            ('SSID Name', 'aaaaaaaaaaaa', 1, -80, 3, False),
+            ('Other-Network@1', 'bbbbbbbbbbbb', 6, -40, 3, False),
+        ]
+        with patch('wifi_helper.network.Station.scan',
+                   return_value=scan_result):
+            with patch('wifi_helper.network.Station.connect',
+                       wraps=self.wm.wh.station.connect) as mock_connect:
+                with patch('wifi_helper.WifiHelper.connect') as mock_helper:
+                    result = self.wm.load_and_connect()
+
+        self.assertTrue(result)
+        # strongest network connected at first attempt
+        mock_connect.assert_called_once_with('Other-Network@1',
+                                             'password',
+                                             bssid=b'\xbb' * 6)
+        mock_helper.assert_not_called()
+
+        plan = self.wm.connection_plan
+        self.assertEqual([net['ssid'] for net in plan],
+                         ['Other-Network@1', 'SSID Name'])
+        for net in plan:
+            self.assertNotIn('password', net)
+            self.assertIn('RSSI', net)
+            self.assertEqual(net['timeout'], 5000)
+
+        timing = self.wm.connection_timing
+        for key in ['scan', 'connect', 'total']:
+            self.assertIn(key, timing)
+            self.assertGreaterEqual(timing[key], 0)
+
+    def test_load_and_connect_fast_reconnect(self) -> None:
+        """Test connecting to the last known BSSID without any scan"""
+        self.wm._config_file = self.copy_encrypted_config(
+            name='multi-network.json')
+        self.wm._state = {
+            'last': {
+                'ssid': 'SSID Name',
+                'bssid': 'a0f3c1fbfc3c',
+                'channel': 6
+            }
+        }
+        self.wm._save_state()
+
+        with patch('wifi_helper.network.Station.scan') as mock_scan:
+            with patch('wifi_helper.network.Station.connect') as mock_connect:
+                with patch('wifi_helper.network.Station.isconnected',
+                           side_effect=[False, True, True, True]):
+                    result = self.wm.load_and_connect()
+
+        self.assertTrue(result)
+        mock_scan.assert_not_called()
+        mock_connect.assert_called_once_with('SSID Name',
+                                             '1234qwertz@',
+                                             bssid=b'\xa0\xf3\xc1\xfb\xfc<')
+        self.assertEqual(self.wm.connection_plan, [
+            {'ssid': 'SSID Name', 'bssid': 'a0f3c1fbfc3c', 'channel': 6,
+             'timeout': 5000}
+        ])
+        self.assertIn('fast', self.wm.connection_timing)
+        self.assertNotIn('scan', self.wm.connection_timing)
+
+    @params(
+        (
+            # no last connection known
+            {},
+            [],
+            False
+        ),
+        (
+            # last connected network is no longer configured
+            {'ssid': 'Removed', 'bssid': 'a0f3c1fbfc3c', 'channel': 1},
+            [],
+            False
+        ),
+        (
+            # connection established
+            {'ssid': 'MyNet', 'bssid': 'a0f3c1fbfc3c', 'channel': 1},
+            [False, True],
+            True
+        ),
+        (
+            # connection timed out
+            {'ssid': 'MyNet', 'bssid': 'a0f3c1fbfc3c', 'channel': 1},
+            [False] * 20,
+            False
+        ),
+    )
+    def test__fast_reconnect(self,
+                             last: dict,
+                             is_connected: List[bool],
+                             expectation: bool) -> None:
+        """
+        Test connecting directly to the BSSID of the last connection
+
+        :param      last:          The last connection
+        :type       last:          dict
+        :param      is_connected:  Results of the isconnected calls
+        :type       is_connected:  List[bool]
+        :param      expectation:   Expected connection result
+        :type       expectation:   bool
+        """
+        networks = [{'ssid': 'MyNet', 'password': 'qwertz'}]
+        self.wm._state = {'last': last}
+        self.wm._connection_timeout = 1
+
+        with patch('wifi_helper.network.Station.connect') as mock_connect:
+            with patch('wifi_helper.network.Station.isconnected',
+                       side_effect=is_connected):
+                result = self.wm._fast_reconnect(networks=networks)
+
+        if expectation:
+            self.assertEqual(result, {'ssid': 'MyNet',
+                                      'password': 'qwertz',
+                                      'bssid': last['bssid'],
+                                      'channel': last['channel']})
+        else:
+            self.assertIsNone(result)
+
+        if len(is_connected):
+            mock_connect.assert_called_once()
+        else:
+            mock_connect.assert_not_called()
+
+    def test__fast_reconnect_failure(self) -> None:
+        """Test fast reconnect aborting on a wrong password"""
+        networks = [{'ssid': 'MyNet', 'password': 'qwertz'}]
+        self.wm._state = {
+            'last': {'ssid': 'MyNet', 'bssid': 'a0f3c1fbfc3c', 'channel': 1}
+        }
+        self.wm._connection_timeout = 10
+
+        with patch('wifi_helper.network.Station.connect'):
+            with patch('wifi_helper.network.Station.isconnected',
+                       return_value=False) as mock_isconnected:
+                with patch('wifi_helper.network.Station.status',
+                           return_value=network.STAT_WRONG_PASSWORD):
+                    result = self.wm._fast_reconnect(networks=networks)
+
+        self.assertIsNone(result)
+        mock_isconnected.assert_called_once()
+
+    @params(
+        # not enough recorded durations
+        ([], 5000),
+        ([800, 900], 5000),
+        # fast network
+        ([100, 100, 100], 1150),
+        ([800] * 10, 2200),
+        # 90th percentile of 10 durations is the 9th lowest one
+        ([1000, 100, 200, 300, 400, 500, 600, 700, 800, 900], 2350),
+        # slow network
+        ([6000] * 5, 10000),
+        # limited to three times the connection timeout
+        ([20000] * 3, 15000),
+    )
+    def test__network_timeout(self,
+                              durations: List[int],
+                              expectation: int) -> None:
+        """
+        Test learning the connection timeout from the recorded durations
+
+        :param      durations:    The recorded durations
+        :type       durations:    List[int]
+        :param      expectation:  The expected timeout in milliseconds
+        :type       expectation:  int
+        """
+        self.wm._state = {'durations': {'MyNet': durations}}
+
+        self.assertEqual(self.wm._network_timeout(ssid='MyNet'), expectation)
+        self.assertEqual(self.wm._network_timeout(ssid='Other'), 5000)
+
+    def test__network_timeout_stored(self) -> None:
+        """Test using the learned timeout of the config without durations"""
+        self.wm._config_file = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        self.wm.config_flush_delay = 0
+        self.wm.extend_wifi_config_data(
+            data={"ssid": "MyNet", "password": "password", "timeout": 1500},
+            path=self.wm._config_file,
+            encrypted=True)
+        self.wm.extend_wifi_config_data(
+            data={"ssid": "Slow", "password": "password", "timeout": 60000},
+            path=self.wm._config_file,
+            encrypted=True)
+
+        self.assertEqual(self.wm._network_timeout(ssid='MyNet'), 1500)
+        self.assertEqual(self.wm._network_timeout(ssid='Slow'), 15000)
+        self.assertEqual(self.wm._network_timeout(ssid='Other'), 5000)
+
+        # recorded durations take precedence
+        self.wm._state = {'durations': {'MyNet': [800, 900]}}
+        self.assertEqual(self.wm._network_timeout(ssid='MyNet'), 5000)
+
+    def test__record_attempt(self) -> None:
+        """Test recording durations of connection attempts"""
+        # failed due to wrong password or missing network, not recorded
+        self.wm._record_attempt(ssid='MyNet',
+                                result=False,
+                                duration=100,
+                                timeout=5000)
+        self.assertEqual(self.wm._state, {})
+        self.assertFalse(self.wm._state_changed)
+
+        self.wm._record_attempt(ssid='MyNet',
+                                result=True,
+                                duration=800,
+                                timeout=5000)
+        self.wm._record_attempt(ssid='MyNet',
+                                result=False,
+                                duration=5010,
+                                timeout=5000)
+        self.assertEqual(self.wm._state['durations'], {'MyNet': [800, 5010]})
+        self.assertTrue(self.wm._state_changed)
+
+        # only the latest durations are kept
+        for duration in range(20):
+            self.wm._record_attempt(ssid='MyNet',
+                                    result=True,
+                                    duration=duration,
+                                    timeout=5000)
+        self.assertEqual(self.wm._state['durations']['MyNet'],
+                         list(range(10, 20)))
+
+    def test__wait_for_connection_learned_timeout(self) -> None:
+        """Test failing fast on a network which usually connects fast"""
+        self.wm._state = {'durations': {'MyNet': [100, 100, 100]}}
+
+        with patch('wifi_helper.network.Station.isconnected',
+                   return_value=False):
+            with patch('wifi_helper.network.Station.status',
+                       return_value=network.STAT_CONNECTING):
+                start = time.ticks_ms()
+                result = self.wm._wait_for_connection(ssid='MyNet')
+                duration = time.ticks_diff(time.ticks_ms(), start)
+
+        self.assertFalse(result)
+        self.assertGreaterEqual(duration, 1150)
+        self.assertLess(duration, 2000)
+
+        # timed out attempt increases the learned timeout
+        durations = self.wm._state['durations']['MyNet']
+        self.assertEqual(len(durations), 4)
+        self.assertGreaterEqual(durations[-1], 1150)
+        self.assertGreater(self.wm._network_timeout(ssid='MyNet'), 1150)
+
+    def test_network_health(self) -> None:
+        """Test quarantine of networks failing due to a wrong password"""
+        self.assertEqual(self.wm.network_health, {})
+
+        def fail(status: int) -> None:
+            self.wm._record_attempt(ssid='MyNet',
+                                    result=False,
+                                    duration=100,
+                                    timeout=5000,
+                                    status=status)
+
+        # timeouts and other failures are not counted
+        fail(status=None)
+        fail(status=network.STAT_CONNECTING)
+        self.assertEqual(self.wm.network_health, {})
+
+        fail(status=network.STAT_WRONG_PASSWORD)
+        fail(status=network.STAT_NO_AP_FOUND)
+        self.assertEqual(self.wm.network_health,
+                         {'MyNet': {'failures': 2, 'skip': 0}})
+
+        # quarantine doubles with each further failure
+        expectations = [1, 2, 4, 8, 16, 32, 64, 64]
+        for idx, skip in enumerate(expectations):
+            fail(status=network.STAT_WRONG_PASSWORD)
+            self.assertEqual(self.wm.network_health,
+                             {'MyNet': {'failures': 3 + idx, 'skip': skip}})
+
+        # a successful connection resets the state
+        self.wm._state_changed = False
+        self.wm._record_attempt(ssid='MyNet',
+                                result=True,
+                                duration=100,
+                                timeout=5000)
+        self.assertEqual(self.wm.network_health, {})
+        self.assertTrue(self.wm._state_changed)
+
+    def test__skip_quarantined(self) -> None:
+        """Test skipping networks in quarantine"""
+        networks = [
+            {'ssid': 'Net A', 'password': 'a'},
+            {'ssid': 'Net B', 'password': 'b'},
+            {'ssid': 'Net C', 'password': 'c'},
+        ]
+        self.wm._state = {'health': {'Net A': [3, 2], 'Net B': [2, 0]}}
+
+        result = self.wm._skip_quarantined(networks=networks)
+        self.assertEqual(result, networks[1:])
+        self.assertEqual(self.wm._state['health']['Net A'], [3, 1])
+        self.assertTrue(self.wm._state_changed)
+
+        # further attempts of the same boot do not count down
+        self.wm._state_changed = False
+        result = self.wm._skip_quarantined(networks=networks)
+        self.assertEqual(result, networks[1:])
+        self.assertEqual(self.wm._state['health']['Net A'], [3, 1])
+        self.assertFalse(self.wm._state_changed)
+
+        # next boot
+        self.wm._quarantined = None
+        result = self.wm._skip_quarantined(networks=networks)
+        self.assertEqual(result, networks[1:])
+
+        # quarantine is over, one more chance
+        self.wm._quarantined = None
+        result = self.wm._skip_quarantined(networks=networks)
+        self.assertEqual(result, networks)
+        self.assertEqual(self.wm._state['health']['Net A'], [3, 0])
+
+    def test__reset_network_health(self) -> None:
+        """Test resetting the quarantine after new credentials are saved"""
+        self.wm._state = {'health': {'Net A': [3, 2], 'Net B': [4, 2]}}
+        self.wm._save_state()
+        self.wm._state = dict()
+
+        self.wm._reset_network_health(ssids=['Net A', 'Unknown'])
+        self.assertEqual(self.wm.network_health,
+                         {'Net B': {'failures': 4, 'skip': 2}})
+
+        self.wm._load_state()
+        self.assertEqual(self.wm.network_health,
+                         {'Net B': {'failures': 4, 'skip': 2}})
+
+        with patch.object(self.wm, '_save_state') as mock_save_state:
+            self.wm._reset_network_health(ssids=['Net A'])
+            mock_save_state.assert_not_called()
+
+    def test_load_and_connect_quarantine(self) -> None:
+        """Test skipping networks with a wrong password after 3 boots"""
+        self.wm._config_file = self.copy_encrypted_config(
+            name='multi-network.json')
+        scan_result = [
+            ('SSID Name', 'aaaaaaaaaaaa', 1, -80, 3, False),
+            ('Other-Network@1', 'bbbbbbbbbbbb', 6, -40, 3, False),
+        ]
+
+        with patch('wifi_helper.network.Station.scan',
+                   return_value=scan_result):
+            with patch('wifi_helper.network.Station.isconnected',
+                       return_value=False):
+                with patch('wifi_helper.network.Station.status',
+                           return_value=network.STAT_WRONG_PASSWORD):
+                    with patch('wifi_helper.network.Station.connect') as \
+                            mock_connect:
+                        for _ in range(3):
+                            self.wm._quarantined = None
+                            self.assertFalse(self.wm.load_and_connect())
+                        self.assertEqual(mock_connect.call_count, 6)
+
+                        # all networks are in quarantine
+                        self.wm._quarantined = None
+                        self.assertFalse(self.wm.load_and_connect())
+                        self.assertEqual(mock_connect.call_count, 6)
+                        self.assertEqual(self.wm.connection_plan, [])
+                        self.assertEqual(self.wm.connection_result,
+                                         self.wm.CONNECTION_ISSUE_TIMEOUT)
+
+                        # retry of the same boot, still in quarantine
+                        self.assertFalse(self.wm.load_and_connect())
+                        self.assertEqual(mock_connect.call_count, 6)
+
+                        self.wm._quarantined = None
+                        self.assertFalse(self.wm.load_and_connect())
+                        self.assertEqual(mock_connect.call_count, 8)
+
+        self.wm._load_state()
+        self.assertEqual(self.wm.network_health, {
+            'SSID Name': {'failures': 4, 'skip': 2},
+            'Other-Network@1': {'failures': 4, 'skip': 2},
+        })
+
+    def test_connection_timelines(self) -> None:
+        """Test recording the phases of each connection attempt"""
+        net = {'ssid': 'Net A', 'password': 'qwertz'}
+        self.simulate_networks('Net A')
+        self.wm._connection_timeout = 1
+
+        with patch('wifi_helper.network.Station.isconnected',
+                   return_value=False):
+            with patch('wifi_helper.network.Station.status',
+                       return_value=network.STAT_WRONG_PASSWORD):
+                self.assertFalse(self.wm._connect(net=net))
+        self.wm.wh.station.active(False)
+        with patch.object(WifiHelper, 'schedule_time_sync') as mock_sync:
+            self.assertTrue(self.wm._connect(net=net, bssid='aaaaaaaaaaaa'))
+            self.wm._remember_connection(plan=[net])
+        mock_sync.assert_called_once_with(
+            timeline=self.wm.connection_timelines[-1])
+
+        failed, connected = self.wm.connection_timelines
+        self.assertEqual(failed['ssid'], 'Net A')
+        self.assertEqual([phase[0] for phase in failed['phases']],
+                         ['connect', 'failed'])
+        self.assertFalse(failed['result'])
+        self.assertEqual(failed['status'], network.STAT_WRONG_PASSWORD)
+        self.assertEqual([phase[0] for phase in connected['phases']],
+                         ['active', 'connect', 'got_ip'])
+        self.assertTrue(connected['result'])
+        self.assertIsNone(connected['status'])
+
+        for _ in range(self.wm._timelines_max):
+            self.wm.wh.station.disconnect()
+            self.wm._connect(net=net)
+        self.assertEqual(len(self.wm.connection_timelines),
+                         self.wm._timelines_max)
+        self.assertNotIn(failed, self.wm.connection_timelines)
+
+    def test__schedule_time_sync_fallback(self) -> None:
+        """Test syncing the time without the WifiHelper time sync"""
+        self.wm._add_timeline(timeline={'ssid': 'Net A',
+                                        'start': time.ticks_ms(),
+                                        'phases': []})
+
+        with patch.object(WifiHelper, 'schedule_time_sync', None):
+            with patch.object(WifiHelper, 'time_synced', None):
+                with patch('_thread.start_new_thread') as mock_thread:
+                    self.wm._schedule_time_sync()
+                    mock_thread.assert_called_once_with(
+                        self.wm._time_sync_worker,
+                        (self.wm.connection_timelines[-1], ))
+
+                    # sync is still ongoing
+                    self.wm._schedule_time_sync()
+                    mock_thread.assert_called_once()
+
+                self.assertEqual(self.wm._synced_time(), 0)
+                with patch('time_helper.TimeHelper.sync_time',
+                           side_effect=[False, True]):
+                    self.wm._time_sync_worker(
+                        timeline=self.wm.connection_timelines[-1])
+                    self.assertFalse(self.wm._time_sync_lock.locked())
+                    self.assertEqual(self.wm._synced_time(), 0)
+
+                    self.assertTrue(self.wm._time_sync_lock.acquire(0))
+                    self.wm._time_sync_worker(
+                        timeline=self.wm.connection_timelines[-1])
+                    self.assertFalse(self.wm._time_sync_lock.locked())
+                self.assertGreater(self.wm._synced_time(), 0)
+
+                # time has already been synced
+                with patch('_thread.start_new_thread') as mock_thread:
+                    self.wm._schedule_time_sync()
+                    mock_thread.assert_not_called()
+
+        self.assertEqual(
+            [phase[0] for phase in self.wm.connection_timelines[-1]['phases']],
+            ['time_sync'])
+
+    def test_load_and_connect_strongest_bssid(self) -> None:
+        """Test connecting to the strongest accesspoint of a network"""
+        self.wm._config_file = self.copy_encrypted_config(
+            name='multi-network.json')
+        scan_result = [
+            ('SSID Name', 'aaaaaaaaaaaa', 1, -80, 3, False),
+            ('SSID Name', 'cccccccccccc', 11, -50, 3, False),
+            ('SSID Name', 'dddddddddddd', 6, -65, 3, False),
+        ]
+
+        with patch('wifi_helper.network.Station.scan',
+                   return_value=scan_result):
+            with patch('wifi_helper.network.Station.connect',
+                       wraps=self.wm.wh.station.connect) as mock_connect:
+                self.assertTrue(self.wm.load_and_connect())
+
+        mock_connect.assert_called_once_with('SSID Name',
+                                             '1234qwertz@',
+                                             bssid=b'\xcc' * 6)
+        self.assertEqual(self.wm.last_connection, {
+            'ssid': 'SSID Name',
+            'bssid': 'cccccccccccc',
+            'channel': 11
+        })
+
+    @params(
+        (network.STAT_CONNECT_FAIL, False, True),
+        (network.STAT_CONNECT_FAIL, True, True),
+        (network.STAT_WRONG_PASSWORD, False, False),
+        (network.STAT_WRONG_PASSWORD, True, False),
+    )
+    def test_load_and_connect_bssid_failed(self,
+                                           status: int,
+                                           use_async: bool,
+                                           expectation: bool) -> None:
+        """
+        Test connecting to any accesspoint after the strongest one failed
+
+        :param      status:       The status of the failed BSSID connection
+        :type       status:       int
+        :param      use_async:    Flag to use load_and_connect_async
+        :type       use_async:    bool
+        :param      expectation:  Expected connection result
+        :type       expectation:  bool
+        """
+        self.wm._config_file = self.copy_encrypted_config(
+            name='multi-network.json')
+        scan_result = [
+            ('SSID Name', 'aaaaaaaaaaaa', 1, -80, 3, False),
+            ('SSID Name', 'cccccccccccc', 11, -50, 3, False),
+        ]
+        station = self.wm.wh.station._type
+        station_connect = network.Station.connect
+
+        def connect(ssid: str, password: str, **kwargs) -> None:
+            if 'bssid' in kwargs:
+                # accesspoint rejects the station
+                station._connected_network = ssid
+                station.connected = False
+                station._status = status
+            else:
+                station_connect(station, ssid, password)
+
+        with patch('wifi_helper.network.Station.scan',
+                   return_value=scan_result):
+            with patch('wifi_helper.network.Station.connect',
+                       side_effect=connect) as mock_connect:
+                if use_async:
+                    result = asyncio.run(self.wm.load_and_connect_async())
+                else:
+                    result = self.wm.load_and_connect()
+
+        self.assertEqual(result, expectation)
+        calls = [call.kwargs.get('bssid') for call in
+                 mock_connect.call_args_list]
+        if expectation:
+            self.assertEqual(calls, [b'\xcc' * 6, None])
+        else:
+            self.assertEqual(calls, [b'\xcc' * 6])
+
+    @params(
+        (True, True),
+        (False, False),
+        (1, True),
+    )
+    def test_roaming(self, value: bool, expectation: bool) -> None:
+        """Test setting the roaming flag"""
+        self.wm.roaming = value
+        self.assertEqual(self.wm.roaming, expectation)
+
+    @params(
+        (-75, None, 'cccccccccccc'),            # -60 dBm is clearly better
+        (-67, None, None),                      # -60 dBm is not 8 dB better
+        (-50, None, None),                      # connected one is the best
+        (-80, 'cccccccccccc', 'bbbbbbbbbbbb'),  # just left -60 dBm one
+    )
+    def test__roam_candidate(self,
+                             rssi: int,
+                             left: Union[str, None],
+                             expectation: Union[str, None]) -> None:
+        """
+        Test finding a better accesspoint in the cached scan result
+
+        :param      rssi:         The RSSI of the current connection
+        :type       rssi:         int
+        :param      left:         The BSSID left by the latest roam
+        :type       left:         Union[str, None]
+        :param      expectation:  Expected BSSID of the candidate
+        :type       expectation:  Union[str, None]
+        """
+        self.simulate_networks('Net A')
+        self.wm.wh.station.connect('Net A', 'qwertz')
+        self.wm.wh.station._type._rssi = rssi
+        self.wm._state = {
+            'last': {'ssid': 'Net A', 'bssid': 'aaaaaaaaaaaa', 'channel': 1}
+        }
+        self.wm._connected_at = time.ticks_ms()
+        self.wm._last_scan = time.ticks_add(self.wm._connected_at, 1)
+        self.wm._roamed_from = left
+        self.wm.wh._network_list = [
+            {'ssid': 'Net A', 'bssid': 'aaaaaaaaaaaa', 'channel': 1,
+             'RSSI': -40},
+            {'ssid': 'Net A', 'bssid': 'bbbbbbbbbbbb', 'channel': 6,
+             'RSSI': -70},
+            {'ssid': 'Net A', 'bssid': 'cccccccccccc', 'channel': 11,
+             'RSSI': -60},
+            {'ssid': 'Net B', 'bssid': 'dddddddddddd', 'channel': 11,
+             'RSSI': -30},
+        ]
+
+        with patch('wifi_helper.network.Station.scan') as mock_scan:
+            candidate = self.wm._roam_candidate()
+        mock_scan.assert_not_called()
+
+        if expectation is None:
+            self.assertIsNone(candidate)
+        else:
+            self.assertEqual(candidate['ssid'], 'Net A')
+            self.assertEqual(candidate['bssid'], expectation)
+
+        # scan result is older than the current connection
+        self.wm._last_scan = time.ticks_add(self.wm._connected_at, -1)
+        self.assertIsNone(self.wm._roam_candidate())
+        self.wm._last_scan = None
+        self.assertIsNone(self.wm._roam_candidate())
+
+    def test__roam_async(self) -> None:
+        """Test roaming to a better accesspoint of the same network"""
+        self.simulate_networks('Net A')
+        self.wm.wh.station.connect('Net A', 'qwertz')
+        self.wm.wh.station._type._rssi = -80
+        self.wm._state = {
+            'last': {'ssid': 'Net A', 'bssid': 'aaaaaaaaaaaa', 'channel': 1}
+        }
+        self.wm.wh._network_list = [
+            {'ssid': 'Net A', 'bssid': 'aaaaaaaaaaaa', 'channel': 1,
+             'RSSI': -40},
+            {'ssid': 'Net A', 'bssid': 'bbbbbbbbbbbb', 'channel': 6,
+             'RSSI': -50},
+        ]
+        self.wm._config_file = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        self.wm._config_cache = [{'ssid': 'Net A', 'password': 'qwertz'}]
+        self.wm._config_index = {'Net A': 0}
+        self.wm._last_scan = time.ticks_ms()
+        time.sleep_ms(1)
+
+        with patch.object(self.wm, '_load_networks') as mock_load_networks:
+            with patch('wifi_helper.network.Station.connect',
+                       wraps=self.wm.wh.station.connect) as mock_connect:
+                self.assertTrue(asyncio.run(self.wm._roam_async()))
+                mock_connect.assert_called_once_with('Net A',
+                                                     'qwertz',
+                                                     bssid=b'\xbb' * 6)
+                self.assertEqual(self.wm.last_connection, {
+                    'ssid': 'Net A',
+                    'bssid': 'bbbbbbbbbbbb',
+                    'channel': 6
+                })
+
+                # at most one roam per interval
+                self.assertFalse(asyncio.run(self.wm._roam_async()))
+                mock_connect.assert_called_once()
+
+                # no roam back based on the scan before the roam
+                self.wm._roam_interval = 0
+                self.assertFalse(asyncio.run(self.wm._roam_async()))
+                mock_connect.assert_called_once()
+
+                # never back to the accesspoint just left
+                time.sleep_ms(1)
+                self.wm._last_scan = time.ticks_ms()
+                self.assertFalse(asyncio.run(self.wm._roam_async()))
+                mock_connect.assert_called_once()
+        mock_load_networks.assert_not_called()
+
+    def test_boot_state(self) -> None:
+        """Test keeping the boot state in RTC memory"""
+        self.assertEqual(self.wm.boot_state,
+                         {'index': None, 'failures': [], 'synced': 0})
+        self.wm._configured_networks = ['Net A', 'Net B', 'Net C']
+
+        with patch.object(WifiHelper, 'time_synced', Message()):
+            self.wm._mark_boot_attempt(ssid='Net C')
+            self.wm._mark_boot_attempt(ssid='Net C')
+            self.wm._mark_boot_attempt(ssid='Net A')
+            self.wm._mark_boot_attempt(ssid='Unknown')
+            self.wm._remember_boot(ssid='Net A')
+            self.assertEqual(self.wm.boot_state,
+                             {'index': 0, 'failures': [0, 0, 2], 'synced': 0})
+
+            # content survives a warm reboot
+            wm = WiFiManager(logger=None, quiet=True)
+            wm._load_boot_state()
+            self.assertEqual(wm.boot_state, self.wm.boot_state)
+            self.assertEqual(len(RTC().memory()), 16)
+
+            WifiHelper.time_synced.set(1234.5)
+            wm._reset_boot_state()
+            wm._load_boot_state()
+            self.assertEqual(wm.boot_state,
+                             {'index': None, 'failures': [], 'synced': 1234})
+
+    @params(
+        (b'', ),
+        (b'WM', ),
+        (b'XX\x02' + bytes(10), ),
+        (b'WM\x01' + bytes(10), ),
+        (b'WM\x02' + bytes(9) + b'\x02\x01', ),
+    )
+    def test__load_boot_state_invalid(self, data: bytes) -> None:
+        """Test ignoring an uninitialized or invalid RTC memory"""
+        RTC().memory(data)
+        self.wm._load_boot_state()
+        self.assertEqual(self.wm.boot_state,
+                         {'index': None, 'failures': [], 'synced': 0})
+
+    def test_load_and_connect_warm_reboot(self) -> None:
+        """Test skipping config and state after a warm reboot"""
+        self.wm._config_file = self.copy_encrypted_config(
+            name='multi-network.json')
+        scan_result = [
+            ('SSID Name', 'aaaaaaaaaaaa', 1, -80, 3, False),
+            ('Other-Network@1', 'bbbbbbbbbbbb', 6, -40, 3, False),
+        ]
+
+        with patch('wifi_helper.network.Station.scan',
+                   return_value=scan_result):
+            self.assertTrue(self.wm.load_and_connect())
+        self.assertEqual(self.wm.boot_state['index'], 1)
+
+        # connection remains after warm reboot
+        wm = WiFiManager(logger=None, quiet=True)
+        wm._state_file = self.wm._state_file
+        wm._config_file = self.wm._config_file
+        with patch.object(wm, '_load_networks') as mock_load_networks:
+            with patch.object(wm, '_load_state') as mock_load_state:
+                self.assertTrue(wm.load_and_connect())
+                self.assertTrue(asyncio.run(wm.load_and_connect_async()))
+        mock_load_networks.assert_not_called()
+        mock_load_state.assert_not_called()
+
+        # connected to another network after the warm reboot
+        self.simulate_networks('Neighbour')
+        self.wm.wh.station.connect('Neighbour', 'password')
+        wm._load_boot_state()
+        self.assertEqual(wm.boot_state['index'], 1)
+        self.assertTrue(wm.wh.isconnected)
+        self.assertFalse(wm._warm_reboot_connected())
+
+        # connection lost, config is loaded again
+        self.wm.wh.station.disconnect()
+        with patch('wifi_helper.network.Station.scan',
+                   return_value=scan_result):
+            with patch.object(wm, '_load_networks',
+                              wraps=wm._load_networks) as mock_load_networks:
+                self.assertTrue(wm.load_and_connect())
+        mock_load_networks.assert_called_once()
+        wm.flush_wifi_config()
+
+    def test_load_and_connect_boot_loop(self) -> None:
+        """Test deferring a network after resets during its attempts"""
+        self.wm._config_file = self.copy_encrypted_config(
+            name='multi-network.json')
+        self.wm._state = {
+            'last': {
+                'ssid': 'Other-Network@1',
+                'bssid': 'bbbbbbbbbbbb',
+                'channel': 6
+            }
+        }
+        self.wm._save_state()
+        scan_result = [
+            ('SSID Name', 'aaaaaaaaaaaa', 1, -80, 3, False),
+            ('Other-Network@1', 'bbbbbbbbbbbb', 6, -40, 3, False),
+        ]
+
+        # device resets during two attempts to the last network
+        for _ in range(2):
+            self.wm._load_boot_state()
+            self.wm._configured_networks = ['SSID Name', 'Other-Network@1']
+            self.wm._mark_boot_attempt(ssid='Other-Network@1')
+
+        wm = WiFiManager(logger=None, quiet=True)
+        wm._state_file = self.wm._state_file
+        wm._config_file = self.wm._config_file
+        with patch('wifi_helper.network.Station.scan',
+                   return_value=scan_result):
+            self.assertTrue(wm.load_and_connect())
+
+        # no fast reconnect, stronger network is tried last
+        self.assertEqual([net['ssid'] for net in wm.connection_plan],
+                         ['SSID Name', 'Other-Network@1'])
+        self.assertEqual(wm.boot_state['index'], 0)
+        self.assertEqual(wm.boot_state['failures'], [0, 2])
+        wm.flush_wifi_config()
+
+    def test__remember_connection(self) -> None:
+        """Test saving the last connection only if it changed"""
+        plan = [
+            {'ssid': 'Net A', 'password': 'a', 'bssid': 'aaaaaaaaaaaa',
+             'channel': 1, 'RSSI': -40},
+            {'ssid': 'Net B', 'password': 'b', 'bssid': 'bbbbbbbbbbbb',
+             'channel': 6, 'RSSI': -60},
+        ]
+        state_file = Path(self.wm._state_file)
+        self.assertFalse(state_file.exists())
+
+        with patch('wifi_helper.network.Station.config',
+                   return_value='Net B'):
+            self.wm._remember_connection(plan=plan)
+
+        expectation = {'ssid': 'Net B', 'bssid': 'bbbbbbbbbbbb', 'channel': 6}
+        self.assertEqual(self.wm.last_connection, expectation)
+        self.assertTrue(state_file.exists())
+
+        self.wm._load_state()
+        self.assertEqual(self.wm.last_connection, expectation)
+
+        with patch('wifi_helper.network.Station.config',
+                   return_value='Net B'):
+            with patch.object(self.wm, '_save_state') as mock_save_state:
+                self.wm._remember_connection(plan=plan)
+                mock_save_state.assert_not_called()
+
+    @params(
+        (True, True),
+        (False, False),
+        (1, False),
+        ('True', False)
+    )
+    def test_cache_ifconfig(self, value: bool, expectation: bool) -> None:
+        """Test setting the flag to cache the IP configuration"""
+        self.wm.cache_ifconfig = value
+        self.assertEqual(self.wm.cache_ifconfig, expectation)
+
+    def test__start_connection_cached_ifconfig(self) -> None:
+        """Test applying the cached IP configuration before connecting"""
+        cached = ['192.168.178.42', '255.255.255.0', '192.168.178.1',
+                  '192.168.178.1']
+        net = {'ssid': 'MyNet', 'password': 'qwertz'}
+        self.wm._state = {'ifconfig': {'MyNet': cached}}
+        station = self.wm.wh.station
+
+        # caching is disabled by default
+        with patch('wifi_helper.network.Station.connect'):
+            self.assertTrue(self.wm._start_connection(net=net))
+        self.assertIsNone(self.wm._static_ifconfig)
+        self.assertIsNone(station._static_ifconfig)
+
+        self.wm.cache_ifconfig = True
+        with patch('wifi_helper.network.Station.connect'):
+            self.assertTrue(self.wm._start_connection(net=net))
+        self.assertEqual(self.wm._static_ifconfig, 'MyNet')
+        self.assertEqual(station.ifconfig(), tuple(cached))
+
+        # DHCP is used again after a failed connection
+        self.wm._reset_connection()
+        self.assertIsNone(self.wm._static_ifconfig)
+        self.assertIsNone(station._static_ifconfig)
+
+        # DHCP is used for networks without cached IP configuration
+        with patch('wifi_helper.network.Station.connect'):
+            self.wm._start_connection(net=net)
+            self.wm._start_connection(net={'ssid': 'Other', 'password': ''})
+        self.assertIsNone(self.wm._static_ifconfig)
+        self.assertIsNone(station._static_ifconfig)
+
+    def test__remember_connection_ifconfig(self) -> None:
+        """Test caching and validating the IP configuration"""
+        current = ('192.168.178.42', '255.255.255.0', '192.168.178.1',
+                   '192.168.178.1')
+        plan = [{'ssid': 'MyNet', 'password': 'a', 'bssid': 'aaaaaaaaaaaa',
+                 'channel': 1}]
+        self.wm.cache_ifconfig = True
+
+        with patch('wifi_helper.network.Station.config',
+                   return_value='MyNet'):
+            with patch('wifi_helper.network.Station._gather_ifconfig_data',
+                       return_value=current):
+                self.wm._remember_connection(plan=plan)
+
+        self.assertEqual(self.wm._state['ifconfig'], {'MyNet': list(current)})
+        self.wm._load_state()
+        self.assertEqual(self.wm._state['ifconfig'], {'MyNet': list(current)})
+
+        # validate in the background if the cached config has been applied
+        self.wm._static_ifconfig = 'MyNet'
+        with patch('wifi_helper.network.Station.config',
+                   return_value='MyNet'):
+            with patch('_thread.start_new_thread') as mock_thread:
+                with patch.object(self.wm, '_save_state') as mock_save_state:
+                    self.wm._remember_connection(plan=plan)
+
+        mock_thread.assert_called_once_with(self.wm._validate_ifconfig,
+                                            ('MyNet', ))
+        mock_save_state.assert_not_called()
+
+    @params(
+        (True, {'MyNet': ['192.168.178.42', '255.255.255.0',
+                          '192.168.178.1', '192.168.178.1']}),
+        (False, {})
+    )
+    def test__validate_ifconfig(self,
+                                is_valid: bool,
+                                expectation: dict) -> None:
+        """
+        Test falling back to DHCP if the cached configuration is invalid
+
+        :param      is_valid:     Result of the IP configuration check
+        :type       is_valid:     bool
+        :param      expectation:  Expected cached IP configurations
+        :type       expectation:  dict
+        """
+        cached = ['192.168.178.42', '255.255.255.0', '192.168.178.1',
+                  '192.168.178.1']
+        self.wm._state = {'ifconfig': {'MyNet': cached.copy()}}
+        self.wm._static_ifconfig = 'MyNet'
+        self.wm.wh.station.ifconfig(tuple(cached))
+
+        with patch.object(WiFiManager, '_check_ifconfig',
+                          return_value=is_valid) as mock_check:
+            with patch.object(self.wm, '_save_state') as mock_save_state:
+                self.wm._validate_ifconfig(ssid='MyNet')
+
+        mock_check.assert_called_once_with(ifconfig=tuple(cached))
+        # the thread does not touch the state
+        mock_save_state.assert_not_called()
+        self.assertEqual(self.wm._state['ifconfig'], {'MyNet': cached})
+        if is_valid:
+            self.assertEqual(self.wm._static_ifconfig, 'MyNet')
+        else:
+            self.assertIsNone(self.wm._static_ifconfig)
+            self.assertIsNone(self.wm.wh.station._static_ifconfig)
+
+        # result is applied by the main context, also to a reloaded state
+        self.wm._save_state()
+        self.wm._load_state()
+        self.assertEqual(self.wm._drop_invalid_ifconfig(), not is_valid)
+        self.assertEqual(self.wm._state['ifconfig'], expectation)
+        self.assertEqual(self.wm._state_changed, not is_valid)
+        self.assertEqual(self.wm._invalid_ifconfig, [])
+
+        self.wm.wh.station.ifconfig('dhcp')
+
+    @params(
+        (
+            # valid answer of the DNS server
+            ('192.168.178.42', '255.255.255.0', '192.168.178.1', '8.8.8.8'),
+            b'\x57\x4d\x81\x80' + b'\x00' * 8,
+            ('8.8.8.8', 53),
+            True
+        ),
+        (
+            # no DNS server, query the gateway
+            ('192.168.178.42', '255.255.255.0', '192.168.178.1', '0.0.0.0'),
+            b'\x57\x4d\x81\x80' + b'\x00' * 8,
+            ('192.168.178.1', 53),
+            True
+        ),
+        (
+            # answer to another query
+            ('192.168.178.42', '255.255.255.0', '192.168.178.1', '8.8.8.8'),
+            b'\x12\x34\x81\x80' + b'\x00' * 8,
+            ('8.8.8.8', 53),
+            False
+        ),
+        (
+            # no answer
+            ('192.168.178.42', '255.255.255.0', '192.168.178.1', '8.8.8.8'),
+            OSError('timed out'),
+            ('8.8.8.8', 53),
+            False
+        ),
+    )
+    def test__check_ifconfig(self,
+                             ifconfig: tuple,
+                             answer: Union[bytes, Exception],
+                             server: tuple,
+                             expectation: bool) -> None:
+        """
+        Test checking the network answers with an IP configuration
+
+        :param      ifconfig:     The IP configuration
+        :type       ifconfig:     tuple
+        :param      answer:       The answer of the server
+        :type       answer:       Union[bytes, Exception]
+        :param      server:       The expected address of the server
+        :type       server:       tuple
+        :param      expectation:  Expected result of the check
+        :type       expectation:  bool
+        """
+        with patch('socket.socket') as mock_socket:
+            sock = mock_socket.return_value
+            sock.recv.side_effect = [answer]
+            result = WiFiManager._check_ifconfig(ifconfig=ifconfig)
+
+        self.assertEqual(result, expectation)
+        sock.settimeout.assert_called_once_with(2)
+        self.assertEqual(sock.sendto.call_args.args[1], server)
+        sock.close.assert_called_once()
+
+    @params(
+        (
+            {'ssid': 'MyNet', 'password': 'empty'},
+            [{'ssid': 'MyNet', 'password': 'empty'}]
+        ),
+        (
+            [{'ssid': 'MyNet'}, {'password': 'no ssid'}],
+            [{'ssid': 'MyNet', 'password': ''}]
+        ),
+        (
+            'unknown content',
+            []
+        ),
+    )
+    def test__get_network_list(self,
+                               data: Union[dict, List[dict]],
+                               expectation: List[dict]) -> None:
+        """Test getting list of networks from loaded config data"""
+        result = self.wm._get_network_list(data=data)
+        self.assertEqual(result, expectation)
+
     @unittest.skip("Not yet implemented to create an AccessPoint")
     def test_start_config(self) -> None:
         pass
 
+    @params(
+        (50, 100),
+        (100, 100),
+        (10000, 10000),
+        ('test', 5000),
+        (1234.5, 5000)
+    )
+    def test_supervisor_interval(self, value: int, expectation: int) -> None:
+        """Test setting the supervisor interval in milliseconds"""
+        self.wm.supervisor_interval = value
+        self.assertEqual(self.wm.supervisor_interval, expectation)
+
+    @params(
+        (-1, 0),
+        (0, 0),
+        (60, 60),
+        ('test', 300),
+        (1234.5, 300)
+    )
+    def test_outage_budget(self, value: int, expectation: int) -> None:
+        """Test setting the outage budget in seconds"""
+        self.wm.outage_budget = value
+        self.assertEqual(self.wm.outage_budget, expectation)
+
+    @params(
+        (1000),
+        (1001),
+        (60000)
+    )
+    def test__backoff_delay(self, backoff: int) -> None:
+        """Test randomized backoff delay between half and full backoff"""
+        delays = [WiFiManager._backoff_delay(backoff=backoff)
+                  for _ in range(100)]
+
+        for delay in delays:
+            self.assertIsInstance(delay, int)
+            self.assertGreaterEqual(delay, backoff // 2)
+            self.assertLessEqual(delay, backoff)
+        self.assertGreater(len(set(delays)), 1)
+
+    def run_supervisor(self, duration: float) -> None:
+        """
+        Run the connection supervisor for some time.
+
+        :param      duration:  The duration in seconds
+        :type       duration:  float
+        """
+        async def run() -> None:
+            task = asyncio.create_task(self.wm.supervise())
+            await asyncio.sleep(duration)
+            task.cancel()
+
+        asyncio.run(run())
+
+    def test_supervise_connected(self) -> None:
+        """Test supervisor checking the connection once per interval"""
+        self.wm.supervisor_interval = 100
+
+        with patch('wifi_helper.network.Station.isconnected',
+                   return_value=True) as mock_isconnected:
+            with patch.object(self.wm,
+                              'load_and_connect_async') as mock_connect:
+                self.run_supervisor(duration=0.35)
+
+        # checked at 0, 100, 200 and 300 ms
+        self.assertLessEqual(mock_isconnected.call_count, 4)
+        self.assertGreaterEqual(mock_isconnected.call_count, 3)
+        mock_connect.assert_not_called()
+
+    def test_supervise_invalid_ifconfig(self) -> None:
+        """Test supervisor saving the result of the IP config validation"""
+        self.wm.supervisor_interval = 100
+        self.wm.roaming = False
+        self.wm._state = {'ifconfig': {'MyNet': ['192.168.178.42']}}
+        self.wm._invalid_ifconfig.append('MyNet')
+
+        with patch('wifi_helper.network.Station.isconnected',
+                   return_value=True):
+            with patch.object(self.wm, '_save_state') as mock_save_state:
+                self.run_supervisor(duration=0.25)
+
+        mock_save_state.assert_called_once()
+        self.assertEqual(self.wm._state, {'ifconfig': {}})
+
+    def test_supervise_reconnect(self) -> None:
+        """Test supervisor reconnecting with exponential backoff"""
+        self.wm._backoff_initial = 10
+        self.wm._backoff_max = 20
+        connect = AsyncMock(side_effect=[False, False, False, True])
+
+        with patch('wifi_helper.network.Station.isconnected',
+                   side_effect=lambda: connect.await_count >= 4):
+            with patch.object(self.wm, 'load_and_connect_async', connect):
+                with patch.object(self.wm,
+                                  '_backoff_delay',
+                                  wraps=self.wm._backoff_delay) as mock_delay:
+                    with patch.object(self.wm,
+                                      'start_config_async') as mock_portal:
+                        self.run_supervisor(duration=0.3)
+
+        self.assertEqual(connect.await_count, 4)
+        backoffs = [c.kwargs['backoff'] for c in mock_delay.call_args_list]
+        self.assertEqual(backoffs, [10, 20, 20])
+        mock_portal.assert_not_called()
+
+    def test_supervise_portal(self) -> None:
+        """Test supervisor reconnecting while the portal is running"""
+        self.wm._backoff_initial = 10
+        self.wm._backoff_max = 10
+        self.wm.outage_budget = 0
+        connect = AsyncMock(side_effect=[False, False, True])
+
+        async def serve() -> None:
+            await asyncio.sleep(10)
+
+        with patch('wifi_helper.network.Station.isconnected',
+                   side_effect=lambda: connect.await_count >= 3):
+            with patch.object(self.wm, 'load_and_connect_async', connect):
+                with patch.object(self.wm, 'start_config_async',
+                                  side_effect=serve) as mock_portal:
+                    with patch.object(self.wm, '_stop_portal',
+                                      wraps=self.wm._stop_portal) as mock_stop:
+                        self.run_supervisor(duration=0.3)
+
+        self.assertEqual(connect.await_count, 3)
+        mock_portal.assert_called_once()
+        mock_stop.assert_called_once()
+        self.assertTrue(mock_stop.call_args.kwargs['portal'].cancelled())
+        self.assertFalse(self.wm.scanning)
+
+    def test_supervise_portal_shutdown(self) -> None:
+        """Test supervisor starting over after the portal has been shut down"""
+        self.wm._backoff_initial = 10
+        self.wm._backoff_max = 10
+        self.wm.outage_budget = 0
+        connect = AsyncMock(return_value=False)
+        portal = AsyncMock()
+
+        with patch('wifi_helper.network.Station.isconnected',
+                   return_value=False):
+            with patch.object(self.wm, 'load_and_connect_async', connect):
+                with patch.object(self.wm, 'start_config_async', portal):
+                    with patch.object(self.wm, '_stop_portal') as mock_stop:
+                        self.run_supervisor(duration=0.1)
+
+        # portal is started again after each shut down
+        self.assertGreater(portal.await_count, 1)
+        self.assertGreater(connect.await_count, portal.await_count)
+        mock_stop.assert_not_called()
+
+    def test_add_timelines_route(self) -> None:
+        """Test serving the connection timelines by another webserver"""
+        app = Flask(__name__)
+        self.wm.add_timelines_route(app=app, url='/wifi/timelines')
+        self.wm._add_timeline(timeline={'ssid': 'Net A',
+                                        'start': 1234,
+                                        'phases': [['connect', 5]]})
+
+        response = app.test_client().get('/wifi/timelines')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), self.wm.connection_timelines)
+
     def test__add_app_routes(self) -> None:
         """Test added application routes of the webserver"""
         expectation = [
@@ -166,7 +1632,9 @@ class TestWiFiManager(unittest.TestCase):
             '/configure',
             '/save_wifi_config',
             '/remove_wifi_config',
+            '/provision',
             '/scan_result',
+            '/connection_timelines',
             '/static/css/bootstrap.min.css',
             '/static/js/toast.js',
             '/static/<path:filename>',
@@ -288,7 +1756,7 @@ class TestWiFiManager(unittest.TestCase):
             'not-existing-file.json',
             {"ssid": "new_network", "password": "some_password"},
             ["new_network"],
-            {"ssid": "new_network", "password": "some_password"},
+            [{"ssid": "new_network", "password": "some_password"}],
             True
         ),
 
@@ -544,7 +2012,7 @@ class TestWiFiManager(unittest.TestCase):
         (
             'single-network.json',
             True,
-            {"ssid": "MyNet", "password": "empty"}
+            [{"ssid": "MyNet", "password": "empty"}]
         ),
         (
             'multi-network.json',
@@ -572,7 +2040,7 @@ class TestWiFiManager(unittest.TestCase):
         """
         root_path = self.get_current_path() / 'data'
         if encrypted:
-            path = str(root_path / 'encrypted' / path)
+            path = self.copy_encrypted_config(name=path)
         else:
             path = str(root_path / 'unencrypted' / path)
 
@@ -580,6 +2048,785 @@ class TestWiFiManager(unittest.TestCase):
 
         self.assertEqual(result, expectation)
 
+    @params(
+        ('single-network.json', [{"ssid": "MyNet", "password": "empty"}]),
+        (
+            'multi-network.json',
+            [
+                {"ssid": "SSID Name", "password": "1234qwertz@"},
+                {"ssid": "Other-Network@1", "password": "password"}
+            ]
+        ),
+    )
+    def test__load_wifi_config_data_legacy(self,
+                                           name: str,
+                                           expectation: List[dict]) -> None:
+        """
+        Test converting an encrypted config file in legacy format once
+
+        :param      name:           Name of the legacy config file
+        :type       name:           str
+        :param      expectation:    Expected networks
+        :type       expectation:    List[dict]
+        """
+        path = self.copy_encrypted_config(name=name)
+        with open(path, 'rb') as file:
+            legacy_data = file.read()
+
+        with self.assertRaises(ValueError):
+            list(self.wm._iter_wifi_config_records(path=path))
+
+        result = self.wm._load_wifi_config_data(path=path, encrypted=True)
+        self.assertEqual(result, expectation)
+
+        # file got converted to the binary config format
+        with open(path, 'rb') as file:
+            converted_data = file.read()
+        self.assertNotEqual(converted_data, legacy_data)
+        self.assertEqual(self.wm._replay_wifi_config(path=path), expectation)
+
+        # no further conversion on the next load
+        with patch.object(self.wm, '_load_legacy_wifi_config_data') as mock:
+            result = self.wm._load_wifi_config_data(path=path, encrypted=True)
+        mock.assert_not_called()
+        self.assertEqual(result, expectation)
+
+    @params(
+        (False, ),
+        (True, ),
+    )
+    def test__save_wifi_config_data(self, compress: bool) -> None:
+        """
+        Test saving and loading networks in the binary config format
+
+        :param      compress:  Flag to compress the config
+        :type       compress:  bool
+        """
+        networks = [
+            {"ssid": "It's \"quoted\"", "password": "pass'word"},
+            {"ssid": "Caf\u00e9 {1}", "password": "x" * 63},
+        ] + [
+            {"ssid": "net_{}".format(idx), "password": "password"}
+            for idx in range(20)
+        ]
+        path = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        plain_size = len(self.wm._encode_wifi_config(data=networks))
+
+        self.wm.compress_config = compress
+        # read in smallest chunks to cover records across chunk boundaries
+        self.wm._config_chunk_size = 16
+        self.wm._save_wifi_config_data(data=networks, path=path)
+
+        encrypted_data = self.read_ciphertext(path=path)
+        self.assertEqual(len(encrypted_data) % 16, 0)
+        self.assertNotIn(b'password', encrypted_data)
+
+        if compress:
+            self.assertLess(len(encrypted_data), plain_size)
+        else:
+            self.assertGreaterEqual(len(encrypted_data), plain_size)
+
+        result = self.wm._load_wifi_config_data(path=path, encrypted=True)
+        self.assertEqual(result, networks)
+
+    @params(
+        ([], 16),
+        ([b'a' * 16], 16),
+        ([b'abc', b'', b'd' * 40], 16),
+        ([b'abc', b'', b'd' * 40], 64),
+        ([bytes(range(256)) * 3, b'xyz'], 64),
+    )
+    def test__write_encrypted_file(self,
+                                   chunks: List[bytes],
+                                   chunk_size: int) -> None:
+        """
+        Test encrypting data chunk by chunk into a file
+
+        :param      chunks:      The data to encrypt
+        :type       chunks:      List[bytes]
+        :param      chunk_size:  The size of the encryption buffer
+        :type       chunk_size:  int
+        """
+        path = str(Path(self.tmp_dir) / 'encrypted.bin')
+        self.wm._config_chunk_size = chunk_size
+
+        result = self.wm._write_encrypted_file(chunks=iter(chunks),
+                                               path=path,
+                                               mode='wb')
+
+        with open(path, 'rb') as file:
+            data = file.read()
+        header_size = struct.calcsize(WiFiManager.CONFIG_FILE_FORMAT)
+        encrypted_data = data[header_size:]
+        # same result as encrypting all data at once with zero padding
+        self.assertEqual(encrypted_data,
+                         self.wm._encrypt_data(data=b''.join(chunks)))
+        self.assertEqual(result, len(encrypted_data))
+
+        # plain header with the length and checksum of the ciphertext
+        self.assertEqual(struct.unpack(WiFiManager.CONFIG_FILE_FORMAT,
+                                       data[:header_size]),
+                         (b'WMF', 1, len(encrypted_data),
+                          binascii.crc32(encrypted_data)))
+        self.assertFalse(Path(path + '.tmp').exists())
+
+    def test__iter_wifi_config_records_truncated(self) -> None:
+        """Test rejecting a WiFi config file not ending on an AES block"""
+        path = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        self.wm._save_wifi_config_data(
+            data=[{"ssid": "a", "password": "b" * 20}], path=path)
+        with open(path, 'rb') as file:
+            data = file.read()
+        with open(path, 'wb') as file:
+            file.write(data[:-1])
+
+        with self.assertRaises(ValueError):
+            list(self.wm._iter_wifi_config_records(path=path))
+
+    def test__iter_wifi_config_records_header(self) -> None:
+        """Test checking the plain header before decrypting the file"""
+        path = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        self.wm._save_wifi_config_data(
+            data=[{"ssid": "a", "password": "b" * 40}], path=path)
+        with open(path, 'rb') as file:
+            data = bytearray(file.read())
+
+        # cut within the ciphertext, as by a reset during a write
+        with open(path, 'wb') as file:
+            file.write(data[:-16])
+        with patch.object(self.wm, '_read_records') as mock_read_records:
+            with self.assertRaises(ValueError):
+                list(self.wm._iter_wifi_config_records(path=path))
+        mock_read_records.assert_not_called()
+
+        # unknown version of the file header
+        data[3] = WiFiManager.CONFIG_FILE_VERSION + 1
+        with open(path, 'wb') as file:
+            file.write(data)
+        with self.assertRaises(ValueError):
+            list(self.wm._iter_wifi_config_records(path=path))
+
+        # flipped bit of the ciphertext is detected by the checksum
+        data[3] = WiFiManager.CONFIG_FILE_VERSION
+        data[-1] ^= 0x01
+        with open(path, 'wb') as file:
+            file.write(data)
+        with self.assertRaises(ValueError):
+            list(self.wm._iter_wifi_config_records(path=path))
+
+    def test__recover_wifi_config(self) -> None:
+        """Test falling back to the previous generation of the config"""
+        path = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        networks = [
+            {"ssid": "net_{}".format(idx), "password": "password"}
+            for idx in range(3)
+        ]
+        self.wm._save_wifi_config_data(data=networks[:2], path=path)
+        self.assertFalse(Path(path + '.bak').exists())
+        self.wm._save_wifi_config_data(data=networks, path=path)
+        self.assertTrue(Path(path + '.bak').exists())
+        with open(path + '.bak', 'rb') as file:
+            backup_data = file.read()
+
+        # broken file is replaced by the previous generation
+        with open(path, 'r+b') as file:
+            file.seek(-1, 2)
+            file.write(b'x')
+        self.assertEqual(self.wm._load_wifi_config_data(path=path,
+                                                        encrypted=True),
+                         networks[:2])
+        self.assertEqual(self.wm._replay_wifi_config(path=path),
+                         networks[:2])
+        with open(path + '.bak', 'rb') as file:
+            self.assertEqual(file.read(), backup_data)
+
+        # reset after the file became the previous generation
+        self.wm._save_wifi_config_data(data=networks, path=path)
+        Path(path).rename(path + '.bak')
+        self.wm._save_wifi_config_data(data=networks[2:], path=path)
+        Path(path).rename(path + '.tmp')
+        self.assertTrue(EncryptedFileStorage(manager=self.wm,
+                                             path=path).exists())
+        self.assertEqual(self.wm._load_wifi_config_data(path=path,
+                                                        encrypted=True),
+                         networks[2:])
+        self.assertEqual(self.wm._replay_wifi_config(path=path),
+                         networks[2:])
+
+        # nothing to recover, broken file is removed
+        for name in (path, path + '.bak'):
+            with open(name, 'wb') as file:
+                file.write(b'WMF' + bytes(13))
+        Path(path + '.tmp').unlink(missing_ok=True)
+        self.assertEqual(self.wm._load_wifi_config_data(path=path,
+                                                        encrypted=True),
+                         [])
+        self.assertFalse(Path(path).exists())
+
+    def test__recover_wifi_config_legacy_backup(self) -> None:
+        """Test recovering and appending with a legacy previous generation"""
+        path = self.copy_encrypted_config(name='multi-network.json')
+        with open(path, 'rb') as file:
+            legacy_data = file.read()
+        networks = [
+            {"ssid": "SSID Name", "password": "1234qwertz@"},
+            {"ssid": "Other-Network@1", "password": "password"}
+        ]
+
+        # converted legacy file is not kept as previous generation
+        self.assertEqual(self.wm._load_wifi_config_data(path=path,
+                                                        encrypted=True),
+                         networks)
+        self.assertFalse(Path(path + '.bak').exists())
+
+        # broken file is recovered from a legacy previous generation
+        with open(path + '.bak', 'wb') as file:
+            file.write(legacy_data)
+        with open(path, 'r+b') as file:
+            file.seek(-1, 2)
+            file.write(b'x')
+        self.assertEqual(self.wm._load_wifi_config_data(path=path,
+                                                        encrypted=True),
+                         networks)
+        self.assertEqual(self.wm._replay_wifi_config(path=path), networks)
+        self.assertFalse(Path(path + '.bak').exists())
+
+        # saving with only the previous generation rewrites all networks
+        Path(path).rename(path + '.bak')
+        self.assertFalse(self.wm._has_file_header(path=path))
+        self.wm._config_file = path
+        self.wm.config_flush_delay = 0
+        new_net = {"ssid": "new_net", "password": "password"}
+        self.wm.extend_wifi_config_data(data=new_net,
+                                        path=path,
+                                        encrypted=True)
+        self.assertTrue(self.wm._has_file_header(path=path))
+        self.assertEqual(self.wm._replay_wifi_config(path=path),
+                         networks + [new_net])
+
+        # appending never creates a file without header
+        Path(path).unlink()
+        with self.assertRaises(OSError):
+            self.wm._append_wifi_config_records(
+                records=[(WiFiManager.CONFIG_RECORD_NETWORK, new_net)],
+                path=path)
+        self.assertFalse(Path(path).exists())
+
+    def test__write_encrypted_file_uncommitted(self) -> None:
+        """Test ignoring appended data not committed by the header"""
+        path = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        networks = [
+            {"ssid": "net_{}".format(idx), "password": "password"}
+            for idx in range(3)
+        ]
+        self.wm._save_wifi_config_data(data=networks[:2], path=path)
+
+        # reset after appending a record, before updating the header
+        with open(path, 'ab') as file:
+            file.write(bytes(range(48)))
+        self.assertEqual(self.wm._replay_wifi_config(path=path),
+                         networks[:2])
+
+        # next append overwrites the uncommitted data
+        self.wm._append_wifi_config_records(
+            records=[(WiFiManager.CONFIG_RECORD_NETWORK, networks[2])],
+            path=path)
+        self.assertEqual(self.wm._replay_wifi_config(path=path), networks)
+
+    def test__iter_wifi_config_records_unsupported_version(self) -> None:
+        """Test rejecting an unknown version of the binary config format"""
+        path = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        data = self.wm._encode_wifi_config(data={"ssid": "a", "password": ""})
+        data = data[:3] + bytes([self.wm.CONFIG_VERSION + 1]) + data[4:]
+        with open(path, 'wb') as file:
+            file.write(self.wm._encrypt_data(data=data))
+
+        with self.assertRaises(ValueError):
+            list(self.wm._iter_wifi_config_records(path=path))
+
+    @params(
+        (False, ),
+        (True, ),
+    )
+    def test_extend_wifi_config_data_journal(self, compress: bool) -> None:
+        """
+        Test appending networks to an encrypted config file
+
+        :param      compress:  Flag to compress the config
+        :type       compress:  bool
+        """
+        path = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        networks = [
+            {"ssid": "net_{}".format(idx), "password": "password"}
+            for idx in range(3)
+        ]
+        self.wm.compress_config = compress
+        self.wm._config_chunk_size = 16
+        self.wm._save_wifi_config_data(data=networks[:2], path=path)
+        saved_data = self.read_ciphertext(path=path)
+
+        self.wm.extend_wifi_config_data(data=networks[2],
+                                        path=path,
+                                        encrypted=True)
+
+        # existing content is kept, only the new network is appended
+        extended_data = self.read_ciphertext(path=path)
+        self.assertTrue(extended_data.startswith(saved_data))
+        self.assertEqual(len(extended_data) % 16, 0)
+        self.assertEqual(self.wm.configured_networks,
+                         ['net_0', 'net_1', 'net_2'])
+        self.assertEqual(self.wm._load_wifi_config_data(path=path,
+                                                        encrypted=True),
+                         networks)
+        self.assertEqual(self.wm._config_garbage, 0)
+
+    def test__remove_wifi_config(self) -> None:
+        """Test removing networks by appending remove records"""
+        self.wm._config_file = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        networks = [
+            {"ssid": "net_{}".format(idx), "password": "password"}
+            for idx in range(3)
+        ]
+        self.wm._save_wifi_config_data(data=networks + [networks[1]],
+                                       path=self.wm._config_file)
+        saved_data = self.read_ciphertext(path=self.wm._config_file)
+
+        with patch('_thread.start_new_thread') as mock_thread:
+            self.wm._remove_wifi_config(form_data={'net_1': 'on',
+                                                   'unknown': 'on'})
+            # removal is only applied to the in memory view until flushed
+            self.assertTrue(self.wm.config_dirty)
+            self.assertTrue(self.wm.flush_wifi_config())
+            self.assertFalse(self.wm.flush_wifi_config())
+        mock_thread.assert_not_called()
+        self.assertFalse(self.wm.config_dirty)
+
+        removed_data = self.read_ciphertext(path=self.wm._config_file)
+        self.assertTrue(removed_data.startswith(saved_data))
+        self.assertEqual(self.wm.configured_networks, ['net_0', 'net_2'])
+        # remove record and both removed networks
+        self.assertEqual(self.wm._config_garbage, 3)
+
+        result = self.wm._load_wifi_config_data(path=self.wm._config_file,
+                                                encrypted=True)
+        self.assertEqual(result, [networks[0], networks[2]])
+        self.assertEqual(self.wm._config_garbage, 3)
+
+        # compact the file in the background as soon as the limit is exceeded
+        self.wm._config_garbage_limit = 3
+        self.wm.config_flush_delay = 0
+        with patch('_thread.start_new_thread') as mock_thread:
+            mock_thread.side_effect = lambda func, args: func(*args)
+            self.wm._remove_wifi_config(form_data={'net_0': 'on'})
+        mock_thread.assert_called_once()
+
+        self.assertEqual(self.wm._config_garbage, 0)
+        compacted_data = self.read_ciphertext(path=self.wm._config_file)
+        self.assertLess(len(compacted_data), len(saved_data))
+        self.assertEqual(self.wm._load_wifi_config_data(
+            path=self.wm._config_file, encrypted=True), [networks[2]])
+        self.assertEqual(self.wm.configured_networks, ['net_2'])
+
+    def test__change_wifi_config_upsert(self) -> None:
+        """Test saving networks with the same SSID only once"""
+        self.wm._config_file = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        self.wm.config_flush_delay = 0
+
+        for net in [
+            {"ssid": "net_0", "password": "password"},
+            {"ssid": "net_1", "password": "password"},
+            {"ssid": "net_2", "password": "password"},
+            {"ssid": "net_1", "password": "new_password"},
+        ]:
+            self.wm.extend_wifi_config_data(data=net,
+                                            path=self.wm._config_file,
+                                            encrypted=True)
+
+        expectation = [
+            {"ssid": "net_0", "password": "password"},
+            {"ssid": "net_1", "password": "new_password"},
+            {"ssid": "net_2", "password": "password"},
+        ]
+        self.assertEqual(self.wm._get_wifi_config(), expectation)
+        self.assertEqual(self.wm.configured_networks,
+                         ['net_0', 'net_1', 'net_2'])
+        self.assertEqual(self.wm._config_garbage, 1)
+
+        # replaced network record is dropped on load as well
+        self.assertEqual(self.wm._load_wifi_config_data(
+            path=self.wm._config_file, encrypted=True), expectation)
+        self.assertEqual(self.wm._config_garbage, 1)
+
+        # index follows the removed network
+        self.wm._remove_wifi_config(form_data={'net_0': 'on'})
+        self.assertEqual(self.wm._config_index, {'net_1': 0, 'net_2': 1})
+        self.assertEqual(self.wm._config_garbage, 3)
+        self.assertEqual(self.wm._load_wifi_config_data(
+            path=self.wm._config_file, encrypted=True), expectation[1:])
+
+    @params(
+        (4, 4),
+        (0, 0),
+        (-1, 0),
+        ('4', 0),
+    )
+    def test_config_capacity(self, value: int, expectation: int) -> None:
+        """Test setting the maximum number of configured networks"""
+        self.wm.config_capacity = value
+        self.assertEqual(self.wm.config_capacity, expectation)
+
+    def test__change_wifi_config_capacity(self) -> None:
+        """Test evicting the least recently used networks"""
+        self.wm._config_file = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        self.wm.config_flush_delay = 0
+        self.wm.config_capacity = 3
+
+        self.assertEqual(self.wm.extend_wifi_config_data(
+            data=[
+                {"ssid": "net_0", "password": "pw", "sequence": 2,
+                 "last_success": 100},
+                {"ssid": "net_1", "password": "pw"},
+                {"ssid": "net_2", "password": "pw", "sequence": 1,
+                 "last_success": 200},
+            ],
+            path=self.wm._config_file,
+            encrypted=True), [])
+
+        # network never connected successfully is evicted first
+        self.assertEqual(self.wm.extend_wifi_config_data(
+            data={"ssid": "net_3", "password": "pw"},
+            path=self.wm._config_file,
+            encrypted=True), ['net_1'])
+        self.assertEqual(self.wm.configured_networks,
+                         ['net_0', 'net_2', 'net_3'])
+
+        # just saved network is kept, even without a successful connection
+        self.assertEqual(self.wm.extend_wifi_config_data(
+            data={"ssid": "net_4", "password": "pw"},
+            path=self.wm._config_file,
+            encrypted=True), ['net_3'])
+
+        # replacing a network does not exceed the capacity
+        self.assertEqual(self.wm.extend_wifi_config_data(
+            data={"ssid": "net_0", "password": "new_pw"},
+            path=self.wm._config_file,
+            encrypted=True), [])
+
+        # the oldest successful connection is evicted next, regardless of
+        # its time recorded before a time sync
+        self.wm._update_network_meta(ssid='net_4',
+                                     changes={'sequence': 3})
+        result = self.wm._provision_networks(data=[{"ssid": "net_5"}])
+        self.assertEqual(result['results'], [
+            {'ssid': 'net_5', 'result': 'added'},
+            {'ssid': 'net_2', 'result': 'evicted'},
+        ])
+        self.assertEqual(self.wm._config_index,
+                         {'net_0': 0, 'net_4': 1, 'net_5': 2})
+        networks = self.wm._load_wifi_config_data(path=self.wm._config_file,
+                                                  encrypted=True)
+        self.assertEqual([net['ssid'] for net in networks],
+                         ['net_0', 'net_4', 'net_5'])
+
+        # no limit
+        self.wm.config_capacity = 0
+        self.assertEqual(self.wm.extend_wifi_config_data(
+            data={"ssid": "net_6", "password": "pw"},
+            path=self.wm._config_file,
+            encrypted=True), [])
+        self.assertEqual(len(self.wm.configured_networks), 4)
+
+    def test__load_wifi_config_data_legacy_duplicates(self) -> None:
+        """Test removing duplicated networks of a legacy config file"""
+        path = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        networks = [
+            {"ssid": "net_0", "password": "password"},
+            {"ssid": "net_1", "password": "password"},
+            {"ssid": "net_0", "password": "other"},
+            {"ssid": "net_0", "password": "latest"},
+        ]
+        with open(path, 'wb') as file:
+            file.write(self.wm._encrypt_data(data=networks))
+
+        expectation = [
+            {"ssid": "net_0", "password": "latest"},
+            {"ssid": "net_1", "password": "password"},
+        ]
+        result = self.wm._load_wifi_config_data(path=path, encrypted=True)
+        self.assertEqual(result, expectation)
+        self.assertEqual(self.wm._replay_wifi_config(path=path), expectation)
+        self.assertEqual(self.wm._config_garbage, 0)
+
+    def test_network_metadata(self) -> None:
+        """Test updating the metadata of networks without the credentials"""
+        self.wm._config_file = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        self.wm.config_flush_delay = 0
+        self.assertEqual(self.wm.network_metadata, {})
+
+        for net in [
+            {"ssid": "net_0", "password": "password", "priority": 2},
+            {"ssid": "net_1", "password": "password"},
+        ]:
+            self.wm.extend_wifi_config_data(data=net,
+                                            path=self.wm._config_file,
+                                            encrypted=True)
+
+        # only a small metadata record is appended
+        with patch.object(self.wm, '_append_wifi_config_records',
+                          wraps=self.wm._append_wifi_config_records) as mock:
+            self.assertTrue(self.wm._update_network_meta(
+                ssid='net_1',
+                changes={'last_success': 1234, 'successes': 1}))
+        records = mock.call_args.kwargs['records']
+        self.assertEqual(records, [
+            (WiFiManager.CONFIG_RECORD_META,
+             ['net_1', None, 1234, None, None, 1, None, None, None])
+        ])
+
+        # unchanged metadata and unknown networks are not written
+        with patch.object(self.wm, '_change_wifi_config') as mock_change:
+            self.assertFalse(self.wm._update_network_meta(
+                ssid='net_1', changes={'successes': 1}))
+            self.assertFalse(self.wm._update_network_meta(
+                ssid='unknown', changes={'successes': 1}))
+        mock_change.assert_not_called()
+
+        expectation = {
+            'net_0': {'priority': 2},
+            'net_1': {'last_success': 1234, 'successes': 1},
+        }
+        self.assertEqual(self.wm.network_metadata, expectation)
+
+        # new credentials keep the metadata
+        self.wm.extend_wifi_config_data(
+            data={"ssid": "net_1", "password": "new_password"},
+            path=self.wm._config_file,
+            encrypted=True)
+        self.assertEqual(self.wm.network_metadata, expectation)
+        self.assertEqual(self.wm._config_network(ssid='net_1')['password'],
+                         'new_password')
+
+        # replaced metadata records become garbage
+        self.wm._update_network_meta(ssid='net_1', changes={'failures': 1})
+        self.assertEqual(self.wm._config_garbage, 2)
+
+        wm = WiFiManager(logger=None, quiet=True)
+        wm._config_file = self.wm._config_file
+        wm.config_flush_delay = 0
+        wm._load_networks()
+        expectation['net_1']['failures'] = 1
+        self.assertEqual(wm.network_metadata, expectation)
+        self.assertEqual(wm._config_garbage, 2)
+
+    def test_load_and_connect_network_metadata(self) -> None:
+        """Test storing the result of connection attempts in the config"""
+        self.wm._config_file = self.copy_encrypted_config(
+            name='multi-network.json')
+        self.wm.config_flush_delay = 0
+        scan_result = [
+            ('SSID Name', 'aaaaaaaaaaaa', 1, -80, 3, False),
+            ('Other-Network@1', 'bbbbbbbbbbbb', 6, -40, 3, False),
+        ]
+
+        with patch('wifi_helper.network.Station.scan',
+                   return_value=scan_result):
+            with patch('wifi_manager.wifi_manager.time.time',
+                       return_value=1234.5):
+                with patch.object(self.wm, '_synced_time', return_value=1):
+                    self.assertTrue(self.wm.load_and_connect())
+
+        expectation = {
+            'Other-Network@1': {
+                'last_success': 1234,
+                'last_bssid': 'bbbbbbbbbbbb',
+                'last_channel': 6,
+                'successes': 1,
+                'sequence': 1
+            },
+            'SSID Name': {},
+        }
+        self.assertEqual(self.wm.network_metadata, expectation)
+
+        # failed attempts are counted as well
+        self.wm._record_attempt(ssid='SSID Name',
+                                result=False,
+                                duration=5010,
+                                timeout=5000)
+        expectation['SSID Name']['failures'] = 1
+        self.assertEqual(self.wm.network_metadata, expectation)
+        self.wm._save_state()
+
+        # first success is written to the config, failures only to the state
+        wm = WiFiManager(logger=None, quiet=True)
+        wm._config_file = self.wm._config_file
+        wm._load_networks()
+        self.assertEqual(wm.network_metadata, {
+            'Other-Network@1': expectation['Other-Network@1'],
+            'SSID Name': {},
+        })
+
+        wm._state_file = self.wm._state_file
+        wm._load_state()
+        self.assertEqual(wm.network_metadata, expectation)
+
+    def test__sync_network_meta(self) -> None:
+        """Test writing metadata of connection attempts rarely to the config"""
+        self.wm._config_file = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        self.wm.config_flush_delay = 0
+        self.wm.extend_wifi_config_data(
+            data=[{"ssid": "net_0", "password": "pw"}],
+            path=self.wm._config_file,
+            encrypted=True)
+        self.wm.wh.station.connect('net_0', 'pw')
+
+        with patch.object(self.wm, '_change_wifi_config',
+                          wraps=self.wm._change_wifi_config) as mock_change, \
+                patch.object(self.wm, '_synced_time', return_value=1):
+            for idx in range(20):
+                with patch('wifi_manager.wifi_manager.time.time',
+                           return_value=1000 + idx):
+                    self.wm._record_attempt(ssid='net_0',
+                                            result=False,
+                                            duration=100,
+                                            timeout=5000)
+                    self.wm._remember_connection(plan=[])
+        # only the first success is written to the config
+        mock_change.assert_called_once()
+        self.assertEqual(self.wm._config_garbage, 0)
+        self.assertEqual(self.wm._config_network(ssid='net_0'), {
+            'ssid': 'net_0',
+            'password': 'pw',
+            'last_success': 1000,
+            'successes': 1,
+            'failures': 1,
+            'sequence': 1,
+        })
+        self.assertEqual(self.wm.network_metadata['net_0'], {
+            'last_success': 1019,
+            'successes': 20,
+            'failures': 20,
+            'sequence': 20,
+        })
+
+        # after the interval the latest metadata is written to the config
+        with patch('wifi_manager.wifi_manager.time.time',
+                   return_value=1000 + self.wm._meta_sync_interval):
+            with patch.object(self.wm, '_synced_time', return_value=1):
+                self.wm._remember_connection(plan=[])
+        self.assertEqual(self.wm._load_wifi_config_data(
+            path=self.wm._config_file, encrypted=True)[0]['successes'], 21)
+
+        # no-scan ranking and eviction use the metadata of the state
+        self.wm._state['meta']['net_0']['sequence'] = 5
+        self.assertEqual(self.wm._network_meta(
+            ssid='net_0',
+            net={'ssid': 'net_0', 'sequence': 1})['sequence'], 5)
+
+    def test__remember_connection_unsynced(self) -> None:
+        """Test counting successes without a synced time"""
+        self.wm._config_file = str(Path(self.tmp_dir) / 'wifi-secure.json')
+        self.wm.config_flush_delay = 0
+        self.wm.extend_wifi_config_data(
+            data=[{"ssid": "net_0", "password": "pw"},
+                  {"ssid": "net_1", "password": "pw"}],
+            path=self.wm._config_file,
+            encrypted=True)
+        self.simulate_networks('net_0', 'net_1')
+
+        with patch.object(self.wm, '_synced_time', return_value=0):
+            for ssid in ['net_0', 'net_1', 'net_0']:
+                self.wm.wh.station.connect(ssid, 'pw')
+                self.wm._remember_connection(plan=[])
+
+        metadata = self.wm.network_metadata
+        self.assertNotIn('last_success', metadata['net_0'])
+        self.assertNotIn('last_success', metadata['net_1'])
+        self.assertEqual(metadata['net_0']['sequence'], 3)
+        self.assertEqual(metadata['net_1']['sequence'], 2)
+        self.assertEqual(self.wm._next_sequence(), 4)
+
+        # the first success is written to the config, the sequence continues
+        wm = WiFiManager(logger=None, quiet=True)
+        wm._config_file = self.wm._config_file
+        wm._load_networks()
+        self.assertEqual(wm.network_metadata['net_0']['sequence'], 1)
+        self.assertEqual(wm._next_sequence(), 3)
+
+    def test_load_and_connect_over_capacity(self) -> None:
+        """Test connecting does not evict networks of a store over capacity"""
+        networks = [{'ssid': 'net{:02d}'.format(idx), 'password': 'pw'}
+                    for idx in range(20)]
+        self.wm.config_storage = MemoryStorage(networks=networks)
+        self.wm.config_flush_delay = 0
+        self.wm.config_capacity = 4
+        scan_result = [
+            ('net05', 'aaaaaaaaaaaa', 1, -80, 3, False),
+            ('net19', 'bbbbbbbbbbbb', 6, -40, 3, False),
+        ]
+
+        with patch('wifi_helper.network.Station.scan',
+                   return_value=scan_result):
+            self.assertTrue(self.wm.load_and_connect())
+        self.assertEqual(self.wm.last_connection['ssid'], 'net19')
+
+        self.wm._record_attempt(ssid='net05',
+                                result=False,
+                                duration=5010,
+                                timeout=5000)
+
+        self.assertEqual(len(self.wm.configured_networks), 20)
+        self.assertEqual(len(self.wm.config_storage.load()), 20)
+        self.assertEqual(self.wm.network_metadata['net05'], {'failures': 1})
+
+        # state recorded during the attempt is kept
+        self.assertEqual(self.wm._state['last']['ssid'], 'net19')
+        self.assertIn('net19', self.wm._state['durations'])
+
+        # saving a network applies the capacity
+        self.assertEqual(len(self.wm.extend_wifi_config_data(
+            data={'ssid': 'net20', 'password': 'pw'},
+            path=self.wm._config_file,
+            encrypted=True)), 17)
+        self.assertEqual(self.wm.configured_networks,
+                         ['net17', 'net18', 'net19', 'net20'])
+
+    def test_flush_wifi_config(self) -> None:
+        """Test writing back changes of the in memory WiFi config"""
+        self.wm._config_file = self.copy_encrypted_config(
+            name='multi-network.json')
+        self.wm.config_flush_delay = 100
+        new_nets = [
+            {"ssid": "new_net_1", "password": "password_1"},
+            {"ssid": "new_net_2", "password": "password_2"}
+        ]
+
+        # the config file is loaded only once, no matter how often it is used
+        with patch.object(self.wm, '_load_wifi_config_data',
+                          wraps=self.wm._load_wifi_config_data) as mock_load:
+            networks = self.wm._load_networks()
+            for net in new_nets:
+                self.wm.extend_wifi_config_data(data=net,
+                                                path=self.wm._config_file,
+                                                encrypted=True)
+            self.wm._remove_wifi_config(form_data={'SSID Name': 'on'})
+            self.assertEqual(self.wm._load_networks(), networks[1:] + new_nets)
+        mock_load.assert_called_once()
+
+        self.assertTrue(self.wm.config_dirty)
+        self.assertEqual(self.wm.configured_networks,
+                         ['Other-Network@1', 'new_net_1', 'new_net_2'])
+
+        # all changes are written at once after the delay
+        with patch.object(self.wm, '_append_wifi_config_records',
+                          wraps=self.wm._append_wifi_config_records) as mock:
+            time.sleep(0.3)
+        mock.assert_called_once()
+        self.assertFalse(self.wm.config_dirty)
+
+        wm = WiFiManager(logger=None, quiet=True)
+        wm._config_file = self.wm._config_file
+        self.assertEqual(wm._load_networks(), networks[1:] + new_nets)
+
     @unittest.skip("Tested with test_load_and_connect")
     def test_configured_networks(self) -> None:
         pass
@@ -653,10 +2900,6 @@ class TestWiFiManager(unittest.TestCase):
     def test__render_network_inputs(self) -> None:
         pass
 
-    @unittest.skip("Not yet implemented")
-    def test__remove_wifi_config(self) -> None:
-        pass
-
     @unittest.skip("Function only works while Flask app is running")
     def test_landing_page(self) -> None:
         pass
@@ -681,7 +2924,6 @@ class TestWiFiManager(unittest.TestCase):
     def test_save_wifi_config(self):
         pass
 
-    @unittest.skip("Not yet implemented")
     @params(
         (
             {'bssid': 'a0f3c1fbfc3c', 'ssid': '', 'password': 'qwertz1234@'},
@@ -702,7 +2944,12 @@ class TestWiFiManager(unittest.TestCase):
         (
             # unknown (not in latest scan) BSSID given
             {'bssid': 'unknown', 'ssid': '', 'password': 'something'},
-            {'password': 'something'}
+            None
+        ),
+        (
+            # neither SSID nor BSSID given
+            {'ssid': '', 'password': 'something'},
+            None
         ),
         (
             # unknown (not in latest scan) SSID given
@@ -710,17 +2957,207 @@ class TestWiFiManager(unittest.TestCase):
             {'ssid': 'unknown', 'password': 'something'}
         )
     )
-    def test__save_wifi_config(self,
-                               form_data: dict,
-                               expectation: dict) -> None:
-        result = self.wm._save_wifi_config(form_data=form_data)
-        self.assertIsInstance(result, dict)
+    def test__network_from_form(self,
+                                form_data: dict,
+                                expectation: Union[dict, None]) -> None:
+        """Test getting the network configuration of the form data"""
+        scan_result = [
+            {'ssid': 'TP-LINK_FBFC3C', 'bssid': 'a0f3c1fbfc3c'},
+            {'ssid': 'FRITZ!Box 7490', 'bssid': '3810d517eb39'},
+        ]
+        with patch.object(WiFiManager, 'latest_scan',
+                          new_callable=PropertyMock,
+                          return_value=scan_result):
+            result = self.wm._network_from_form(form_data=form_data)
         self.assertEqual(result, expectation)
 
+    def test__save_wifi_config(self) -> None:
+        """Test saving verified credentials only"""
+        self.simulate_networks('Net A')
+        self.wm._state = {'health': {'Net A': [3, 1]}}
+        self.wm._save_state()
+        form_data = {'ssid': 'Net A', 'password': 'qwertz'}
+
+        with patch.object(self.wm, 'extend_wifi_config_data',
+                          return_value=[]) as mock_extend:
+            with patch('wifi_helper.network.Station.isconnected',
+                       return_value=False):
+                with patch('wifi_helper.network.Station.status',
+                           return_value=network.STAT_WRONG_PASSWORD):
+                    result = self.wm._save_wifi_config(form_data=form_data)
+            self.assertEqual(result, {
+                'ssid': 'Net A',
+                'connected': False,
+                'status': network.STAT_WRONG_PASSWORD,
+                'evicted': []
+            })
+            mock_extend.assert_not_called()
+            self.assertFalse(self.wm.wh.station.isconnected())
+            # a typo does not quarantine the already configured network
+            self.assertEqual(self.wm.network_health,
+                             {'Net A': {'failures': 3, 'skip': 1}})
+
+            result = self.wm._save_wifi_config(form_data=form_data)
+            self.assertEqual(result, {
+                'ssid': 'Net A',
+                'connected': True,
+                'status': None,
+                'evicted': []
+            })
+            mock_extend.assert_called_once_with(
+                data=form_data,
+                path=self.wm._config_file,
+                encrypted=True)
+            self.assertTrue(self.wm.wh.station.isconnected())
+            self.assertEqual(self.wm.network_health, dict())
+
+            mock_extend.reset_mock()
+            result = self.wm._save_wifi_config(form_data={'ssid': '',
+                                                          'password': ''})
+            self.assertEqual(result, {
+                'ssid': None,
+                'connected': False,
+                'status': None,
+                'evicted': []
+            })
+            mock_extend.assert_not_called()
+
+        self.wm._load_state()
+        self.assertEqual(self.wm.network_health, dict())
+
+    def test__save_wifi_config_async(self) -> None:
+        """Test saving verified credentials without blocking"""
+        self.simulate_networks('Net A')
+        form_data = {'ssid': 'Net A', 'password': 'qwertz'}
+
+        with patch.object(self.wm, 'extend_wifi_config_data',
+                          return_value=[]) as mock_extend:
+            with patch('wifi_helper.network.Station.isconnected',
+                       return_value=False):
+                with patch('wifi_helper.network.Station.status',
+                           return_value=network.STAT_NO_AP_FOUND):
+                    result = asyncio.run(self.wm._save_wifi_config_async(
+                        form_data=form_data))
+            self.assertFalse(result['connected'])
+            self.assertEqual(result['status'], network.STAT_NO_AP_FOUND)
+            mock_extend.assert_not_called()
+            self.assertEqual(self.wm.network_health, dict())
+
+            result = asyncio.run(self.wm._save_wifi_config_async(
+                form_data=form_data))
+            self.assertTrue(result['connected'])
+            mock_extend.assert_called_once()
+
     @unittest.skip("Function only works while Flask app is running")
     def test_remove_wifi_config(self):
         pass
 
+    @params(
+        # list of networks
+        (
+            [
+                {'ssid': 'net_1', 'password': 'password_1', 'priority': 2},
+                {'ssid': 'SSID Name', 'password': 'new_password'}
+            ],
+            True,
+            [
+                {'ssid': 'net_1', 'result': 'added'},
+                {'ssid': 'SSID Name', 'result': 'updated'}
+            ],
+            [
+                {'ssid': 'SSID Name', 'password': 'new_password'},
+                {'ssid': 'Other-Network@1', 'password': 'password'},
+                {'ssid': 'net_1', 'password': 'password_1', 'priority': 2}
+            ]
+        ),
+        # networks to add and remove
+        (
+            {
+                'networks': [{'ssid': 'net_1'}],
+                'remove': ['SSID Name', 'unknown']
+            },
+            True,
+            [
+                {'ssid': 'net_1', 'result': 'added'},
+                {'ssid': 'SSID Name', 'result': 'removed'},
+                {'ssid': 'unknown', 'result': 'not configured'}
+            ],
+            [
+                {'ssid': 'Other-Network@1', 'password': 'password'},
+                {'ssid': 'net_1', 'password': ''}
+            ]
+        ),
+        # nothing is saved if any entry is invalid
+        (
+            {
+                'networks': [
+                    {'ssid': 'net_1', 'password': 'password_1'},
+                    {'ssid': '', 'password': 'password_2'},
+                    {'ssid': 'net_3', 'password': 'x' * 65},
+                    {'ssid': 'net_4', 'priority': 'high'},
+                    'net_5',
+                    {'ssid': 'net_6', 'password': 'short'}
+                ],
+                'remove': ['Other-Network@1', 6]
+            },
+            False,
+            [
+                {'ssid': 'net_1', 'result': 'added'},
+                {'ssid': '', 'result': 'invalid ssid'},
+                {'ssid': 'net_3', 'result': 'invalid password'},
+                {'ssid': 'net_4', 'result': 'invalid priority'},
+                {'ssid': None, 'result': 'invalid network'},
+                {'ssid': 'net_6', 'result': 'invalid password'},
+                {'ssid': 'Other-Network@1', 'result': 'removed'},
+                {'ssid': 6, 'result': 'invalid ssid'}
+            ],
+            [
+                {'ssid': 'SSID Name', 'password': '1234qwertz@'},
+                {'ssid': 'Other-Network@1', 'password': 'password'}
+            ]
+        ),
+        # request without JSON
+        (None, False, [], None),
+    )
+    def test__provision_networks(self,
+                                 data: Union[dict, List[dict], None],
+                                 saved: bool,
+                                 results: List[dict],
+                                 expectation: Union[List[dict], None]) -> None:
+        """
+        Test adding, replacing and removing several networks at once
+
+        :param      data:         The provisioning request
+        :type       data:         Union[dict, List[dict], None]
+        :param      saved:        Flag whether changes shall be saved
+        :type       saved:        bool
+        :param      results:      Expected result of each entry
+        :type       results:      List[dict]
+        :param      expectation:  Expected networks of the config file
+        :type       expectation:  Union[List[dict], None]
+        """
+        self.wm._config_file = self.copy_encrypted_config(
+            name='multi-network.json')
+
+        with patch.object(self.wm, '_write_encrypted_file',
+                          wraps=self.wm._write_encrypted_file) as mock_write:
+            result = self.wm._provision_networks(data=data)
+
+        self.assertEqual(result, {'saved': saved, 'results': results})
+        self.assertFalse(self.wm.config_dirty)
+        if expectation is None:
+            mock_write.assert_not_called()
+            return
+
+        # all changes are written at once, after converting the legacy file
+        self.assertEqual(mock_write.call_count, 2 if saved else 1)
+        self.assertEqual(self.wm._load_wifi_config_data(
+            path=self.wm._config_file, encrypted=True), expectation)
+
+    @unittest.skip("Function only works while Flask app is running")
+    def test_provision(self):
+        pass
+
     @unittest.skip("Function only works while Flask app is running")
     def test_styles(self):
         pass
@@ -76,8 +76,33 @@
       document.getElementById("overlay").style.display = "none";
     };
     document.getElementById("save_wifi_config_form").onsubmit = function(e) {
-      createToast('alert-success', 'Success!', 'Network saved', 5000);
-      return true;
+      var xmlhttp = new XMLHttpRequest();
+      var save = document.getElementById("save");
+      xmlhttp.onreadystatechange = function() {
+        if (this.readyState == 4) {
+          var result = {};
+          try {result = JSON.parse(this.responseText);} catch (err) {}
+          if (this.status == 200) {
+            createToast('alert-success', 'Success!', 'Connected to ' + result.ssid + ', network saved', 5000);
+            if (result.evicted && result.evicted.length) {
+              createToast('alert-warning', 'Removed!', 'Maximum number of networks reached, removed ' + result.evicted.join(', '), 8000);
+            }
+          } else if (this.status == 0) {
+            createToast('alert-warning', 'Unknown!', 'Connection lost, reconnect to check the saved networks', 5000);
+          } else if (result.ssid) {
+            createToast('alert-danger', 'Failed!', 'Could not connect to ' + result.ssid + ', network not saved', 5000);
+          } else {
+            createToast('alert-danger', 'Failed!', 'No network selected', 5000);
+          }
+          save.disabled = false;
+        }
+      };
+      xmlhttp.open("POST", this.action);
+      xmlhttp.setRequestHeader("Content-Type", "application/x-www-form-urlencoded");
+      xmlhttp.send(new URLSearchParams(new FormData(this)).toString());
+      save.disabled = true;
+      createToast('alert-info', 'Testing...', 'Connecting to the network', 3000);
+      return false;
     };
     function remember_selected_element(cb) {selected_bssid = cb.id;}
     function get_new_networks() {
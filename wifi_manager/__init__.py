@@ -2,5 +2,7 @@
 # -*- coding: UTF-8 -*-
 
 from .wifi_manager import WiFiManager
+from .storage import ConfigStorage, DirectoryStorage, \
+    EncryptedFileStorage, MemoryStorage
 
 from .version import __version__
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+WiFi config storage
+
+Storage backends of the configured networks used by the WiFi Manager to load,
+save and remove networks.
+"""
+
+# system packages
+import ubinascii
+import os
+
+# custom packages
+from be_helpers.path_helper import PathHelper
+
+# typing not natively supported on micropython
+from be_helpers.typing import List, Tuple, Union
+
+
+class ConfigStorage(object):
+    """Interface of a storage of the configured networks"""
+    def exists(self) -> bool:
+        """
+        Check whether networks have been stored before.
+
+        :returns:   Existance of the stored networks
+        :rtype:     bool
+        """
+        raise NotImplementedError()
+
+    def load(self) -> List[dict]:
+        """
+        Load all stored networks.
+
+        :returns:   The stored networks
+        :rtype:     List[dict]
+        """
+        raise NotImplementedError()
+
+    def save(self, networks: List[dict]) -> None:
+        """
+        Replace all stored networks.
+
+        :param      networks:  The networks
+        :type       networks:  List[dict]
+        """
+        raise NotImplementedError()
+
+    def update(self,
+               records: List[Tuple[int, Union[dict, str, list]]],
+               networks: List[dict],
+               index: dict) -> None:
+        """
+        Store changed networks.
+
+        The records describe the changes, the networks and the index are the
+        view after all records have been applied.
+
+        :param      records:   The record types and networks, SSIDs or
+                               metadata
+        :type       records:   List[Tuple[int, Union[dict, str, list]]]
+        :param      networks:  The networks after the change
+        :type       networks:  List[dict]
+        :param      index:     The position of each SSID in the networks
+        :type       index:     dict
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def record_ssid(value: Union[dict, str, list]) -> Union[str, None]:
+        """
+        Get the SSID of a record value.
+
+        :param      value:  The network, SSID or metadata
+        :type       value:  Union[dict, str, list]
+
+        :returns:   The SSID of the changed network
+        :rtype:     Union[str, None]
+        """
+        if isinstance(value, dict):
+            return value.get('ssid')
+        elif isinstance(value, list):
+            return value[0]
+
+        return value
+
+
+class EncryptedFileStorage(ConfigStorage):
+    """
+    Storage of all networks in one encrypted file
+
+    Changes are appended as records to the file, which is compacted in the
+    background once too many records are outdated.
+    """
+    def __init__(self, manager, path: str):
+        """
+        Constructs a new instance.
+
+        :param      manager:  The WiFi manager encrypting the networks
+        :type       manager:  WiFiManager
+        :param      path:     The full path to the file
+        :type       path:     str
+        """
+        self._manager = manager
+        self._path = path
+
+    @property
+    def path(self) -> str:
+        """
+        Get the path of the encrypted file.
+
+        :returns:   The full path to the file
+        :rtype:     str
+        """
+        return self._path
+
+    def exists(self) -> bool:
+        """
+        Check whether the encrypted file or its previous generation exists.
+
+        :returns:   Existance of the file
+        :rtype:     bool
+        """
+        return (PathHelper.exists(path=self._path) or
+                PathHelper.exists(path='{}{}'.format(
+                    self._path, self._manager.CONFIG_BACKUP_SUFFIX)))
+
+    def load(self) -> List[dict]:
+        """
+        Load all networks of the encrypted file.
+
+        Replaced duplicates of the file are dropped in the background.
+
+        :returns:   The stored networks
+        :rtype:     List[dict]
+        """
+        networks = self._manager._load_wifi_config_data(path=self._path,
+                                                        encrypted=True)
+        self._manager._schedule_compaction(path=self._path)
+
+        return networks
+
+    def save(self, networks: List[dict]) -> None:
+        """
+        Rewrite the encrypted file with the networks.
+
+        :param      networks:  The networks
+        :type       networks:  List[dict]
+        """
+        self._manager._save_wifi_config_data(data=networks, path=self._path)
+
+    def update(self,
+               records: List[Tuple[int, Union[dict, str, list]]],
+               networks: List[dict],
+               index: dict) -> None:
+        """
+        Append the records to the encrypted file.
+
+        The file is rewritten with all networks if it has no valid header,
+        e.g. if only its previous generation exists.
+
+        :param      records:   The record types and networks, SSIDs or
+                               metadata
+        :type       records:   List[Tuple[int, Union[dict, str, list]]]
+        :param      networks:  The networks after the change
+        :type       networks:  List[dict]
+        :param      index:     The position of each SSID in the networks
+        :type       index:     dict
+        """
+        if not self._manager._has_file_header(path=self._path):
+            self.save(networks=networks)
+            return
+
+        self._manager._append_wifi_config_records(records=records,
+                                                  path=self._path)
+        self._manager._schedule_compaction(path=self._path)
+
+
+class MemoryStorage(ConfigStorage):
+    """
+    Storage of the networks in RAM
+
+    Nothing survives a reset, intended for tests.
+    """
+    def __init__(self, networks: Union[List[dict], None] = None):
+        """
+        Constructs a new instance.
+
+        :param      networks:  The initially stored networks
+        :type       networks:  Union[List[dict], None], optional
+        """
+        self._networks = None
+        if networks is not None:
+            self.save(networks=networks)
+
+    def exists(self) -> bool:
+        """
+        Check whether networks have been stored.
+
+        :returns:   Existance of the stored networks
+        :rtype:     bool
+        """
+        return self._networks is not None
+
+    def load(self) -> List[dict]:
+        """
+        Get a copy of the stored networks.
+
+        :returns:   The stored networks
+        :rtype:     List[dict]
+        """
+        return [dict(net) for net in self._networks or list()]
+
+    def save(self, networks: List[dict]) -> None:
+        """
+        Store a copy of the networks.
+
+        :param      networks:  The networks
+        :type       networks:  List[dict]
+        """
+        self._networks = [dict(net) for net in networks]
+
+    def update(self,
+               records: List[Tuple[int, Union[dict, str, list]]],
+               networks: List[dict],
+               index: dict) -> None:
+        """
+        Store a copy of the networks after the change.
+
+        :param      records:   The record types and networks, SSIDs or
+                               metadata
+        :type       records:   List[Tuple[int, Union[dict, str, list]]]
+        :param      networks:  The networks after the change
+        :type       networks:  List[dict]
+        :param      index:     The position of each SSID in the networks
+        :type       index:     dict
+        """
+        self.save(networks=networks)
+
+
+class DirectoryStorage(ConfigStorage):
+    """
+    Storage of each network in its own encrypted file of a directory
+
+    Only the files of the changed networks are rewritten or removed, each
+    file keeps its previous generation. The configured order of the networks
+    is kept by an order file listing their file names, it is only rewritten
+    if a network is added or removed. Files missing in the order file are
+    loaded last, in order of their names.
+    """
+    FILE_SUFFIX = '.bin'
+    ORDER_FILE = 'order.txt'
+
+    def __init__(self, manager, path: str):
+        """
+        Constructs a new instance.
+
+        :param      manager:  The WiFi manager encrypting the networks
+        :type       manager:  WiFiManager
+        :param      path:     The full path to the directory
+        :type       path:     str
+        """
+        self._manager = manager
+        self._path = str(path)
+
+    @property
+    def path(self) -> str:
+        """
+        Get the path of the directory.
+
+        :returns:   The full path to the directory
+        :rtype:     str
+        """
+        return self._path
+
+    def _network_name(self, ssid: str) -> str:
+        """
+        Get the file name of a network, the hex encoded SSID.
+
+        :param      ssid:  The SSID of the network
+        :type       ssid:  str
+
+        :returns:   The name of the file
+        :rtype:     str
+        """
+        return '{}{}'.format(ubinascii.hexlify(ssid.encode()).decode(),
+                             self.FILE_SUFFIX)
+
+    def _network_file(self, ssid: str) -> str:
+        """
+        Get the file of a network, named by the hex encoded SSID.
+
+        :param      ssid:  The SSID of the network
+        :type       ssid:  str
+
+        :returns:   The full path to the file
+        :rtype:     str
+        """
+        return '{}/{}'.format(self._path, self._network_name(ssid=ssid))
+
+    def _network_files(self) -> List[str]:
+        """
+        Get the files of all stored networks.
+
+        A network is also listed if only its previous generation exists.
+
+        :returns:   The full paths to the files, sorted by the order file
+        :rtype:     List[str]
+        """
+        backup_suffix = self.FILE_SUFFIX + self._manager.CONFIG_BACKUP_SUFFIX
+        names = list()
+
+        for name in os.listdir(self._path):
+            if name.endswith(backup_suffix):
+                name = name[:-len(self._manager.CONFIG_BACKUP_SUFFIX)]
+            if name.endswith(self.FILE_SUFFIX) and name not in names:
+                names.append(name)
+
+        order = self._read_order()
+        names.sort(key=lambda name: (order.index(name)
+                                     if name in order else len(order),
+                                     name))
+
+        return ['{}/{}'.format(self._path, name) for name in names]
+
+    def _read_order(self) -> List[str]:
+        """
+        Read the file names of the networks in their configured order.
+
+        :returns:   The file names, empty if the order file does not exist
+        :rtype:     List[str]
+        """
+        path = '{}/{}'.format(self._path, self.ORDER_FILE)
+        try:
+            with open(path, 'r') as file:
+                return [line.strip() for line in file if line.strip()]
+        except OSError:
+            return list()
+
+    def _write_order(self, networks: List[dict]) -> None:
+        """
+        Write the file names of the networks in their configured order.
+
+        The order file is written to a temporary file first, which replaces
+        the order file afterwards.
+
+        :param      networks:  The networks
+        :type       networks:  List[dict]
+        """
+        path = '{}/{}'.format(self._path, self.ORDER_FILE)
+        tmp_path = '{}{}'.format(path, self._manager.CONFIG_TMP_SUFFIX)
+
+        with open(tmp_path, 'w') as file:
+            for net in networks:
+                file.write('{}\n'.format(self._network_name(ssid=net['ssid'])))
+
+        if PathHelper.exists(path=path):
+            os.remove(path)
+        os.rename(tmp_path, path)
+
+    def _write_network(self, net: dict) -> None:
+        """
+        Write a network to its encrypted file.
+
+        :param      net:  The network
+        :type       net:  dict
+        """
+        with self._manager._config_lock:
+            self._manager._write_encrypted_file(
+                chunks=self._manager._iter_wifi_config_chunks(data=net),
+                path=self._network_file(ssid=net['ssid']),
+                mode='wb')
+
+    def _remove_network(self, ssid: str) -> None:
+        """
+        Remove the file of a network, if it exists.
+
+        :param      ssid:  The SSID of the network
+        :type       ssid:  str
+        """
+        path = self._network_file(ssid=ssid)
+        for name in (path,
+                     path + self._manager.CONFIG_TMP_SUFFIX,
+                     path + self._manager.CONFIG_BACKUP_SUFFIX):
+            if PathHelper.exists(path=name):
+                os.remove(name)
+
+    def exists(self) -> bool:
+        """
+        Check whether the directory exists.
+
+        :returns:   Existance of the directory
+        :rtype:     bool
+        """
+        return PathHelper.exists(path=self._path)
+
+    def load(self) -> List[dict]:
+        """
+        Load the networks of all files of the directory.
+
+        :returns:   The stored networks
+        :rtype:     List[dict]
+        """
+        networks = list()
+
+        for path in self._network_files():
+            networks.extend(self._manager._load_wifi_config_data(
+                path=path,
+                encrypted=True))
+
+        return networks
+
+    def save(self, networks: List[dict]) -> None:
+        """
+        Replace the files of the directory with the networks.
+
+        :param      networks:  The networks
+        :type       networks:  List[dict]
+        """
+        if self.exists():
+            for name in os.listdir(self._path):
+                os.remove('{}/{}'.format(self._path, name))
+        else:
+            os.mkdir(self._path)
+
+        for net in networks:
+            self._write_network(net=net)
+        self._write_order(networks=networks)
+
+    def update(self,
+               records: List[Tuple[int, Union[dict, str, list]]],
+               networks: List[dict],
+               index: dict) -> None:
+        """
+        Rewrite or remove only the files of the changed networks.
+
+        :param      records:   The record types and networks, SSIDs or
+                               metadata
+        :type       records:   List[Tuple[int, Union[dict, str, list]]]
+        :param      networks:  The networks after the change
+        :type       networks:  List[dict]
+        :param      index:     The position of each SSID in the networks
+        :type       index:     dict
+        """
+        if not self.exists():
+            self.save(networks=networks)
+            return
+
+        changed = list()
+        for _, value in records:
+            ssid = self.record_ssid(value=value)
+            if ssid is not None and ssid not in changed:
+                changed.append(ssid)
+
+        order = self._read_order()
+        for ssid in changed:
+            if ssid in index:
+                self._write_network(net=networks[index[ssid]])
+            else:
+                self._remove_network(ssid=ssid)
+
+        # replaced networks keep their position, the order file is only
+        # rewritten if networks have been added or removed
+        if order != [self._network_name(ssid=net['ssid'])
+                     for net in networks]:
+            self._write_order(networks=networks)